@@ -12,12 +12,25 @@
 #
 # Output: /tmp/changelog.txt
 
+VP_DEV="$(dirname "$0")/../../tools/vp-dev.py"
 PKG_NAME=$(basename "$PKG_DIR")
 AGENTS_MD="$PKG_DIR/AGENTS.md"
 CHANGELOG="/tmp/changelog.txt"
 
 >"$CHANGELOG"
 
+# GitHub API GET with a jq filter. Goes through vp-dev's HTTP cache (shared
+# with check-upstream) so repeated and unchanged responses are revalidated
+# with ETags instead of spending rate limit; falls back to gh.
+gh_api() {
+	local path=$1 filter=$2
+	if [[ -x "$VP_DEV" ]] && command -v jq >/dev/null; then
+		"$VP_DEV" api "$path" 2>/dev/null | jq -r "$filter"
+	else
+		gh api "$path" --jq "$filter"
+	fi
+}
+
 get_github_repo() {
 	if [[ -f "$AGENTS_MD" ]]; then
 		grep -oP 'https://github\.com/\K[^/]+/[^\s)]+' "$AGENTS_MD" | head -1 | sed 's/[[:space:]]*$//'
@@ -56,7 +69,7 @@ get_npm_name()
 	RELEASE_BODY=""
 	for prefix in "v" ""; do
 		TAG="${prefix}${NEW_VERSION}"
-		RELEASE_BODY=$(gh api "repos/$GITHUB_REPO/releases/tags/$TAG" --jq '.body // empty' 2>/dev/null || true)
+		RELEASE_BODY=$(gh_api "repos/$GITHUB_REPO/releases/tags/$TAG" '.body // empty' 2>/dev/null || true)
 		if [[ -n "$RELEASE_BODY" ]]; then
 			echo "**Tag: $TAG**" >>"$CHANGELOG"
 			echo "" >>"$CHANGELOG"
@@ -68,15 +81,15 @@ get_npm_name()
 	if [[ -z "$RELEASE_BODY" ]]; then
 		if [[ "$PKG_NAME" == *-git ]]; then
 			echo "### Recent commits" >>"$CHANGELOG"
-			gh api "repos/$GITHUB_REPO/commits?per_page=20" \
-				--jq '.[] | "- " + .sha[0:7] + " " + (.commit.message | split("\n")[0])' \
+			gh_api "repos/$GITHUB_REPO/commits?per_page=20" \
+				'.[] | "- " + .sha[0:7] + " " + (.commit.message | split("\n")[0])' \
 				2>/dev/null >>"$CHANGELOG" || echo "(could not fetch commits)" >>"$CHANGELOG"
 		else
 			COMPARE=""
 			for old_prefix in "v" ""; do
 				for new_prefix in "v" ""; do
-					COMPARE=$(gh api "repos/$GITHUB_REPO/compare/${old_prefix}${OLD_VERSION}...${new_prefix}${NEW_VERSION}" \
-						--jq '.commits[] | "- " + .sha[0:7] + " " + (.commit.message | split("\n")[0])' \
+					COMPARE=$(gh_api "repos/$GITHUB_REPO/compare/${old_prefix}${OLD_VERSION}...${new_prefix}${NEW_VERSION}" \
+						'.commits[] | "- " + .sha[0:7] + " " + (.commit.message | split("\n")[0])' \
 						2>/dev/null || true)
 					if [[ -n "$COMPARE" ]]; then
 						echo "### Commits ($OLD_VERSION → $NEW_VERSION)" >>"$CHANGELOG"
@@ -37,17 +37,18 @@ is_git_package()
 echo "--- Syncing workspace ---"
 mise -C "$PKG_DIR" r sync 2>&1 || true
 
-# Step 3: Version bump (skip for -git packages, pkgver() handles it)
+# Step 3: Version bump, checksums and .SRCINFO in one pass (skip for -git
+# packages, pkgver() handles it and their sources use SKIP)
 if ! is_git_package; then
-	echo "--- Updating pkgver to $NEW_VERSION ---"
-	sed -i "s/^pkgver=.*/pkgver=$NEW_VERSION/" "$WORKSPACE/PKGBUILD"
-	sed -i "s/^pkgrel=.*/pkgrel=1/" "$WORKSPACE/PKGBUILD"
-fi
-
-# Step 4: Update checksums (skip for -git packages which use SKIP)
-if ! is_git_package; then
-	echo "--- Updating checksums ---"
-	mise -C "$PKG_DIR" r checksums 2>&1
+	echo "--- Bumping pkgver to $NEW_VERSION ---"
+	# Fails when the version cannot be set mechanically (e.g. pkgver() computes
+	# it); report that like a failed build so the caller takes over.
+	if ! "${PWD}/tools/vp-dev.py" bump --to "$NEW_VERSION" "$WORKSPACE" 2>&1 | tee /tmp/build-output.txt; then
+		echo "build-failed" >/tmp/update-status.txt
+		echo "--- Version bump FAILED ---"
+		echo "" >/tmp/namcap-output.txt
+		exit 1
+	fi
 fi
 
 # Step 4.5: Install AUR dependencies (makepkg -s only handles repo deps)
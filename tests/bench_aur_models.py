@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: attrs models vs. lazy slots records for AUR responses.
+
+Decodes a synthetic ``/info`` payload of N records both ways and reads the
+two fields find_updates compares (name and version)::
+
+    python tests/bench_aur_models.py --records 10000
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import timeit
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+
+from fake_aur import make_package  # noqa: E402
+from find_updates import InfoRecord, InfoResult  # noqa: E402
+
+
+def payload(n: int) -> bytes:
+    results = [make_package(f"pkg-{i:05d}") for i in range(n)]
+    return json.dumps(
+        {"resultcount": n, "type": "multiinfo", "version": 5, "results": results}
+    ).encode()
+
+
+def via_models(raw: bytes) -> dict[str, str]:
+    res = InfoResult.from_dict(json.loads(raw))
+    return {p.name: p.version for p in res.results}
+
+
+def via_records(raw: bytes) -> dict[str, str]:
+    res = InfoRecord(json.loads(raw))
+    return {p.name: p.version for p in res.results}
+
+
+def peak_kib(fn, raw: bytes) -> float:
+    tracemalloc.start()
+    fn(raw)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--records", type=int, default=10_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    raw = payload(args.records)
+    assert via_models(raw) == via_records(raw)
+    parse = min(timeit.repeat(lambda: json.loads(raw), number=1, repeat=args.repeat))
+    print(
+        f"{args.records} records, {len(raw) / 1024:.0f} KiB; json.loads {parse * 1e3:.1f} ms"
+    )
+    for label, fn in (("attrs models", via_models), ("slots records", via_records)):
+        best = min(timeit.repeat(lambda fn=fn: fn(raw), number=1, repeat=args.repeat))
+        print(
+            f"{label:14s} {best * 1e3:7.1f} ms total, "
+            f"{(best - parse) * 1e3:7.1f} ms decode, peak {peak_kib(fn, raw):8.0f} KiB"
+        )
+
+
+if __name__ == "__main__":
+    main()
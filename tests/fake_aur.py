@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""Local stand-in for the AUR RPC v5 endpoints used by find_updates.
+
+Serves ``/info``, ``/search/<name>`` and the bulk
+``/packages-meta-ext-v1.json.gz`` dump from an in-memory package table, with
+knobs for the failure modes the client has to cope with: per-request latency,
+a URI length limit (answered with 414) and a number of leading requests that
+get ``429 Too Many Requests``. Used by the tests, and runnable on its own to
+benchmark the client offline::
+
+    python tests/fake_aur.py --packages 5000 --latency 0.05 --bench
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+def make_package(name: str, version: str = "1.0-1") -> dict:
+    return {
+        "ID": abs(hash(name)) % 10**6,
+        "Name": name,
+        "PackageBase": name,
+        "Version": version,
+        "Description": f"{name} package",
+        "URL": f"https://example.com/{name}",
+        "NumVotes": 0,
+        "Popularity": 0.0,
+        "OutOfDate": None,
+        "Maintainer": "nobody",
+        "Depends": ["glibc"],
+    }
+
+
+class FakeAur:
+    """Threaded fake RPC server; use as a context manager to get ``url``."""
+
+    def __init__(
+        self,
+        packages: dict[str, dict] | None = None,
+        latency: float = 0.0,
+        max_uri: int = 4443,
+        throttle: int = 0,
+        retry_after: int = 0,
+    ) -> None:
+        self.packages = packages or {}
+        self.latency = latency
+        self.max_uri = max_uri
+        self.throttle = throttle
+        self.retry_after = retry_after
+        self.requests: list[str] = []
+        self.in_flight = self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/rpc/v5"
+
+    @property
+    def meta_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/packages-meta-ext-v1.json.gz"
+
+    def __enter__(self) -> FakeAur:
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _respond(self, path: str) -> tuple[int, dict, dict | bytes]:
+        """Status, extra headers and JSON (or raw) body for one request."""
+        with self._lock:
+            self.requests.append(path)
+            throttled = len(self.requests) <= self.throttle
+        if throttled:
+            return 429, {"Retry-After": str(self.retry_after)}, {}
+        if len(path) > self.max_uri:
+            return 414, {}, {}
+        parts = urlsplit(path)
+        if parts.path == "/packages-meta-ext-v1.json.gz":
+            dump = json.dumps(list(self.packages.values())).encode()
+            return 200, {"Content-Type": "application/gzip"}, gzip.compress(dump)
+        route = parts.path.removeprefix("/rpc/v5")
+        if route == "/info":
+            names = parse_qs(parts.query).get("arg[]", [])
+            hits = [self.packages[n] for n in names if n in self.packages]
+            return (
+                200,
+                {},
+                {
+                    "resultcount": len(hits),
+                    "type": "multiinfo",
+                    "version": 5,
+                    "results": hits,
+                },
+            )
+        if route.startswith("/search/"):
+            term = unquote(route.removeprefix("/search/"))
+            hits = [p for n, p in sorted(self.packages.items()) if term in n]
+            return (
+                200,
+                {},
+                {
+                    "resultcount": len(hits),
+                    "type": "search",
+                    "version": 5,
+                    "results": hits,
+                },
+            )
+        return (
+            200,
+            {},
+            {
+                "type": "error",
+                "error": "Incorrect request type specified.",
+                "version": 5,
+            },
+        )
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self) -> None:
+                with fake._lock:
+                    fake.in_flight += 1
+                    fake.peak_in_flight = max(fake.peak_in_flight, fake.in_flight)
+                try:
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    status, headers, body = fake._respond(self.path)
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+                data = body if isinstance(body, bytes) else json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header(
+                    "Content-Type", headers.pop("Content-Type", "application/json")
+                )
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args: object) -> None:
+                pass
+
+        return Handler
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--packages", type=int, default=1000)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--throttle", type=int, default=0)
+    ap.add_argument("--bench", action="store_true", help="time find_updates against it")
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    names = [f"pkg-{i:05d}" for i in range(args.packages)]
+    with FakeAur(
+        {n: make_package(n) for n in names}, args.latency, throttle=args.throttle
+    ) as aur:
+        if not args.bench:
+            print(aur.url, flush=True)
+            threading.Event().wait()
+        sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "tools"))
+        from find_updates import AurClient, AurMetaIndex
+
+        for workers in sorted({1, args.workers}):
+            aur.requests.clear()
+            with AurClient(aur.url, workers=workers, backoff=0.01) as client:
+                t0 = time.perf_counter()
+                res = client.info(names)
+                dt = time.perf_counter() - t0
+            print(
+                f"workers={workers}: {res.resultcount} results in {len(aur.requests)} "
+                f"requests, {dt:.3f}s"
+            )
+        aur.requests.clear()
+        t0 = time.perf_counter()
+        index = AurMetaIndex.load(aur.meta_url, names)
+        dt = time.perf_counter() - t0
+        print(f"packages-meta: {len(index.versions)} versions in 1 request, {dt:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,39 @@
 import unittest
 import sys
 import os
-from unittest.mock import MagicMock, patch
+import gzip
+import io
+import json
+import random
+import tarfile
+import tempfile
+from contextlib import redirect_stdout
+from pathlib import Path
+from unittest.mock import patch
 
-# Mock required modules that may not be available (Arch Linux specific)
-sys.modules['pyalpm'] = MagicMock()
-sys.modules['pycman'] = MagicMock()
-sys.modules['pycman.config'] = MagicMock()
-sys.modules['requests'] = MagicMock()
-sys.modules['colorama'] = MagicMock()
+import requests
 
 # Add the tools directory to sys.path
 sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tools'))
 
-from find_updates import PackageBasic
+import find_updates
+from find_updates import (
+    AurClient,
+    AurError,
+    AurInfoCache,
+    AurMetaIndex,
+    InfoRecord,
+    PackageDetailed,
+    PackageRecord,
+    VersionComparator,
+    PackageBasic,
+    chunk_names,
+    info_multiple,
+    iter_json_array,
+    main,
+    vercmp,
+)
+from tests.fake_aur import FakeAur, make_package
 
 
 class TestPackageBasicToDict(unittest.TestCase):
@@ -141,5 +161,492 @@ def test_roundtrip(self):
         self.assertEqual(restored.version, "2.0-1")
 
 
+class TestChunkNames(unittest.TestCase):
+    BASE = "https://aur.archlinux.org/rpc/v5"
+
+    def test_chunks_fit_uri_limit(self):
+        names = [f"package-name-{i}" for i in range(1000)]
+        chunks = chunk_names(names, self.BASE, limit=2000)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual([n for c in chunks for n in c], names)
+        for chunk in chunks:
+            uri = requests.Request("GET", f"{self.BASE}/info", params={"arg[]": chunk}).prepare().url
+            self.assertLessEqual(len(uri), 2000)
+
+    def test_dedupes_and_keeps_oversized_names(self):
+        self.assertEqual(chunk_names(["a", "b", "a"], self.BASE), [["a", "b"]])
+        self.assertEqual(chunk_names(["x" * 100, "y"], self.BASE, limit=80), [["x" * 100], ["y"]])
+        self.assertEqual(chunk_names([], self.BASE), [])
+
+
+class TestAurClient(unittest.TestCase):
+    NAMES = [f"pkg-{i:04d}" for i in range(600)]
+
+    def setUp(self):
+        self.packages = {n: make_package(n) for n in self.NAMES}
+
+    def test_info_merges_concurrent_chunks(self):
+        with FakeAur(self.packages, latency=0.05, max_uri=2000) as aur, AurClient(
+            aur.url, workers=4, max_uri=2000
+        ) as client:
+            res = client.info(self.NAMES + ["missing"])
+        self.assertGreater(len(aur.requests), 4)
+        self.assertGreater(aur.peak_in_flight, 1)
+        self.assertEqual(res.resultcount, 600)
+        self.assertEqual(res.type, "multiinfo")
+        self.assertEqual([p.name for p in res.results], self.NAMES)
+        self.assertEqual(res.results[0].depends, ["glibc"])
+
+    def test_unchunked_request_is_rejected(self):
+        with FakeAur(self.packages, max_uri=2000) as aur, AurClient(
+            aur.url, retries=0, max_uri=10**6
+        ) as client:
+            with self.assertRaises(requests.HTTPError):
+                client.info(self.NAMES)
+
+    def test_retries_throttled_requests(self):
+        with FakeAur(self.packages, throttle=2) as aur, AurClient(
+            aur.url, backoff=0.01
+        ) as client:
+            res = client.info(["pkg-0001"])
+        self.assertEqual(len(aur.requests), 3)
+        self.assertEqual(res.results[0].version, "1.0-1")
+
+    def test_gives_up_after_retries(self):
+        with FakeAur(self.packages, throttle=10) as aur, AurClient(
+            aur.url, retries=1, backoff=0.01
+        ) as client:
+            with self.assertRaises(requests.HTTPError):
+                client.info(["pkg-0001"])
+        self.assertEqual(len(aur.requests), 2)
+
+    def test_search_and_rpc_errors(self):
+        with FakeAur(self.packages) as aur, AurClient(aur.url) as client:
+            res = client.search("pkg-000")
+            self.assertEqual(res.resultcount, 10)
+            self.assertEqual(res.results[0].name, "pkg-0000")
+            with self.assertRaises(AurError):
+                client._get(f"{aur.url}/bogus")
+
+    def test_module_helper_uses_aur_url(self):
+        with FakeAur(self.packages) as aur, patch(
+            "find_updates._client", AurClient(aur.url)
+        ):
+            self.assertEqual(info_multiple(["pkg-0002"]).results[0].name, "pkg-0002")
+
+
+class TestAurInfoCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = Path(tmp.name) / "aur-info.json"
+        self.packages = {n: make_package(n) for n in ("a", "b", "c")}
+
+    def _run(self, aur, names, **kw):
+        cache = AurInfoCache(self.path, **kw)
+        with AurClient(aur.url) as client:
+            res = cache.info(client, names)
+            cache.close()
+        return res
+
+    def _age(self, seconds):
+        data = json.loads(self.path.read_text())
+        for entry in data["entries"].values():
+            entry["fetched"] -= seconds
+        self.path.write_text(json.dumps(data))
+
+    def test_fresh_entries_need_no_requests(self):
+        with FakeAur(self.packages) as aur:
+            first = self._run(aur, ["a", "b", "nope"])
+            self.assertEqual(len(aur.requests), 1)
+            second = self._run(aur, ["b", "a", "nope"])
+            self.assertEqual(len(aur.requests), 1)
+        self.assertEqual([p.name for p in first.results], ["a", "b"])
+        self.assertEqual([p.name for p in second.results], ["b", "a"])
+        self.assertEqual(second.results[0].depends, ["glibc"])
+
+    def test_only_unknown_names_are_fetched(self):
+        with FakeAur(self.packages) as aur:
+            self._run(aur, ["a"])
+            self._run(aur, ["a", "c"])
+        self.assertEqual(len(aur.requests), 2)
+        self.assertIn("arg%5B%5D=c", aur.requests[1])
+        self.assertNotIn("arg%5B%5D=a", aur.requests[1])
+
+    def test_stale_entries_served_then_revalidated(self):
+        with FakeAur(self.packages) as aur:
+            self._run(aur, ["a"], ttl=60, stale=600)
+            self._age(120)
+            self.packages["a"] = make_package("a", "2.0-1")
+            res = self._run(aur, ["a"], ttl=60, stale=600)
+            self.assertEqual(res.results[0].version, "1.0-1")
+            self.assertEqual(len(aur.requests), 2)
+            res = self._run(aur, ["a"], ttl=60, stale=600)
+            self.assertEqual(res.results[0].version, "2.0-1")
+            self.assertEqual(len(aur.requests), 2)
+
+    def test_expired_entries_are_fetched_before_returning(self):
+        with FakeAur(self.packages) as aur:
+            self._run(aur, ["a"], ttl=60, stale=600)
+            self._age(1000)
+            self.packages["a"] = make_package("a", "2.0-1")
+            res = self._run(aur, ["a"], ttl=60, stale=600)
+        self.assertEqual(res.results[0].version, "2.0-1")
+
+    def test_failed_revalidation_keeps_stale_entry(self):
+        with FakeAur(self.packages) as aur:
+            self._run(aur, ["a"], ttl=60, stale=600)
+        self._age(120)
+        with FakeAur(self.packages, throttle=10) as aur:
+            cache = AurInfoCache(self.path, ttl=60, stale=600)
+            with AurClient(aur.url, retries=0) as client:
+                self.assertEqual(cache.info(client, ["a"]).resultcount, 1)
+                cache.close()
+        self.assertIn("a", AurInfoCache(self.path).entries)
+
+    def test_concurrent_writers_merge(self):
+        with FakeAur(self.packages) as aur, AurClient(aur.url) as client:
+            one, two = AurInfoCache(self.path), AurInfoCache(self.path)
+            one.info(client, ["a"])
+            two.info(client, ["b"])
+            one.close()
+            two.close()
+        self.assertEqual(sorted(AurInfoCache(self.path).entries), ["a", "b"])
+
+    def test_unreadable_cache_is_ignored(self):
+        self.path.write_text("{not json")
+        self.assertEqual(AurInfoCache(self.path).entries, {})
+
+
+class TestAurMetaIndex(unittest.TestCase):
+    PACKAGES = [
+        {"Name": "a", "Version": "1.0-1", "Depends": ["glibc"], "Description": "ä ✓ 日本"},
+        {"Name": "b", "Version": "2:3.1-2", "Keywords": []},
+        {"Name": "c", "Version": "0.1-1", "Description": "has ] and } and \\\" in it"},
+    ]
+
+    def test_iter_json_array_across_chunk_boundaries(self):
+        raw = json.dumps(self.PACKAGES, ensure_ascii=False, indent=1).encode()
+        for chunk_size in (1, 3, 7, 64, 1 << 16):
+            got = list(iter_json_array(io.BytesIO(raw), chunk_size))
+            self.assertEqual(got, self.PACKAGES, chunk_size)
+        self.assertEqual(list(iter_json_array(io.BytesIO(b" [ ] "))), [])
+
+    def test_iter_json_array_rejects_bad_input(self):
+        for raw in (b'{"Name": "a"}', b'[{"Name": "a"}', b'[{"Name": ', b"[1, 2]"):
+            with self.assertRaises(ValueError, msg=raw):
+                list(iter_json_array(io.BytesIO(raw), 4))
+
+    def test_load_local_file(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            for name, data in (
+                ("meta.json.gz", gzip.compress(json.dumps(self.PACKAGES).encode())),
+                ("meta.json", json.dumps(self.PACKAGES).encode()),
+            ):
+                path = Path(tmp) / name
+                path.write_bytes(data)
+                index = AurMetaIndex.load(str(path))
+                self.assertEqual(index.versions, {"a": "1.0-1", "b": "2:3.1-2", "c": "0.1-1"})
+                self.assertEqual(AurMetaIndex.load(str(path), ["b", "x"]).versions, {"b": "2:3.1-2"})
+
+    def test_load_url_and_answer_info(self):
+        packages = {n: make_package(n) for n in ("a", "b")}
+        with FakeAur(packages) as aur:
+            index = AurMetaIndex.load(aur.meta_url)
+        self.assertEqual(len(aur.requests), 1)
+        res = index.info(["b", "zzz", "a", "b"])
+        self.assertEqual(res.resultcount, 2)
+        self.assertEqual([(p.name, p.version) for p in res.results], [("b", "1.0-1"), ("a", "1.0-1")])
+
+
+class TestRecords(unittest.TestCase):
+    RAW = {
+        "ID": 1,
+        "Name": "pkg",
+        "Version": "1.0-1",
+        "License": ["MIT"],
+        "OutOfDate": None,
+        "Extra": "x",
+    }
+
+    def test_fields_read_from_raw_dict(self):
+        rec = PackageRecord(self.RAW)
+        self.assertEqual((rec.name, rec.version, rec.license_), ("pkg", "1.0-1", ["MIT"]))
+        self.assertIsNone(rec.depends)
+        self.assertEqual(rec.additional_properties, {"Extra": "x"})
+        self.assertIn("Extra", rec)
+        self.assertNotIn("Name", rec)
+        self.assertFalse(hasattr(rec, "__dict__"))
+
+    def test_matches_attrs_models(self):
+        rec = PackageRecord(self.RAW)
+        model = PackageDetailed.from_dict(self.RAW)
+        self.assertEqual(rec.to_dict(), model.to_dict())
+        self.assertEqual(PackageDetailed.from_dict(rec.to_dict()), model)
+
+    def test_results_wrapped_lazily_once(self):
+        res = InfoRecord({"resultcount": 2, "type": "multiinfo", "results": [self.RAW, {"Name": "b"}]})
+        self.assertIsNone(res._results)
+        self.assertEqual((res.resultcount, res.type), (2, "multiinfo"))
+        self.assertEqual([p.name for p in res.results], ["pkg", "b"])
+        self.assertIs(res.results, res.results)
+        self.assertEqual(InfoRecord({}).results, [])
+
+
+def _rpmvercmp(a: bytes, b: bytes) -> int:
+    """Line-by-line port of rpmvercmp() from libalpm/version.c, the oracle."""
+    if a == b:
+        return 0
+    isalnum = lambda c: 48 <= c <= 57 or 65 <= c <= 90 or 97 <= c <= 122  # noqa: E731
+    isdigit = lambda c: 48 <= c <= 57  # noqa: E731
+    isalpha = lambda c: isalnum(c) and not isdigit(c)  # noqa: E731
+    a, b = a + b"\0", b + b"\0"
+    one = two = p1 = p2 = 0
+    while a[one] and b[two]:
+        while a[one] and not isalnum(a[one]):
+            one += 1
+        while b[two] and not isalnum(b[two]):
+            two += 1
+        if not a[one] or not b[two]:
+            break
+        if one - p1 != two - p2:
+            return -1 if one - p1 < two - p2 else 1
+        p1, p2 = one, two
+        cls = isdigit if isdigit(a[p1]) else isalpha
+        isnum = cls is isdigit
+        while a[p1] and cls(a[p1]):
+            p1 += 1
+        while b[p2] and cls(b[p2]):
+            p2 += 1
+        if two == p2:
+            return 1 if isnum else -1
+        x, y = a[one:p1], b[two:p2]
+        if isnum:
+            x, y = x.lstrip(b"0"), y.lstrip(b"0")
+            if len(x) != len(y):
+                return 1 if len(x) > len(y) else -1
+        if x != y:
+            return -1 if x < y else 1
+        one, two = p1, p2
+    if not a[one] and not b[two]:
+        return 0
+    return -1 if (not a[one] and not isalpha(b[two])) or isalpha(a[one]) else 1
+
+
+def _alpm_vercmp(a: str, b: str) -> int:
+    if a == b:
+        return 0
+
+    def evr(v):
+        v = v.encode()
+        i = 0
+        while i < len(v) and 48 <= v[i] <= 57:
+            i += 1
+        se = v.rfind(b"-", i)
+        if v[i : i + 1] == b":":
+            epoch, ver = v[:i] or b"0", v[i + 1 : se if se >= 0 else None]
+        else:
+            epoch, ver = b"0", v[: se if se >= 0 else None]
+        return epoch, ver, v[se + 1 :] if se >= 0 else None
+
+    (e1, v1, r1), (e2, v2, r2) = evr(a), evr(b)
+    ret = _rpmvercmp(e1, e2) or _rpmvercmp(v1, v2)
+    if ret == 0 and r1 is not None and r2 is not None:
+        ret = _rpmvercmp(r1, r2)
+    return ret
+
+
+class TestVercmp(unittest.TestCase):
+    # pacman's test/util/vercmptest.sh
+    CORPUS = [
+        ("1.5.0", "1.5.0", 0), ("1.5.1", "1.5.0", 1), ("1.5.1", "1.5", 1),
+        ("1.5.0-1", "1.5.0-1", 0), ("1.5.0-1", "1.5.0-2", -1), ("1.5.0-1", "1.5.1-1", -1),
+        ("1.5.0-2", "1.5.1-1", -1), ("1.5-1", "1.5.1-1", -1), ("1.5-2", "1.5.1-1", -1),
+        ("1.5-2", "1.5.1-2", -1), ("1.5", "1.5-1", 0), ("1.5-1", "1.5", 0),
+        ("1.1-1", "1.1", 0), ("1.0-1", "1.1", -1), ("1.1-1", "1.0", 1),
+        ("1.5b-1", "1.5-1", -1), ("1.5b", "1.5", -1), ("1.5b-1", "1.5", -1),
+        ("1.5b", "1.5.1", -1), ("1.0a", "1.0alpha", -1), ("1.0alpha", "1.0b", -1),
+        ("1.0b", "1.0beta", -1), ("1.0beta", "1.0rc", -1), ("1.0rc", "1.0", -1),
+        ("1.5.a", "1.5", 1), ("1.5.b", "1.5.a", 1), ("1.5.1", "1.5.b", 1),
+        ("1.5.b-1", "1.5.b", 0), ("1.5-1", "1.5.b", -1), ("2.0", "2_0", 0),
+        ("2.0_a", "2_0.a", 0), ("2.0a", "2.0.a", -1), ("2___a", "2_a", 1),
+        ("0:1.0", "0:1.0", 0), ("0:1.0", "0:1.1", -1), ("1:1.0", "0:1.0", 1),
+        ("1:1.0", "0:1.1", 1), ("1:1.0", "2:1.1", -1), ("1:1.0", "0:1.0-1", 1),
+        ("1:1.0-1", "0:1.1-1", 1), ("0:1.0", "1.0", 0), ("0:1.0", "1.1", -1),
+        ("0:1.1", "1.0", 1), ("1:1.0", "1.0", 1), ("1:1.0", "1.1", 1),
+        ("1:1.1", "1.1", 1),
+    ]
+
+    def test_pacman_corpus(self):
+        for a, b, want in self.CORPUS:
+            self.assertEqual(vercmp(a, b), want, (a, b))
+            self.assertEqual(vercmp(b, a), -want, (b, a))
+            self.assertEqual(_alpm_vercmp(a, b), want, (a, b))
+
+    def test_matches_reference_on_random_versions(self):
+        rng = random.Random(14)
+        alphabet = "0123456789" * 2 + "abzAZ" + ".._-+~:" + "é"
+        pool = [
+            "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 8)))
+            for _ in range(3000)
+        ]
+        pool += ["1.", "1", "1..", "1.a", "1..a", "1a", "1_", "01", ":1", "1:", "-", "a-"]
+        versions = VersionComparator()
+        pairs = [(rng.choice(pool), rng.choice(pool)) for _ in range(30000)]
+        pairs += [(a, b) for a in pool[-12:] for b in pool[-12:]]
+        got = versions.compare_many(pairs)
+        for (a, b), cmp in zip(pairs, got):
+            self.assertEqual(cmp, _alpm_vercmp(a, b), (a, b))
+
+    def test_keys_are_memoized(self):
+        versions = VersionComparator()
+        versions.compare_many([("1.0-1", "1.0-2"), ("1.0-1", "2:0.1")])
+        self.assertEqual(len(versions._keys), 3)
+        self.assertIs(versions.key("1.0-1"), versions.key("1.0-1"))
+
+
+def make_sync_db(path, packages, mode="w:gz", fmt=tarfile.PAX_FORMAT):
+    """Write a repo-add style sync db: one ``<name>-<version>/desc`` per package."""
+    with tarfile.open(path, mode, format=fmt) as tar:
+        for name, version in packages.items():
+            desc = (
+                f"%FILENAME%\n{name}-{version}-x86_64.pkg.tar.zst\n\n"
+                f"%NAME%\n{name}\n\n%BASE%\n{name}\n\n%VERSION%\n{version}\n\n"
+                "%DESC%\nsomething\n\n%DEPENDS%\nglibc\n\n"
+            ).encode()
+            d = tarfile.TarInfo(f"{name}-{version}")
+            d.type = tarfile.DIRTYPE
+            tar.addfile(d)
+            info = tarfile.TarInfo(f"{name}-{version}/desc")
+            info.size = len(desc)
+            tar.addfile(info, io.BytesIO(desc))
+
+
+class TestSyncDb(unittest.TestCase):
+    PACKAGES = {"bash": "5.2.026-2", "zlib": "1:1.3.1-2", "x" * 120: "1.0-1"}
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+
+    def test_reads_every_compression(self):
+        for mode in ("w", "w:gz", "w:xz", "w:bz2"):
+            for fmt in (tarfile.PAX_FORMAT, tarfile.GNU_FORMAT):
+                db = self.dir / f"core-{mode[2:]}-{fmt}.db"
+                make_sync_db(db, self.PACKAGES, mode, fmt)
+                self.assertEqual(find_updates.read_sync_db(db), self.PACKAGES, (mode, fmt))
+
+    def test_truncated_and_empty_dbs(self):
+        db = self.dir / "core.db"
+        make_sync_db(db, self.PACKAGES, "w")
+        db.write_bytes(db.read_bytes()[:700])
+        with self.assertRaises(ValueError):
+            find_updates.read_sync_db(db)
+        make_sync_db(db, self.PACKAGES)
+        db.write_bytes(db.read_bytes()[:-30])
+        with self.assertRaises(ValueError):
+            find_updates.read_sync_db(db)
+        db.write_bytes(b"")
+        self.assertEqual(find_updates.read_sync_db(db), {})
+
+    def test_index_cache_and_merge(self):
+        make_sync_db(self.dir / "core.db", {"bash": "5.2-1"})
+        make_sync_db(self.dir / "extra.db", {"bash": "5.3-1", "vim": "9.1-1"})
+        cache = self.dir / "cache" / "index.json"
+        index = find_updates.SyncDbIndex.load(self.dir, ("core", "extra", "multilib"), cache)
+        self.assertEqual(sorted(index.repos), ["core", "extra"])
+        self.assertEqual(
+            index.merged(("core", "extra")), {"bash": ("5.2-1", "core"), "vim": ("9.1-1", "extra")}
+        )
+        with patch("find_updates.read_sync_db") as read:
+            again = find_updates.SyncDbIndex.load(self.dir, ("core", "extra"), cache)
+        read.assert_not_called()
+        self.assertEqual(again.repos, index.repos)
+        make_sync_db(self.dir / "extra.db", {"vim": "9.2-1"})
+        os.utime(self.dir / "extra.db", ns=(1, 1))
+        with patch("find_updates.read_sync_db", wraps=find_updates.read_sync_db) as read:
+            again = find_updates.SyncDbIndex.load(self.dir, ("core", "extra"), cache)
+        read.assert_called_once_with(self.dir / "extra.db")
+        self.assertEqual(again.repos["extra"], {"vim": "9.2-1"})
+
+
+class TestMain(unittest.TestCase):
+    def _run(self, argv):
+        packages = {
+            "aurpkg": make_package("aurpkg", "1.0.1-1"),
+            "newer": make_package("newer", "2.0-1"),
+        }
+        out = io.StringIO()
+        with tempfile.TemporaryDirectory() as tmp, FakeAur(packages) as aur, patch.dict(
+            sys.modules, {"pycman": None, "pyalpm": None}
+        ), patch.dict(os.environ, {"XDG_CACHE_HOME": tmp}), patch(
+            "find_updates._client", AurClient(aur.url)
+        ), redirect_stdout(out):
+            make_sync_db(Path(tmp, "extra.db"), {"zlib": "1:1.3-1", "bash": "5.2-1"})
+            make_sync_db(
+                Path(tmp, "custom.db"),
+                {
+                    "zlib": "1:1.3-2",
+                    "bash": "5.1.16-1",
+                    "aurpkg": "1.0-1",
+                    "gone": "1.0-1",
+                    "newer": "3.0-1",
+                },
+            )
+            rc = main(["--dbpath", tmp, *argv])
+        return rc, out.getvalue()
+
+    def test_reports_outdated_packages_without_libalpm(self):
+        rc, out = self._run([])
+        self.assertEqual(rc, 0)
+        lines = [" ".join(line.split()) for line in out.splitlines() if line]
+        self.assertEqual(len(lines), 3)
+        self.assertIn("extra - custom bash", lines[0])
+        self.assertIn("aur - custom aurpkg", lines[1])
+        self.assertEqual(lines[2], "non - custom gone")
+
+    def test_ndjson_records(self):
+        rc, out = self._run(["--format", "ndjson", "--exit-code"])
+        self.assertEqual(rc, 1)
+        records = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual(
+            [(r["name"], r["source"], r["remote_repo"]) for r in records],
+            [("bash", "arch", "extra"), ("aurpkg", "aur", "aur"), ("gone", "none", None)],
+        )
+        self.assertEqual(records[0]["local_version"], "5.1.16-1")
+        self.assertEqual(records[0]["remote_version"], "5.2-1")
+        self.assertIsNone(records[2]["remote_version"])
+        self.assertTrue(all(r["repo"] == "custom" for r in records))
+        self.assertLessEqual(records[0]["elapsed"], records[1]["elapsed"])
+
+    def test_json_array(self):
+        _, out = self._run(["--format", "json"])
+        self.assertEqual([r["name"] for r in json.loads(out)], ["bash", "aurpkg", "gone"])
+
+    def test_json_records_are_streamed(self):
+        buf = io.StringIO()
+        report = find_updates.Report("json", buf)
+        self.assertEqual(buf.getvalue(), "[")
+        report.outdated("aur", "aur", "custom", "a", "2-1", "1-1")
+        self.assertIn('"name": "a"', buf.getvalue())
+        report.close()
+        self.assertEqual(json.loads(buf.getvalue())[0]["source"], "aur")
+        empty = io.StringIO()
+        find_updates.Report("json", empty).close()
+        self.assertEqual(json.loads(empty.getvalue()), [])
+
+    def test_text_report_writes_to_its_stream(self):
+        buf = io.StringIO()
+        report = find_updates.Report("text", buf)
+        with patch("sys.stdout", io.StringIO()) as stdout:
+            report.outdated("aur", "aur", "custom", "a", "2-1", "1-1")
+            report.missing("custom", "gone", "1-1")
+            report.end_repo()
+        self.assertEqual(stdout.getvalue(), "")
+        self.assertEqual(len(buf.getvalue().splitlines()), 3)
+        self.assertIn("aur - custom", buf.getvalue())
+
+
 if __name__ == '__main__':
     unittest.main()
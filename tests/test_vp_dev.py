@@ -4,6 +4,7 @@
 import os
 import importlib.util
 import io
+import json
 import subprocess
 import tempfile
 import time
@@ -158,17 +159,18 @@ def test_parse_srcinfo_successful_no_cache(self):
                 "\n"
                 "pkgname = mypkg\n"
             )
+            (d / "some_patch.patch").touch()
+            (d / "src").mkdir()
+            (d / "src" / "build.o").touch()
             self.app.files_cache = None
             with patch('subprocess.run') as mock_run:
-                mock_result = MagicMock()
-                mock_result.returncode = 0
-                mock_result.stdout = "PKGBUILD\nsome_patch.patch\nanother_file.txt\n"
-                mock_run.return_value = mock_result
                 result = self.app._parse_srcinfo(d)
+                # No index: the working tree is walked instead of forking git.
+                mock_run.assert_not_called()
             self.assertIsNotNone(result)
             self.assertEqual(result["name"], "mypkg")
             self.assertEqual(result["version"], "1.0.0-2")
-            self.assertEqual(result["files"], ["another_file.txt", "some_patch.patch"])
+            self.assertEqual(result["files"], [".SRCINFO", "some_patch.patch"])
 
     def test_parse_srcinfo_incomplete_missing_pkgrel(self):
         with tempfile.TemporaryDirectory() as tmpdir:
@@ -211,6 +213,8 @@ def test_parse_srcinfo_multiple_packages_takes_first(self):
             result = self.app._parse_srcinfo(d)
             self.assertIsNotNone(result)
             self.assertEqual(result["name"], "mypkg-first")
+            self.assertEqual(result["description"], "First package")
+            self.assertEqual(result["pkgnames"], ["mypkg-first", "mypkg-second"])
 
     @patch('pathlib.Path.read_text')
     def test_parse_srcinfo_exception(self, mock_read_text):
@@ -225,6 +229,1081 @@ def test_parse_srcinfo_exception(self, mock_read_text):
             self.assertIsNone(self.app._parse_srcinfo(d))
 
 
+# ─── Srcinfo model ────────────────────────────────────────────────────────────
+
+class TestSrcinfoModel(unittest.TestCase):
+    TEXT = (
+        "# Generated by makepkg\n"
+        "pkgbase = suite\n"
+        "\tpkgdesc = The suite\n"
+        "\tpkgver = 2.0\n"
+        "\tpkgrel = 1\n"
+        "\tepoch = 1\n"
+        "\tarch = x86_64\n"
+        "\tdepends = glibc\n"
+        "\tdepends = zlib\n"
+        "\tdepends_x86_64 = lib32-glibc\n"
+        "\n"
+        "pkgname = suite-core\n"
+        "\n"
+        "pkgname = suite-extra\n"
+        "\tpkgdesc = Extras\n"
+        "\tdepends = \n"
+        "\tdepends_x86_64 = suite-core\n"
+    )
+
+    def test_iter_srcinfo_yields_every_section(self):
+        sections = list(vp_dev.iter_srcinfo(io.StringIO(self.TEXT)))
+        self.assertEqual(
+            [(s.header, s.name) for s in sections],
+            [("pkgbase", "suite"), ("pkgname", "suite-core"), ("pkgname", "suite-extra")],
+        )
+        self.assertEqual(sections[0].attrs["depends"], ("glibc", "zlib"))
+        self.assertEqual(sections[1].attrs, {})
+        self.assertEqual(sections[2].attrs["depends"], ())
+
+    def test_overrides_and_arch_keys(self):
+        si = vp_dev.Srcinfo.parse(self.TEXT.splitlines())
+        self.assertEqual(si.pkgbase, "suite")
+        self.assertEqual(si.pkgnames, ("suite-core", "suite-extra"))
+        self.assertEqual(si.value("pkgdesc", "suite-core"), "The suite")
+        self.assertEqual(si.value("pkgdesc", "suite-extra"), "Extras")
+        self.assertEqual(si.get("depends", "suite-core"), ("glibc", "zlib"))
+        self.assertEqual(si.get("depends", "suite-extra"), ())
+        self.assertEqual(
+            si.for_arch("depends", "x86_64", "suite-core"), ("glibc", "zlib", "lib32-glibc")
+        )
+        self.assertEqual(si.for_arch("depends", "x86_64", "suite-extra"), ("suite-core",))
+        self.assertEqual(si.version, "1:2.0-1")
+
+    def test_strings_are_interned(self):
+        a = vp_dev.Srcinfo.parse(self.TEXT.splitlines())
+        b = vp_dev.Srcinfo.parse(self.TEXT.splitlines())
+        self.assertIs(a.get("depends")[0], b.get("depends")[0])
+        self.assertFalse(hasattr(a.base, "__dict__"))
+
+    def test_requires_pkgbase_and_pkgname(self):
+        self.assertIsNone(vp_dev.Srcinfo.parse(["pkgbase = x", "pkgver = 1"]))
+        self.assertIsNone(vp_dev.Srcinfo.parse(["pkgname = x"]))
+
+    def test_from_data_matches_rendered_srcinfo(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            d = Path(tmpdir)
+            (d / "PKGBUILD").write_text(TestPkgbuildEvaluator.SPLIT)
+            with vp_dev.PkgbuildEvaluator(jobs=1) as ev:
+                si = vp_dev.Srcinfo.from_data(ev.evaluate_many([d])[d])
+        self.assertEqual(si.pkgnames, ("one", "two"))
+        self.assertEqual(si.get("depends", "two"), ())
+        self.assertEqual(si.get("makedepends", "two"), ("nasm",))
+
+    @patch("vp_dev.info")
+    def test_check_and_list_read_every_split_package(self, _info):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            d = Path(tmpdir) / "suite"
+            d.mkdir()
+            (d / "PKGBUILD").touch()
+            os.utime(d / "PKGBUILD", (time.time() - 10,) * 2)
+            (d / ".SRCINFO").write_text(self.TEXT.replace("\tpkgdesc = The suite\n", ""))
+            vd = vp_dev.VpDev()
+            vd.root = Path(tmpdir)
+            vd.files_cache = {d: []}
+            errs, msgs = vd._check_pkg_parallel(d)
+            self.assertEqual(errs, 0)
+            self.assertIn((vp_dev.warn, "suite/suite-core: Missing description"), msgs)
+            out = io.StringIO()
+            with patch("sys.stdout", out):
+                vd.list()
+            self.assertEqual(
+                [line.split()[:2] for line in out.getvalue().splitlines()],
+                [["suite-core", "1:2.0-1"], ["suite-extra", "1:2.0-1"]],
+            )
+
+
+# ─── Dependency graph ─────────────────────────────────────────────────────────
+
+def _meta(pkgbase, *pkgs, **base):
+    """Srcinfo from keyword attrs; ``pkgs`` are names or (name, attrs) pairs."""
+    lines = [f"pkgbase = {pkgbase}"]
+    for k, vs in base.items():
+        lines += [f"\t{k} = {v}" for v in vs]
+    for p in pkgs or (pkgbase,):
+        name, attrs = (p, {}) if isinstance(p, str) else p
+        lines.append(f"pkgname = {name}")
+        for k, vs in attrs.items():
+            lines += [f"\t{k} = {v}" for v in vs]
+    return vp_dev.Srcinfo.parse(lines)
+
+
+class TestBuildGraph(unittest.TestCase):
+    def test_edges_from_depends_makedepends_and_provides(self):
+        g = vp_dev.BuildGraph.from_metadata(
+            {
+                "llvm": _meta("llvm", ("llvm", {"provides": ["clang=21"]})),
+                "mesa": _meta("mesa", makedepends=["clang>=20"], depends=["glibc"]),
+                "app": _meta("app", depends_x86_64=["mesa"]),
+                "other": _meta("other", depends_aarch64=["mesa"]),
+            }
+        )
+        self.assertEqual(g.deps["mesa"], {"llvm": "clang>=20"})
+        self.assertEqual(g.deps["app"], {"mesa": "mesa"})
+        self.assertEqual(g.deps["other"], {})
+        self.assertEqual(g.rdeps["llvm"], ["mesa"])
+
+    def test_split_siblings_and_exact_names_win(self):
+        g = vp_dev.BuildGraph.from_metadata(
+            {
+                "zlib": _meta("zlib", "zlib-ng", ("zlib-ng-compat", {"depends": ["zlib-ng"]})),
+                "fork": _meta("fork", ("zlib-alt", {"provides": ["zlib-ng"]})),
+                "user": _meta("user", depends=["zlib-ng"]),
+            }
+        )
+        self.assertEqual(g.deps["zlib"], {})
+        self.assertEqual(g.deps["user"], {"zlib": "zlib-ng"})
+
+    def test_one_provider_per_dependency(self):
+        g = vp_dev.BuildGraph.from_metadata(
+            {
+                f"java/{jdk}": _meta(jdk, provides=["java-runtime", "java-environment"])
+                for jdk in ("jdk21", "jdk17", "jdk8")
+            }
+            | {
+                "java/java-environment": _meta("jenv-tools", provides=["java-environment"]),
+                "chromium": _meta("chromium", makedepends=["java-runtime", "java-environment"]),
+            }
+        )
+        self.assertEqual(
+            g.deps["chromium"],
+            {"java/jdk17": "java-runtime", "java/java-environment": "java-environment"},
+        )
+
+    def test_cycle_is_reported_with_its_edges(self):
+        g = vp_dev.BuildGraph.from_metadata(
+            {
+                "a": _meta("a", depends=["b"]),
+                "b": _meta("b", makedepends=["c>1"]),
+                "c": _meta("c", depends=["a"]),
+                "d": _meta("d", depends=["a"]),
+            }
+        )
+        cycle = g.find_cycle()
+        self.assertEqual(cycle, ["a", "b", "c", "a"])
+        self.assertEqual(
+            g.describe_cycle(cycle),
+            "a (needs 'b') -> b (needs 'c>1') -> c (needs 'a') -> a",
+        )
+        with self.assertRaises(ValueError):
+            g.schedule()
+        self.assertIsNone(g.subgraph(["a", "b", "d"]).find_cycle())
+
+    def test_schedule_is_critical_path_first(self):
+        g = vp_dev.BuildGraph(
+            {
+                "leaf": {},
+                "base": {},
+                "mid": {"base": "base"},
+                "top": {"mid": "mid"},
+                "side": {"base": "base"},
+            }
+        )
+        order = g.schedule()
+        # mid becomes ready once base is done and outranks the lone leaf
+        self.assertEqual([d for d, _ in order][:2], ["base", "mid"])
+        self.assertEqual(dict(order)["base"], 3)
+        pos = {d: i for i, (d, _) in enumerate(order)}
+        self.assertLess(pos["mid"], pos["side"])
+        self.assertLess(pos["mid"], pos["top"])
+
+    def test_plan_prints_tsv_for_requested_packages(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            for name, extra in (("lib", ""), ("app", "depends=(lib)\n"), ("tool", "")):
+                (root / name).mkdir()
+                (root / name / "PKGBUILD").write_text(
+                    f"pkgname={name}\npkgver=1\npkgrel=1\narch=(any)\n{extra}"
+                )
+            vd = vp_dev.VpDev()
+            vd.root = root
+            vd.cache_dir = root / ".cache"
+            vd.files_cache = {}
+            out = io.StringIO()
+            with patch("sys.stdout", out), patch("sys.stderr", io.StringIO()):
+                self.assertEqual(vd.plan(["app", "lib"]), 0)
+            self.assertEqual(
+                out.getvalue(), "lib\t1200\t600\t0\t\napp\t600\t600\t0\tlib\n"
+            )
+
+
+class TestAffected(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        pkgs = {
+            "lib": "",
+            "app": "depends=(lib)\n",
+            "tool": "",
+            "java": "",
+            "java/jdk": "makedepends=(app)\n",
+        }
+        for name, extra in pkgs.items():
+            (self.root / name).mkdir(parents=True)
+            (self.root / name / "PKGBUILD").write_text(
+                f"pkgname={name.replace('/', '-')}\npkgver=1\npkgrel=1\narch=(any)\n{extra}"
+            )
+        (self.root / "tools/lib").mkdir(parents=True)
+        (self.root / "tools/lib/helpers.sh").write_text("# helpers\n")
+        self._git("init", "-q")
+        self._commit("base")
+        self.vd = vp_dev.VpDev()
+        self.vd.root = self.root
+        self.vd.git = "git"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _git(self, *args):
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+            cwd=self.root,
+            check=True,
+            capture_output=True,
+        )
+
+    def _commit(self, msg):
+        self._git("add", "-A")
+        self._git("commit", "-q", "-m", msg)
+
+    def _affected(self):
+        out = io.StringIO()
+        with patch("sys.stdout", out), patch("sys.stderr", io.StringIO()):
+            rc = self.vd.affected("HEAD~1..HEAD")
+        return rc, out.getvalue().split()
+
+    def test_changed_leaf_selects_only_itself(self):
+        (self.root / "tool" / "fix.patch").write_text("x")
+        self._commit("tool")
+        self.assertEqual(self._affected(), (0, ["tool"]))
+
+    def test_reverse_dependencies_and_nested_dirs(self):
+        (self.root / "lib" / "sub").mkdir()
+        (self.root / "lib" / "sub" / "a.patch").write_text("x")
+        (self.root / "java" / "README").write_text("x")
+        self._commit("lib")
+        self.assertEqual(self._affected(), (0, ["app", "java", "java/jdk", "lib"]))
+
+    def test_global_input_selects_everything(self):
+        (self.root / "tools/lib/helpers.sh").write_text("# changed\n")
+        self._commit("helpers")
+        rc, dirs = self._affected()
+        self.assertEqual(dirs, ["app", "java", "java/jdk", "lib", "tool"])
+
+    @patch("vp_dev.err")
+    def test_bad_range(self, mock_err):
+        self.assertEqual(self.vd.affected("nope..HEAD"), 1)
+        mock_err.assert_called_once()
+
+
+# ─── Artifact cache ───────────────────────────────────────────────────────────
+
+
+class TestArtifactCache(unittest.TestCase):
+    PKGBUILD = (
+        "pkgname=foo\npkgver=1.0\npkgrel=1\narch=(x86_64)\n"
+        "source=(https://x/foo-1.0.tar.gz fix.patch)\n"
+        "sha256sums=(abc SKIP)\n"
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.pkg = self.root / "foo"
+        self.pkg.mkdir()
+        (self.pkg / "PKGBUILD").write_text(self.PKGBUILD)
+        (self.pkg / "fix.patch").write_text("patch v1\n")
+        self.conf = self.root / "makepkg.conf"
+        self.conf.write_text("CFLAGS=-O2\n")
+        self.vd = vp_dev.VpDev()
+        self.vd.root = self.root
+        self.vd.cache_dir = self.root / ".cache"
+        self.vd.files_cache = {}
+        for target, value in (
+            ("vp_dev.toolchain_fingerprint", lambda: "gcc 15.1.1"),
+            ("vp_dev.makepkg_conf_files", lambda: [self.conf]),
+        ):
+            p = patch(target, value)
+            p.start()
+            self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _key(self):
+        self.vd.eval_results.clear()
+        return self.vd._artifact_key(self.pkg)[0]
+
+    def test_key_tracks_every_input(self):
+        k = self._key()
+        self.assertEqual(len(k), 64)
+        self.assertEqual(self._key(), k)
+        keys = {k}
+        (self.pkg / "fix.patch").write_text("patch v2\n")
+        keys.add(self._key())
+        self.conf.write_text("CFLAGS=-O3\n")
+        keys.add(self._key())
+        with patch.dict(os.environ, {"RUSTFLAGS": "-C opt-level=3"}):
+            keys.add(self._key())
+        with patch("vp_dev.toolchain_fingerprint", lambda: "gcc 16.0.0"):
+            keys.add(self._key())
+        (self.pkg / "PKGBUILD").write_text(
+            self.PKGBUILD.replace("pkgrel=1", "pkgrel=2")
+        )
+        keys.add(self._key())
+        (self.pkg / "README.md").write_text("docs only\n")
+        keys.add(self._key())
+        self.assertEqual(len(keys), 6)
+
+    def test_unpinned_inputs_are_not_cacheable(self):
+        for source, sums in (
+            ("git+https://x/foo.git", "SKIP"),
+            ("https://x/foo.tar.gz", "SKIP"),
+            ("missing.patch", "SKIP"),
+        ):
+            (self.pkg / "PKGBUILD").write_text(
+                f"pkgname=foo\npkgver=1\npkgrel=1\nsource=({source})\nsha256sums=({sums})\n"
+            )
+            self.assertIsNone(self._key(), source)
+        (self.pkg / "PKGBUILD").write_text(
+            "pkgname=foo\npkgver=1\npkgrel=1\n"
+            "source=(foo::git+https://x/foo.git#commit=abc)\nsha256sums=(SKIP)\n"
+        )
+        self.assertIsNotNone(self._key())
+
+    def test_key_explains_uncacheable_on_stderr(self):
+        (self.pkg / "PKGBUILD").write_text(
+            "pkgname=foo\npkgver=1\npkgrel=1\nsource=(https://x/foo.tar.gz)\nsha256sums=(SKIP)\n"
+        )
+        out, log = io.StringIO(), io.StringIO()
+        with patch("sys.stdout", out), patch("sys.stderr", log):
+            self.assertEqual(self.vd.artifact("key", "foo"), 1)
+        self.assertEqual(out.getvalue(), "")
+        self.assertIn("foo: not cacheable:", log.getvalue())
+
+    @patch("vp_dev.ok")
+    @patch("vp_dev.info")
+    def test_store_then_restore(self, _info, _ok):
+        key = self._key()
+        self.assertEqual(self.vd.artifact("restore", "foo", key), 1)
+        built = self.pkg / "foo-1.0-1-x86_64.pkg.tar.zst"
+        built.write_bytes(b"pkg")
+        (self.pkg / "foo-0.9-1-x86_64.pkg.tar.zst").write_bytes(b"old")
+        self.assertEqual(self.vd.artifact("store", "foo", key), 0)
+        built.unlink()
+        self.assertEqual(self.vd.artifact("restore", "foo", key), 0)
+        self.assertEqual(built.read_bytes(), b"pkg")
+        entry = self.vd._artifact_cache().lookup(key)
+        self.assertEqual([f.name for f in entry], ["foo-1.0-1-x86_64.pkg.tar.zst"])
+
+    @patch("vp_dev.ok")
+    def test_store_ignores_stale_srcinfo(self, _ok):
+        key = self._key()
+        (self.pkg / ".SRCINFO").write_text(
+            "pkgbase = foo\n\tpkgver = 0.9\n\tpkgrel = 1\n\npkgname = foo\n"
+        )
+        os.utime(self.pkg / ".SRCINFO", (2**31, 2**31))
+        (self.pkg / "foo-1.0-1-x86_64.pkg.tar.zst").write_bytes(b"pkg")
+        self.assertEqual(self.vd.artifact("store", "foo", key), 0)
+        entry = self.vd._artifact_cache().lookup(key)
+        self.assertEqual([f.name for f in entry], ["foo-1.0-1-x86_64.pkg.tar.zst"])
+
+    def test_prune_evicts_least_recently_used(self):
+        cache = vp_dev.ArtifactCache(self.root / "art")
+        f = self.root / "a.pkg.tar.zst"
+        f.write_bytes(b"x" * 1000)
+        for i, key in enumerate(("aa11", "bb22", "cc33")):
+            cache.store(key, [f], {})
+            os.utime(cache._entry(key), (100 + i, 100 + i))
+        cache.restore("aa11", self.root)  # touching aa11 makes bb22 the oldest
+        size = cache.entries()[0][1]
+        self.assertEqual(cache.prune(2 * size), (1, size))
+        self.assertIsNone(cache.lookup("bb22"))
+        self.assertIsNotNone(cache.lookup("aa11"))
+
+    def test_parse_size(self):
+        self.assertEqual(vp_dev.parse_size("20G"), 20 << 30)
+        self.assertEqual(vp_dev.parse_size("512MiB"), 512 << 20)
+        self.assertEqual(vp_dev.parse_size("1000"), 1000)
+        with self.assertRaises(ValueError):
+            vp_dev.parse_size("lots")
+
+
+# ─── Build history ────────────────────────────────────────────────────────────
+
+class TestBuildHistory(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.vd = vp_dev.VpDev()
+        self.vd.root = self.root
+        self.vd.cache_dir = self.root / ".cache"
+        self.vd.files_cache = {}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_estimates_use_recent_successful_builds(self):
+        h = vp_dev.BuildHistory(self.root / "h.jsonl")
+        for wall in (1000, 10, 20, 30, 40, 50):
+            h.append({"pkg": "big", "rc": 0, "wall": wall, "cpu": wall * 2, "rss_mb": wall})
+        h.append({"pkg": "big", "rc": 1, "wall": 99999})
+        h.append({"pkg": "docker", "rc": 0, "wall": 5})
+        with (self.root / "h.jsonl").open("a") as f:
+            f.write("not json\n")
+        est = h.estimates()
+        self.assertEqual(est["big"].wall, 30)
+        self.assertEqual(est["big"].cpu, 60)
+        self.assertEqual(est["big"].rss_mb, 50)
+        self.assertEqual(est["big"].samples, 5)
+        self.assertEqual((est["docker"].cpu, est["docker"].rss_mb), (0.0, 0))
+
+    def test_record_logs_cost_and_passes_exit_status(self):
+        rc = self.vd.record(
+            "pkg", [sys.executable, "-c", "x = bytearray(64 << 20); raise SystemExit(3)"]
+        )
+        self.assertEqual(rc, 3)
+        self.assertEqual(self.vd.record("docker", ["true"], wall_only=True), 0)
+        recs = list(self.vd._history().records())
+        self.assertEqual([(r["pkg"], r["rc"]) for r in recs], [("pkg", 3), ("docker", 0)])
+        self.assertGreaterEqual(recs[0]["rss_mb"], 64)
+        self.assertIn("cpu", recs[0])
+        self.assertNotIn("rss_mb", recs[1])
+
+    def test_record_times_phases_and_compiler_cache(self):
+        makepkg = self.root / "makepkg"
+        makepkg.write_text(
+            "#!/bin/sh\n"
+            "echo '==> Retrieving sources...'\n"
+            "sleep 0.2\n"
+            "printf '\\033[1m==> Starting build()...\\n'\n"
+            'printf \'# a.c\\ndirect_cache_hit\\n# b.c\\ncache_miss\\n\' >"$CCACHE_STATSLOG"\n'
+            "echo '==> Entering fakeroot environment...'\n"
+        )
+        makepkg.chmod(0o755)
+        out = io.BytesIO()
+        stdout = io.TextIOWrapper(out)
+        with patch("sys.stdout", stdout):
+            self.assertEqual(self.vd.record("pkg", [str(makepkg)]), 0)
+        self.assertIn(b"==> Entering fakeroot", out.getvalue())
+        (rec,) = self.vd._history().records()
+        self.assertEqual(list(rec["phases"]), ["deps", "source", "build", "package"])
+        self.assertGreaterEqual(rec["phases"]["source"]["wall"], 0.2)
+        self.assertIn("cpu", rec["phases"]["build"])
+        self.assertEqual(rec["cache"], {"tool": "ccache", "hits": 1, "misses": 1})
+        self.assertIn("write_mb", rec)
+        self.assertEqual(list(self.vd.cache_dir.glob("ccache-stats.*")), [])
+
+    def test_stats_flags_regressions(self):
+        h = self.vd._history()
+        for wall in (100, 110, 90, 100):
+            h.append({"pkg": "steady", "rc": 0, "wall": wall, "cpu": wall, "rss_mb": 500})
+        for wall in (100, 100, 160):
+            h.append({"pkg": "slower", "rc": 0, "wall": wall, "cpu": 50, "rss_mb": 500})
+        h.append({"pkg": "slower", "rc": 1, "wall": 5})
+        out = io.StringIO()
+        with patch("sys.stdout", out):
+            self.assertEqual(self.vd.stats(), 0)
+        rows = [line.split()[:4] for line in out.getvalue().splitlines()[1:3]]
+        self.assertEqual(rows, [["slower", "3", "2m40s", "+60%"], ["steady", "4", "1m40s", "+0%"]])
+        self.assertIn("1 package(s) regressed", out.getvalue())
+        self.assertIn("slower (+60% wall)", out.getvalue())
+        out = io.StringIO()
+        with patch("sys.stdout", out):
+            self.assertEqual(self.vd.stats(["slower"]), 0)
+        self.assertEqual(len(out.getvalue().splitlines()), 5)
+        self.assertIn("rc=1", out.getvalue())
+
+    def test_classify_build_log(self):
+        def classify(*lines):
+            f = vp_dev.classify_build_log("\n".join(lines))
+            return f.kind, f.stage, f.retry, f.resume
+
+        start = ["==> Retrieving sources...", "==> Extracting sources..."]
+        build = [*start, "==> Starting prepare()...", "==> Starting build()..."]
+        self.assertEqual(
+            classify(
+                *build,
+                "c++: fatal error: Killed signal terminated program cc1plus",
+                "make: *** [Makefile:9: a.o] Error 1",
+            ),
+            ("oom", "build", True, ("--noextract",)),
+        )
+        self.assertEqual(
+            classify(*build, "a.c:1:1: error: expected ';'", "==> ERROR: A failure occurred."),
+            ("compile", "build", False, ("--noextract",)),
+        )
+        self.assertEqual(
+            classify("==> Retrieving sources...", "curl: (6) Could not resolve host: x.org"),
+            ("network", "source", True, ("-C",)),
+        )
+        # curl's own output for a dead source URL, as makepkg shows it
+        self.assertEqual(
+            classify(
+                "==> Retrieving sources...",
+                "  -> Downloading foo-1.0.tar.gz...",
+                "curl: (22) The requested URL returned error: 404",
+                "==> ERROR: Failure while downloading https://example.com/foo-1.0.tar.gz",
+                "    Aborting...",
+            ),
+            ("download", "source", False, ("-C",)),
+        )
+        self.assertEqual(
+            classify("curl: (22) The requested URL returned error: 503")[:3],
+            ("network", "deps", True),
+        )
+        self.assertEqual(
+            classify(*start, "tar: x: Cannot write: No space left on device"),
+            ("disk", "extract", False, ("-C",)),
+        )
+        self.assertEqual(
+            classify(*build, "==> Entering fakeroot environment...", "==> ERROR: A failure."),
+            ("unknown", "package", True, ("--repackage",)),
+        )
+        # causes scrolled out of the tail are ignored
+        noise = ["warning: Could not resolve host"] + ["ok"] * vp_dev.FAILURE_TAIL
+        self.assertEqual(classify(*build, *noise)[0], "unknown")
+        log = self.root / "build.log"
+        log.write_text("\n".join([*build, "ld: undefined reference to `foo'"]))
+        out = io.StringIO()
+        with patch("sys.stdout", out):
+            self.assertEqual(self.vd.classify(str(log)), 0)
+        self.assertEqual(
+            out.getvalue(),
+            "compile\tbuild\t0\t--noextract\tld: undefined reference to `foo'\n",
+        )
+
+    def test_makespan_is_lpt_and_caps_heavy_builds(self):
+        g = vp_dev.BuildGraph({"a": {}, "b": {}, "c": {}, "d": {}, "e": {}})
+        cost = {"a": 3, "b": 3, "c": 2, "d": 2, "e": 2}
+        self.assertEqual([d for d, _ in g.schedule(cost)], ["a", "b", "c", "d", "e"])
+        # LPT on two slots: a,b then c,d then e
+        self.assertEqual(g.makespan(cost, 2), 7)
+        # heavy a and b may not overlap: a,c -> a,d -> b,d -> b,e
+        self.assertEqual(g.makespan(cost, 2, frozenset({"a", "b"})), 6)
+        self.assertEqual(g.makespan(cost, 1, frozenset({"a", "b"})), 12)
+        chain = vp_dev.BuildGraph({"lib": {}, "app": {"lib": "lib"}, "x": {}})
+        self.assertEqual(chain.makespan({"lib": 5, "app": 5, "x": 1}, 4), 10)
+
+    def test_plan_orders_by_recorded_duration(self):
+        for name in ("quick", "slow", "new"):
+            (self.root / name).mkdir()
+            (self.root / name / "PKGBUILD").write_text(
+                f"pkgname={name}\npkgver=1\npkgrel=1\narch=(any)\n"
+            )
+        h = self.vd._history()
+        h.append({"pkg": "quick", "rc": 0, "wall": 10, "rss_mb": 100})
+        h.append({"pkg": "slow", "rc": 0, "wall": 3600, "rss_mb": 9000})
+        out, log = io.StringIO(), io.StringIO()
+        with patch("sys.stdout", out), patch("sys.stderr", log):
+            self.assertEqual(self.vd.plan(jobs=2), 0)
+        rows = [line.split("\t") for line in out.getvalue().splitlines()]
+        self.assertEqual(
+            rows,
+            [
+                ["slow", "3600", "3600", "1", ""],
+                ["new", "1805", "1805", "0", ""],
+                ["quick", "10", "10", "0", ""],
+            ],
+        )
+        self.assertIn("Predicted makespan 1h00m on 2 job(s)", log.getvalue())
+
+
+# ─── check-upstream ───────────────────────────────────────────────────────────
+
+class TestCheckUpstream(unittest.TestCase):
+    LATENCY = 0.3
+
+    def setUp(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.vd = vp_dev.VpDev()
+        self.vd.root = self.root
+        self.vd.cache_dir = self.root / ".cache"
+        self.routes = {
+            "/repos/o/rel/releases/latest": {"tag_name": "v2.1.0"},
+            "/repos/o/tags/tags?per_page=100": [
+                {"name": "v1.9"}, {"name": "v1.10-rc1"}, {"name": "v1.10"}, {"name": "nightly"},
+            ],
+            "/repos/o/head/commits?per_page=1": [
+                {"sha": "abc123", "commit": {"committer": {"date": "2026-01-02T03:04:05Z"}}}
+            ],
+            "/api/v4/projects/mesa%2Fmesa/repository/tags?per_page=100": [
+                {"name": "mesa-25.0.1"}, {"name": "mesa-25.1.0-rc2"}, {"name": "mesa-24.3.9"},
+            ],
+            "/dl/": "tool-1.2.tar.gz tool-1.10.tar.gz tool-1.3.tar.gz",
+        }
+        self.in_flight = self.peak = 0
+        self.hits: list[tuple[str, int]] = []
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                with lock:
+                    test.in_flight += 1
+                    test.peak = max(test.peak, test.in_flight)
+                time.sleep(test.LATENCY)
+                with lock:
+                    test.in_flight -= 1
+                body = test.routes.get(self.path)
+                status = 404 if body is None else 200
+                data = (body if isinstance(body, str) else json.dumps(body)).encode()
+                etag = '"%d"' % hash(data)
+                if status == 200 and self.headers.get("If-None-Match") == etag:
+                    status, data = 304, b""
+                with lock:
+                    test.hits.append((self.path, status))
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(data)))
+                if status == 200:
+                    self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        import threading
+
+        lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        base = "http://%s:%d" % self.server.server_address[:2]
+        self.transport = vp_dev.HttpTransport(
+            redirect={h: base for h in ("api.github.com", "gitlab.freedesktop.org", "example.org")}
+        )
+
+        self.git_url = self.root / "upstream.git"
+        env = {**os.environ, "GIT_AUTHOR_NAME": "t", "GIT_AUTHOR_EMAIL": "t@t",
+               "GIT_COMMITTER_NAME": "t", "GIT_COMMITTER_EMAIL": "t@t"}
+        subprocess.run(["git", "init", "-q", "-b", "main", str(self.git_url)], check=True)
+        subprocess.run(["git", "-C", str(self.git_url), "commit", "-q", "--allow-empty", "-m", "x"],
+                       check=True, env=env)
+        for tag in ("v0.9", "v0.10", "v0.10b1"):
+            subprocess.run(["git", "-C", str(self.git_url), "tag", tag], check=True)
+        self.head = subprocess.run(["git", "-C", str(self.git_url), "rev-parse", "HEAD"],
+                                   capture_output=True, text=True, check=True).stdout.strip()
+
+        (self.root / "old_ver.json").write_text(json.dumps({"rel": "2.0.0", "manual": "7"}))
+        (self.root / "nvchecker.toml").write_text(f"""\
+[__config__]
+oldver = "old_ver.json"
+newver = "out/new_ver.json"
+
+[rel]
+source = "github"
+github = "o/rel"
+use_latest_release = true
+prefix = "v"
+
+[tags]
+source = "github"
+github = "o/tags"
+use_max_tag = true
+include_regex = "v[0-9.]+"
+prefix = "v"
+
+[head]
+source = "github"
+github = "o/head"
+
+[mesa]
+source = "gitlab"
+host = "gitlab.freedesktop.org"
+gitlab = "mesa/mesa"
+use_max_tag = true
+include_regex = "mesa-[0-9.]+"
+prefix = "mesa-"
+
+[tool]
+source = "regex"
+url = "https://example.org/dl/"
+regex = "tool-([0-9.]+)\\\\.tar\\\\.gz"
+
+[gittags]
+source = "git"
+git = "{self.git_url}"
+prefix = "v"
+
+[gitcommit]
+source = "git"
+git = "{self.git_url}"
+branch = "main"
+use_commit = true
+
+[manual]
+""")
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.transport.close()
+        self.tmp.cleanup()
+
+    def _run(self, *args, **kw):
+        out, log = io.StringIO(), io.StringIO()
+        with patch("sys.stdout", out), patch("sys.stderr", log):
+            rc = self.vd.check_upstream(
+                *args, config=str(self.root / "nvchecker.toml"), transport=self.transport, **kw
+            )
+        return rc, out.getvalue(), log.getvalue()
+
+    def test_version_key(self):
+        vs = ["1.0", "1.0rc1", "1.0.1", "0.9", "1.10", "1.2"]
+        self.assertEqual(sorted(vs, key=vp_dev.version_key),
+                         ["0.9", "1.0rc1", "1.0", "1.0.1", "1.2", "1.10"])
+
+    def test_checks_all_sources_concurrently(self):
+        t0 = time.monotonic()
+        rc, out, log = self._run()
+        elapsed = time.monotonic() - t0
+        self.assertEqual(rc, 0, log)
+        new = json.loads((self.root / "out" / "new_ver.json").read_text())
+        self.assertEqual(new, {
+            "rel": "2.1.0",
+            "tags": "1.10",
+            "head": "20260102.030405",
+            "mesa": "25.0.1",
+            "tool": "1.10",
+            "gittags": "0.10",
+            "gitcommit": self.head,
+            "manual": "7",
+        })
+        self.assertIn("rel: 2.0.0 -> 2.1.0", out)
+        self.assertNotIn("manual", out)
+        # Five HTTP requests in flight together: about one latency in total.
+        self.assertEqual(self.peak, 5)
+        self.assertLess(elapsed, 3 * self.LATENCY)
+
+    def test_per_host_limit_and_failures(self):
+        del self.routes["/repos/o/rel/releases/latest"]
+        self.transport = vp_dev.HttpTransport(per_host=1, redirect=self.transport.redirect)
+        t0 = time.monotonic()
+        rc, _, log = self._run(["rel", "tags", "head"])
+        self.assertGreaterEqual(time.monotonic() - t0, 3 * self.LATENCY)
+        self.assertEqual(rc, 1)
+        self.assertIn("rel: HTTP 404", log)
+        self.assertEqual(self.peak, 1)
+        new = json.loads((self.root / "out" / "new_ver.json").read_text())
+        self.assertEqual(new["rel"], "2.0.0")
+        self.assertEqual(new["tags"], "1.10")
+
+    def test_identical_urls_are_fetched_once_and_revalidated(self):
+        with (self.root / "nvchecker.toml").open("a") as f:
+            f.write('[tags2]\nsource = "github"\ngithub = "o/tags"\nuse_max_tag = true\n'
+                    'include_regex = "v[0-9.]+-rc[0-9]+"\n')
+        rc, _, _ = self._run(["tags", "tags2", "tool"])
+        self.assertEqual(rc, 0)
+        self.assertEqual(sorted(self.hits), [
+            ("/dl/", 200), ("/repos/o/tags/tags?per_page=100", 200),
+        ])
+        new = json.loads((self.root / "out" / "new_ver.json").read_text())
+        self.assertEqual((new["tags"], new["tags2"]), ("1.10", "v1.10-rc1"))
+
+        self.hits.clear()
+        self.routes["/dl/"] = "tool-1.11.tar.gz"
+        rc, out, _ = self._run(["tags", "tags2", "tool"])
+        self.assertEqual(rc, 0)
+        self.assertEqual(sorted(self.hits), [
+            ("/dl/", 200), ("/repos/o/tags/tags?per_page=100", 304),
+        ])
+        self.assertIn("tool: (none) -> 1.11", out)
+        self.assertIn("HTTP cache: 2/3 hits (67%); 1 coalesced, 1 not modified, 1 fetched", out)
+        new = json.loads((self.root / "out" / "new_ver.json").read_text())
+        self.assertEqual(new["tags"], "1.10")
+
+    def test_api_prints_body(self):
+        with patch.dict(os.environ, {"GITHUB_API_URL": "https://api.github.com"}), \
+                patch.object(vp_dev, "HttpTransport", lambda: self.transport):
+            out = io.BytesIO()
+            stdout = io.TextIOWrapper(out)
+            with patch("sys.stdout", stdout):
+                self.assertEqual(self.vd.api("repos/o/rel/releases/latest"), 0)
+            self.assertEqual(json.loads(out.getvalue()), {"tag_name": "v2.1.0"})
+            with patch("sys.stderr", io.StringIO()) as log:
+                self.assertEqual(self.vd.api("/repos/o/missing"), 1)
+            self.assertIn("HTTP 404", log.getvalue())
+
+    def test_dry_run_and_unknown_names(self):
+        rc, _, _ = self._run(["tool"], dry_run=True)
+        self.assertEqual(rc, 0)
+        self.assertFalse((self.root / "out" / "new_ver.json").exists())
+        rc, _, log = self._run(["nope"])
+        self.assertEqual(rc, 1)
+        self.assertIn("nope", log)
+
+
+# ─── bump / updpkgsums / fetch ────────────────────────────────────────────────
+
+class TestBump(unittest.TestCase):
+    LATENCY = 0.4
+
+    def setUp(self):
+        import hashlib
+        import threading
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.vd = vp_dev.VpDev()
+        self.vd.root = self.root
+        self.vd.cache_dir = self.root / ".cache"
+        self.files = {"/alpha-2.0.tar.gz": b"alpha two", "/beta-1.5.tar.gz": b"beta",
+                      "/alpha-1.0.tar.gz": b"alpha one"}
+        self.sha = lambda b: hashlib.sha256(b).hexdigest()
+        self.fetched = []
+        test = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                time.sleep(test.LATENCY)
+                test.fetched.append(self.path)
+                data = test.files.get(self.path)
+                self.send_response(404 if data is None else 200)
+                self.send_header("Content-Length", str(len(data or b"")))
+                self.end_headers()
+                self.wfile.write(data or b"")
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        url = "http://%s:%d" % self.server.server_address[:2]
+        local = b"patch\n"
+        for name, ver in (("alpha", "1.0"), ("beta", "1.4")):
+            d = self.root / name
+            d.mkdir()
+            (d / "fix.patch").write_bytes(local)
+            (d / "PKGBUILD").write_text(f"""\
+pkgname={name}
+pkgver='{ver}'  # upstream release
+pkgrel=3
+arch=(any)
+source=("{url}/$pkgname-$pkgver.tar.gz"
+        fix.patch
+        "git+https://example.com/{name}.git")
+sha256sums=('{self.sha(b"old")}'
+            '{self.sha(local)}'
+            'SKIP')
+""")
+        (self.root / "vcs-git").mkdir()
+        (self.root / "vcs-git" / "PKGBUILD").write_text(
+            "pkgname=vcs-git\npkgver=1\npkgrel=1\narch=(any)\npkgver() { echo 2; }\n"
+        )
+        (self.root / "nvchecker.toml").write_text(
+            '[__config__]\noldver = "old.json"\nnewver = "new.json"\n'
+        )
+        (self.root / "old.json").write_text(
+            json.dumps({"alpha": "1.0", "beta": "1.4", "vcs-git": "1", "same": "3"})
+        )
+        (self.root / "new.json").write_text(
+            json.dumps({"alpha": "v2.0", "beta": "1.5", "vcs-git": "2", "same": "3"})
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp.cleanup()
+
+    def _run_cmd(self, fn, *args, **kw):
+        out, log = io.StringIO(), io.StringIO()
+        with patch("sys.stdout", out), patch("sys.stderr", log):
+            rc = fn(*args, **kw)
+        return rc, out.getvalue(), log.getvalue()
+
+    def _run(self, *args, **kw):
+        return self._run_cmd(self.vd.bump, *args, **kw)
+
+    def test_bump_pkgbuild_preserves_layout(self):
+        text = 'pkgname=x\npkgver="1.2" # keep\n\npkgrel=7\n'
+        new, old, ver = vp_dev.bump_pkgbuild(text, "v1.3-rc.1")
+        self.assertEqual((old, ver), ("1.2", "1.3.rc.1"))
+        self.assertEqual(new, 'pkgname=x\npkgver="1.3.rc.1" # keep\n\npkgrel=1\n')
+        with self.assertRaisesRegex(ValueError, "not a literal"):
+            vp_dev.bump_pkgbuild("pkgver=${_v}\n", "2")
+        self.assertEqual(vp_dev.pkgver_for("v2", "v1"), "v2")
+
+    def test_bumps_all_packages_in_one_pass(self):
+        t0 = time.monotonic()
+        rc, out, log = self._run(config=str(self.root / "nvchecker.toml"))
+        elapsed = time.monotonic() - t0
+        self.assertEqual(rc, 0, log)
+        self.assertIn("alpha: 1.0 -> 2.0", out)
+        self.assertIn("beta: 1.4 -> 1.5", out)
+        self.assertIn("vcs-git: pkgver() computes the version, skipped", out)
+        self.assertNotIn("same", out)
+        pb = (self.root / "alpha" / "PKGBUILD").read_text()
+        self.assertIn("pkgver='2.0'  # upstream release\npkgrel=1\n", pb)
+        self.assertIn(f"sha256sums=('{self.sha(b'alpha two')}'\n", pb)
+        self.assertIn(f"            '{self.sha(b'patch' + bytes([10]))}'\n            'SKIP')", pb)
+        srcinfo = (self.root / "beta" / ".SRCINFO").read_text()
+        self.assertIn("\tpkgver = 1.5\n\tpkgrel = 1\n", srcinfo)
+        self.assertIn(f"\tsha256sums = {self.sha(b'beta')}\n", srcinfo)
+        # Both downloads overlapped.
+        self.assertEqual(sorted(self.fetched), ["/alpha-2.0.tar.gz", "/beta-1.5.tar.gz"])
+        self.assertLess(elapsed, 2 * self.LATENCY)
+
+    def test_bump_to_fails_when_pkgver_is_computed(self):
+        before = (self.root / "vcs-git" / "PKGBUILD").read_text()
+        rc, out, log = self._run(["vcs-git"], to="3")
+        self.assertEqual(rc, 1)
+        self.assertIn("vcs-git: cannot bump to 3: pkgver() computes the version", log)
+        self.assertNotIn("Nothing to bump", out)
+        self.assertEqual((self.root / "vcs-git" / "PKGBUILD").read_text(), before)
+        rc, _, log = self._run(["missing"], to="3")
+        self.assertEqual(rc, 1)
+        self.assertIn("missing: no PKGBUILD", log)
+
+    def test_failed_download_restores_pkgbuild(self):
+        del self.files["/beta-1.5.tar.gz"]
+        before = (self.root / "beta" / "PKGBUILD").read_text()
+        rc, _, log = self._run(["beta"], config=str(self.root / "nvchecker.toml"))
+        self.assertEqual(rc, 1)
+        self.assertIn("beta: HTTP Error 404", log)
+        self.assertEqual((self.root / "beta" / "PKGBUILD").read_text(), before)
+        self.assertFalse((self.root / "beta" / ".SRCINFO").exists())
+
+    def test_updpkgsums_whole_tree_through_source_store(self):
+        self.vd.cache_dir = self.root / ".cache"
+        self.files["/beta-1.4.tar.gz"] = b"beta old"
+        t0 = time.monotonic()
+        rc, out, log = self._run_cmd(self.vd.updpkgsums)
+        self.assertEqual(rc, 0, log)
+        self.assertLess(time.monotonic() - t0, 2 * self.LATENCY)
+        self.assertIn("alpha: updated 1 checksum(s) and .SRCINFO", out)
+        self.assertIn("2 of 3 package(s) had new checksums", out)
+        pb = (self.root / "alpha" / "PKGBUILD").read_text()
+        self.assertIn(f"sha256sums=('{self.sha(b'alpha one')}'\n", pb)
+        self.assertIn(f"sha256sums = {self.sha(b'beta old')}", (self.root / "beta" / ".SRCINFO").read_text())
+        obj = vp_dev.SourceStore(self.root / ".cache" / "sources").object(self.sha(b"alpha one"))
+        self.assertEqual(obj.read_bytes(), b"alpha one")
+
+        self.fetched.clear()
+        rc, out, _ = self._run_cmd(self.vd.updpkgsums, ["alpha"])
+        self.assertEqual(rc, 0)
+        self.assertEqual(self.fetched, [])
+        self.assertIn("0 of 1 package(s) had new checksums", out)
+
+    def test_source_store_adds_digests_without_refetching(self):
+        store = vp_dev.SourceStore(self.root / "store")
+        url = "http://%s:%d/beta-1.5.tar.gz" % self.server.server_address[:2]
+        self.assertEqual(store.hashes(url, ["sha256"]), {"sha256": self.sha(b"beta")})
+        import hashlib
+        self.assertEqual(store.hashes(url + "#frag", ["b2", "sha256"])["b2"],
+                         hashlib.blake2b(b"beta").hexdigest())
+        self.assertEqual(self.fetched, ["/beta-1.5.tar.gz"])
+        self.assertEqual(store.lookup(url)["size"], 4)
+
+    def _gamma(self, sha=None):
+        repo = self.root / "upstream"
+        git = ["git", "-c", "user.name=t", "-c", "user.email=t@t", "-C", str(repo)]
+        if not repo.exists():
+            subprocess.run(["git", "init", "-q", str(repo)], check=True)
+            subprocess.run(git + ["commit", "-q", "--allow-empty", "-m", "one"], check=True)
+            subprocess.run(git + ["tag", "v1"], check=True)
+        url = "http://%s:%d" % self.server.server_address[:2]
+        d = self.root / "gamma"
+        d.mkdir(exist_ok=True)
+        (d / "PKGBUILD").write_text(f"""\
+pkgname=gamma
+pkgver=1
+pkgrel=1
+arch=(x86_64)
+source=("{url}/alpha-1.0.tar.gz" "git+file://{repo}#tag=v1")
+source_aarch64=("{url}/never.tar.gz")
+sha256sums=('{sha or self.sha(b"alpha one")}' 'SKIP')
+sha256sums_aarch64=('SKIP')
+""")
+        return d, git
+
+    def test_fetch_links_store_objects_and_git_mirrors(self):
+        d, git = self._gamma()
+        rc, out, log = self._run_cmd(self.vd.fetch, ["gamma"])
+        self.assertEqual(rc, 0, log)
+        self.assertIn("gamma: 2 source(s) ready", out)
+        self.assertIn("Sources: 0 from the store, 2 fetched", out)
+        store = self.vd._source_store()
+        obj = store.object(self.sha(b"alpha one"))
+        self.assertTrue((d / "alpha-1.0.tar.gz").samefile(obj))
+        origin = subprocess.run(["git", "-C", str(d / "upstream"), "config", "remote.origin.url"],
+                                capture_output=True, text=True).stdout.strip()
+        self.assertEqual(origin, f"file://{self.root / 'upstream'}")
+        self.assertEqual(self.fetched, ["/alpha-1.0.tar.gz"])
+
+        # New upstream commits reach the package clone through the mirror.
+        subprocess.run(git + ["commit", "-q", "--allow-empty", "-m", "two"], check=True)
+        subprocess.run(git + ["tag", "v2"], check=True)
+        (d / "alpha-1.0.tar.gz").unlink()
+        rc, out, _ = self._run_cmd(self.vd.fetch, ["gamma"])
+        self.assertEqual(rc, 0)
+        self.assertIn("Sources: 2 from the store, 0 fetched", out)
+        self.assertEqual(self.fetched, ["/alpha-1.0.tar.gz"])
+        self.assertTrue((d / "alpha-1.0.tar.gz").samefile(obj))
+        tags = subprocess.run(["git", "-C", str(d / "upstream"), "tag"],
+                              capture_output=True, text=True).stdout.split()
+        self.assertEqual(tags, ["v1", "v2"])
+
+    def test_fetch_rejects_checksum_mismatch(self):
+        d, _ = self._gamma(sha="0" * 64)
+        rc, _, log = self._run_cmd(self.vd.fetch, ["gamma"])
+        self.assertEqual(rc, 1)
+        self.assertIn("sha256 checksum mismatch", log)
+        self.assertFalse((d / "alpha-1.0.tar.gz").exists())
+
+    def test_fetch_leaves_skip_sources_to_makepkg(self):
+        url = "http://%s:%d/nightly.tar.gz" % self.server.server_address[:2]
+        self.files["/nightly.tar.gz"] = b"monday"
+        d = self.root / "nightly"
+        d.mkdir()
+        (d / "PKGBUILD").write_text(
+            f'pkgname=nightly\npkgver=1\npkgrel=1\narch=(any)\nsource=("{url}")\n'
+            "sha256sums=('SKIP')\n"
+        )
+        # A copy an older run linked from the store is dropped, not reused.
+        store = self.vd._source_store()
+        vp_dev.link_file(store.object(store.hashes(url, ["sha256"])["sha256"]), d / "nightly.tar.gz")
+        self.fetched.clear()
+        rc, out, log = self._run_cmd(self.vd.fetch, ["nightly"])
+        self.assertEqual(rc, 0, log)
+        self.assertIn("0 fetched, 1 unverifiable left to makepkg", out)
+        self.assertEqual(self.fetched, [])
+        self.assertFalse((d / "nightly.tar.gz").exists())
+        with self.assertRaisesRegex(ValueError, "no checksum"):
+            store.fetch(url, {})
+
+    def test_source_store_prune_is_lru(self):
+        store = vp_dev.SourceStore(self.root / "store")
+        base = "http://%s:%d" % self.server.server_address[:2]
+        for i, path in enumerate(("/alpha-1.0.tar.gz", "/beta-1.5.tar.gz", "/alpha-2.0.tar.gz")):
+            sha = store.hashes(base + path, ["sha256"])["sha256"]
+            os.utime(store.object(sha), (1000 + i, 1000 + i))
+        self.assertEqual(store.prune(len(b"alpha two") + len(b"beta")), (1, len(b"alpha one")))
+        self.assertIsNone(store.lookup(base + "/alpha-1.0.tar.gz"))
+        self.assertEqual(len(list((self.root / "store" / "urls").glob("*.json"))), 2)
+        self.assertIsNotNone(store.lookup(base + "/beta-1.5.tar.gz"))
+
+    def test_to_and_dry_run(self):
+        rc, out, _ = self._run(["alpha"], to="2.0", dry_run=True)
+        self.assertEqual((rc, out.strip()), (0, "alpha: 1.0 -> 2.0"))
+        self.assertIn("pkgver='1.0'", (self.root / "alpha" / "PKGBUILD").read_text())
+        rc, _, log = self._run(["alpha", "beta"], to="2.0")
+        self.assertEqual(rc, 1)
+        self.assertIn("exactly one", log)
+
+
 # ─── _parse_pkg ───────────────────────────────────────────────────────────────
 
 class TestParsePkg(unittest.TestCase):
@@ -332,6 +1411,289 @@ def test_parse_pkg_skips_comments(self):
             self.assertEqual(result["description"], "Real description")
 
 
+# ─── Parse cache ──────────────────────────────────────────────────────────────
+
+class TestParseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.vd = vp_dev.VpDev()
+        self.vd.root = self.root
+        self.vd.pkg_json = self.root / "packages.json"
+        self.vd.cache_dir = self.root / ".cache" / "vp-dev"
+        self.pkg = self.root / "mypkg"
+        self.pkg.mkdir()
+        (self.pkg / "PKGBUILD").write_text(
+            "pkgname=mypkg\npkgver=1.0\npkgrel=1\npkgdesc='Cached'\nurl=https://x\n"
+        )
+        self.vd.files_cache = {self.pkg: ["PKGBUILD", "a.patch"]}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    @patch("vp_dev.info")
+    @patch("vp_dev.ok")
+    def test_cache_hit_skips_parsing_and_output_is_identical(self, _ok, _info):
+        self.vd.update(use_cache=False)
+        full = self.vd.pkg_json.read_bytes()
+        self.vd.update()
+        self.assertTrue((self.vd.cache_dir / "parse-cache.json").exists())
+        with patch.object(vp_dev.VpDev, "_parse_pkg") as pp, patch.object(
+            vp_dev.VpDev, "_parse_srcinfo"
+        ) as ps:
+            self.vd.update()
+            pp.assert_not_called()
+            ps.assert_not_called()
+        self.assertEqual(self.vd.pkg_json.read_bytes(), full)
+
+    @patch("vp_dev.info")
+    @patch("vp_dev.ok")
+    def test_changed_pkgbuild_is_reparsed(self, _ok, _info):
+        self.vd.update()
+        (self.pkg / "PKGBUILD").write_text(
+            "pkgname=mypkg\npkgver=2.0\npkgrel=1\npkgdesc='Cached'\nurl=https://x\n"
+        )
+        self.vd.update()
+        data = json.loads(self.vd.pkg_json.read_text())
+        self.assertEqual(data["packages"][0]["version"], "2.0-1")
+
+    def test_file_key_prefers_blob_hash(self):
+        pb = self.pkg / "PKGBUILD"
+        self.vd.index = vp_dev.RepoIndex(
+            self.root, {"mypkg/PKGBUILD": ("100644", "abc123")}
+        )
+        self.assertEqual(self.vd._file_key(pb), "git:abc123")
+        self.vd.index = vp_dev.RepoIndex(self.root, {})
+        expected = subprocess.run(
+            ["git", "hash-object", str(pb)], capture_output=True, text=True
+        ).stdout.strip()
+        self.assertEqual(self.vd._file_key(pb), f"git:{expected}")
+        self.vd.index = None
+        self.assertTrue(self.vd._file_key(pb).startswith("stat:"))
+
+
+# ─── RepoIndex ────────────────────────────────────────────────────────────────
+
+class TestRepoIndex(unittest.TestCase):
+    def test_load_single_git_call_and_groups_files(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            root = Path(tmpdir)
+            subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+            for rel in ("a/PKGBUILD", "a/x.patch", "b/sub/PKGBUILD", "top.md"):
+                (root / rel).parent.mkdir(parents=True, exist_ok=True)
+                (root / rel).write_text(rel)
+            subprocess.run(["git", "add", "-A"], cwd=root, check=True)
+            (root / "a/x.patch").write_text("edited")
+
+            idx = vp_dev.RepoIndex.load(root, "git")
+
+            self.assertEqual(idx.package_dirs(), ["a", "b/sub"])
+            self.assertEqual(sorted(idx.files_by_dir()[root / "a"]), ["PKGBUILD", "x.patch"])
+            self.assertEqual(idx.mode(root / "a/PKGBUILD"), "100644")
+            # Unstaged edits are rehashed so the blob describes the working tree.
+            self.assertEqual(
+                idx.blob(root / "a/x.patch"), vp_dev.blob_hash(root / "a/x.patch")
+            )
+            self.assertTrue(idx.is_tracked(root / "b"))
+            self.assertFalse(idx.is_tracked(root / "a/src"))
+
+    @patch("vp_dev.info")
+    def test_resolve_nested_package(self, _info):
+        vd = vp_dev.VpDev()
+        vd.root = Path("/mock/root")
+        vd.files_cache = {}
+        vd.index = vp_dev.RepoIndex(vd.root, {"java/jdk/PKGBUILD": ("100644", "0")})
+        self.assertEqual(vd._resolve_pkg("jdk"), Path("/mock/root/java/jdk"))
+
+
+# ─── PKGBUILD evaluator ───────────────────────────────────────────────────────
+
+class TestPkgbuildEvaluator(unittest.TestCase):
+    SPLIT = (
+        "pkgbase=base\n"
+        "pkgname=(one two)\n"
+        "_ver=1.2\n"
+        "pkgver=${_ver}\n"
+        "pkgrel=3\n"
+        "pkgdesc='Base desc'\n"
+        "arch=(x86_64)\n"
+        "depends=(a 'b>=1' c)\n"
+        "case $CARCH in x86_64) makedepends=(nasm) ;; esac\n"
+        "if [[ -n $_ver ]]; then source=(\"https://x/$pkgbase-$pkgver.tar.gz\" local.patch); fi\n"
+        "sha256sums=(SKIP SKIP)\n"
+        "read -r answer\n"
+        "package_one() {\n"
+        "  pkgdesc=\"First $pkgname\"\n"
+        "  depends+=(d)\n"
+        "  local provides=(ignored)\n"
+        "  :\n"
+        "}\n"
+        "package_two() {\n"
+        "  depends=()\n"
+        "}\n"
+    )
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _pkg(self, name, text):
+        d = self.root / name
+        d.mkdir()
+        (d / "PKGBUILD").write_text(text)
+        return d
+
+    def test_full_arrays_and_split_overrides(self):
+        d = self._pkg("split", self.SPLIT)
+        with vp_dev.PkgbuildEvaluator(jobs=2) as ev:
+            data = ev.evaluate_many([d])[d]
+        self.assertEqual(data.status, 0)
+        self.assertEqual(data.pkgnames, ["one", "two"])
+        self.assertEqual(data.pkgbase, "base")
+        self.assertEqual(data.base["depends"], ["a", "b>=1", "c"])
+        self.assertEqual(data.base["makedepends"], ["nasm"])
+        self.assertEqual(
+            data.base["source"], ["https://x/base-1.2.tar.gz", "local.patch"]
+        )
+        self.assertEqual(data.packages["one"]["pkgdesc"], ["First one"])
+        # like libmakepkg, "+=" in package_*() appends to the global value
+        self.assertEqual(data.packages["one"]["depends"], ["a", "b>=1", "c", "d"])
+        self.assertNotIn("provides", data.packages["one"])
+        self.assertEqual(data.packages["two"], {"depends": []})
+        self.assertIn("package_one", data.functions)
+
+    def test_batch_isolates_packages(self):
+        a = self._pkg("a", "pkgname=a\npkgver=1\npkgrel=1\nconflicts=(x)\n")
+        b = self._pkg("b", "pkgname=b\npkgver=2\npkgrel=1\n")
+        with vp_dev.PkgbuildEvaluator(jobs=1) as ev:
+            res = ev.evaluate_many([a, b])
+        self.assertEqual(res[a].base["conflicts"], ["x"])
+        self.assertNotIn("conflicts", res[b].base)
+
+    @patch("vp_dev.warn")
+    def test_hanging_pkgbuild_times_out_and_worker_is_replaced(self, mock_warn):
+        slow = self._pkg("slow", "sleep 5\npkgname=slow\n")
+        fast = self._pkg("fast", "pkgname=fast\npkgver=1\npkgrel=1\n")
+        with vp_dev.PkgbuildEvaluator(jobs=1, timeout=0.5) as ev:
+            res = ev.evaluate_many([slow, fast])
+        self.assertIsNone(res[slow])
+        self.assertEqual(res[fast].pkgnames, ["fast"])
+        mock_warn.assert_called_once()
+
+    @patch("vp_dev.warn")
+    def test_timed_out_pkgbuild_process_group_is_killed(self, mock_warn):
+        pids = self.root / "pids"
+        hang = self._pkg(
+            "hang",
+            f"sleep 30 &\necho \"$! $(cut -d' ' -f5 /proc/$!/stat)\" >{pids}\nwait\n",
+        )
+        with vp_dev.PkgbuildEvaluator(jobs=1, timeout=0.5) as ev:
+            self.assertIsNone(ev.evaluate_many([hang])[hang])
+        pid, pgid = map(int, pids.read_text().split())
+        deadline = time.monotonic() + 5
+        while True:
+            try:
+                os.killpg(pgid, 0)
+            except ProcessLookupError:
+                break
+            self.assertLess(time.monotonic(), deadline, f"process group {pgid} survived")
+            time.sleep(0.05)
+        self.assertFalse(Path(f"/proc/{pid}").exists())
+
+    def test_parse_pkg_uses_eval_results(self):
+        d = self._pkg("split", self.SPLIT)
+        vd = vp_dev.VpDev()
+        vd.files_cache = {d: ["PKGBUILD"]}
+        with vp_dev.PkgbuildEvaluator() as ev:
+            vd.eval_results = ev.evaluate_many([d])
+        pi = vd._parse_pkg(d / "PKGBUILD")
+        self.assertEqual(pi["name"], "one")
+        self.assertEqual(pi["version"], "1.2-3")
+        self.assertEqual(pi["description"], "First one")
+
+
+class TestRenderSrcinfo(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _render(self, text, name="pkg"):
+        d = self.root / name
+        d.mkdir()
+        (d / "PKGBUILD").write_text(text)
+        with vp_dev.PkgbuildEvaluator(jobs=1) as ev:
+            return vp_dev.render_srcinfo(ev.evaluate_many([d])[d])
+
+    def test_single_package(self):
+        out = self._render(
+            "pkgname=foo\npkgver=1.0\npkgrel=2\n"
+            "pkgdesc='A  spaced\tdescription '\narch=(x86_64 aarch64)\n"
+            "license=(MIT)\ndepends=(glibc)\nmakedepends=(git)\n"
+            "depends_x86_64=(lib-x86)\nsource=(a.tar.gz)\nsha256sums=(SKIP)\n"
+            "package() { depends+=(extra); }\n"
+        )
+        self.assertEqual(
+            out,
+            "pkgbase = foo\n"
+            "\tpkgdesc = A spaced description\n"
+            "\tpkgver = 1.0\n"
+            "\tpkgrel = 2\n"
+            "\tarch = x86_64\n"
+            "\tarch = aarch64\n"
+            "\tlicense = MIT\n"
+            "\tmakedepends = git\n"
+            "\tdepends = glibc\n"
+            "\tsource = a.tar.gz\n"
+            "\tsha256sums = SKIP\n"
+            "\tdepends_x86_64 = lib-x86\n"
+            "\n"
+            "pkgname = foo\n"
+            "\tdepends = glibc\n"
+            "\tdepends = extra\n",
+        )
+
+    def test_split_package_overrides(self):
+        out = self._render(TestPkgbuildEvaluator.SPLIT, "split")
+        sections = out.split("\n\n")
+        self.assertEqual(len(sections), 3)
+        self.assertTrue(sections[0].startswith("pkgbase = base\n\tpkgdesc = Base desc\n"))
+        self.assertIn("\tmakedepends = nasm\n\tdepends = a\n", sections[0])
+        self.assertEqual(
+            sections[1],
+            "pkgname = one\n\tpkgdesc = First one\n"
+            "\tdepends = a\n\tdepends = b>=1\n\tdepends = c\n\tdepends = d",
+        )
+        # an override that empties an array is still written
+        self.assertEqual(sections[2], "pkgname = two\n\tdepends = \n")
+
+    @patch("vp_dev.ok")
+    @patch("vp_dev.err")
+    @patch("vp_dev.info")
+    def test_srcinfo_check_and_write(self, mock_info, mock_err, mock_ok):
+        d = self.root / "foo"
+        d.mkdir()
+        (d / "PKGBUILD").write_text("pkgname=foo\npkgver=1\npkgrel=1\narch=(any)\n")
+        vd = vp_dev.VpDev()
+        vd.root = self.root
+        vd.files_cache = {}
+        with patch("sys.stdout", new_callable=io.StringIO):
+            self.assertEqual(vd.srcinfo(["foo"], check=True), 1)
+        mock_err.assert_called_once_with("foo: missing .SRCINFO")
+        self.assertFalse((d / ".SRCINFO").exists())
+
+        self.assertEqual(vd.srcinfo(["foo"]), 0)
+        self.assertTrue((d / ".SRCINFO").read_text().startswith("pkgbase = foo\n"))
+        mock_err.reset_mock()
+        self.assertEqual(vd.srcinfo(["foo"], check=True), 0)
+        mock_err.assert_not_called()
+
+
 # ─── VpDev init and new ───────────────────────────────────────────────────────
 
 class TestVpDev(unittest.TestCase):
@@ -439,7 +1801,7 @@ def root_truediv_side_effect(name):
         mock_root.__truediv__.side_effect = root_truediv_side_effect
         self.vd.root = mock_root
 
-        result = self.vd.updpkgsums("testpkg")
+        result = self.vd.updpkgsums(["testpkg"])
 
         self.assertEqual(result, 1)
         mock_err.assert_called_once_with("Package 'testpkg' not found!")
@@ -472,135 +1834,11 @@ def root_truediv_side_effect(name):
 
         self.vd.root = mock_root
 
-        result = self.vd.updpkgsums("testpkg")
+        result = self.vd.updpkgsums(["testpkg"])
 
         self.assertEqual(result, 1)
         mock_err.assert_called_once_with("No PKGBUILD found in testpkg")
 
-    @patch("vp_dev.ok")
-    @patch("vp_dev.info")
-    @patch("vp_dev.subprocess.run")
-    def test_updpkgsums_success(self, mock_run, mock_info, mock_ok):
-        mock_d = MagicMock(spec=Path)
-        mock_pb = MagicMock(spec=Path)
-        mock_srcinfo = MagicMock(spec=Path)
-
-        mock_d.exists.return_value = True
-        mock_pb.exists.return_value = True
-
-        def d_truediv_side_effect(name):
-            if name == "PKGBUILD":
-                return mock_pb
-            elif name == ".SRCINFO":
-                return mock_srcinfo
-            return MagicMock()
-        mock_d.__truediv__.side_effect = d_truediv_side_effect
-
-        mock_root = MagicMock(spec=Path)
-        def root_truediv_side_effect(name):
-            if name == "testpkg":
-                return mock_d
-            return MagicMock()
-        mock_root.__truediv__.side_effect = root_truediv_side_effect
-        self.vd.root = mock_root
-
-        mock_r1 = MagicMock()
-        mock_r1.returncode = 0
-        mock_r2 = MagicMock()
-        mock_r2.returncode = 0
-        mock_r2.stdout = "srcinfo content"
-        mock_run.side_effect = [mock_r1, mock_r2]
-
-        result = self.vd.updpkgsums("testpkg")
-
-        self.assertEqual(result, 0)
-        self.assertEqual(mock_run.call_count, 2)
-
-        # Verify subprocess.run calls
-        mock_run.assert_any_call(
-            ["updpkgsums"], cwd=mock_d, capture_output=True, text=True, check=False
-        )
-        mock_run.assert_any_call(
-            ["makepkg", "--printsrcinfo"], cwd=mock_d, capture_output=True, text=True, check=False
-        )
-
-        mock_srcinfo.write_text.assert_called_once_with("srcinfo content")
-        self.assertEqual(mock_ok.call_count, 2)
-        mock_ok.assert_any_call("Updated checksums for testpkg")
-        mock_ok.assert_any_call("Generated .SRCINFO")
-
-    @patch("vp_dev.warn")
-    @patch("vp_dev.ok")
-    @patch("vp_dev.info")
-    @patch("vp_dev.subprocess.run")
-    def test_updpkgsums_makepkg_fails(self, mock_run, mock_info, mock_ok, mock_warn):
-        mock_d = MagicMock(spec=Path)
-        mock_pb = MagicMock(spec=Path)
-
-        mock_d.exists.return_value = True
-        mock_pb.exists.return_value = True
-
-        def d_truediv_side_effect(name):
-            if name == "PKGBUILD":
-                return mock_pb
-            return MagicMock()
-        mock_d.__truediv__.side_effect = d_truediv_side_effect
-
-        mock_root = MagicMock(spec=Path)
-        def root_truediv_side_effect(name):
-            if name == "testpkg":
-                return mock_d
-            return MagicMock()
-        mock_root.__truediv__.side_effect = root_truediv_side_effect
-        self.vd.root = mock_root
-
-        mock_r1 = MagicMock()
-        mock_r1.returncode = 0
-        mock_r2 = MagicMock()
-        mock_r2.returncode = 1
-        mock_run.side_effect = [mock_r1, mock_r2]
-
-        result = self.vd.updpkgsums("testpkg")
-
-        self.assertEqual(result, 0)
-        self.assertEqual(mock_run.call_count, 2)
-        mock_warn.assert_called_once_with("Failed to generate .SRCINFO")
-
-    @patch("vp_dev.err")
-    @patch("vp_dev.info")
-    @patch("vp_dev.subprocess.run")
-    def test_updpkgsums_updpkgsums_fails(self, mock_run, mock_info, mock_err):
-        mock_d = MagicMock(spec=Path)
-        mock_pb = MagicMock(spec=Path)
-
-        mock_d.exists.return_value = True
-        mock_pb.exists.return_value = True
-
-        def d_truediv_side_effect(name):
-            if name == "PKGBUILD":
-                return mock_pb
-            return MagicMock()
-        mock_d.__truediv__.side_effect = d_truediv_side_effect
-
-        mock_root = MagicMock(spec=Path)
-        def root_truediv_side_effect(name):
-            if name == "testpkg":
-                return mock_d
-            return MagicMock()
-        mock_root.__truediv__.side_effect = root_truediv_side_effect
-        self.vd.root = mock_root
-
-        mock_r1 = MagicMock()
-        mock_r1.returncode = 1
-        mock_r1.stderr = "error output"
-        mock_run.return_value = mock_r1
-
-        result = self.vd.updpkgsums("testpkg")
-
-        self.assertEqual(result, 1)
-        mock_run.assert_called_once()
-        mock_err.assert_called_once_with("Failed to update checksums: error output")
-
 
 if __name__ == '__main__':
     unittest.main()
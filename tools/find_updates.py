@@ -3,16 +3,47 @@
 
 from __future__ import annotations
 
-from typing import Any
+import argparse
+import bz2
+import codecs
+import contextlib
+import fcntl
+import gzip
+import json
+import lzma
+import mmap
+import os
+import re
+import sys
+import time
+import zlib
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import IO, Any
+from urllib.parse import quote, quote_plus
 
 import attr
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-AUR_URL = "https://aur.archlinux.org/rpc/v5"
+AUR_URL = os.environ.get("AUR_URL", "https://aur.archlinux.org/rpc/v5")
 AUR_REQUEST_TIMEOUT = 10
+# aurweb rejects request URIs much past 4 KiB; stay under it with some slack.
+AUR_MAX_URI = 4000
+AUR_WORKERS = 4
+AUR_RETRIES = 5
+# Cached /info records are served as-is for AUR_CACHE_TTL seconds, then served
+# while being refreshed in the background for another AUR_CACHE_STALE seconds.
+AUR_CACHE_TTL = int(os.environ.get("AUR_CACHE_TTL", "3600"))
+AUR_CACHE_STALE = int(os.environ.get("AUR_CACHE_STALE", "86400"))
+AUR_META_URL = "https://aur.archlinux.org/packages-meta-ext-v1.json.gz"
 
-LOCAL_REPOS = {"custom", "loathk-public", "loathk-personal"}
-ARCH_REPOS = {"core", "extra", "community", "multilib"}
+LOCAL_REPOS = ("custom", "loathk-public", "loathk-personal")
+# In pacman.conf order: the first repo carrying a package wins.
+ARCH_REPOS = ("core", "extra", "community", "multilib")
+SYNC_DB_PATH = "/var/lib/pacman/sync"
 
 _RED = "\033[31m"
 _GREEN = "\033[32m"
@@ -80,302 +111,103 @@ def from_dict(cls, src_dict: dict[str, Any]):
 
 
 @attr.s(auto_attribs=True)
-class SearchResult(AdditionalPropertiesMixin):
-    resultcount: Optional[int] = None
-    type: Optional[str] = None
-    version: Optional[int] = None
-    results: Optional[List["PackageBasic"]] = None
-    additional_properties: Dict[str, Any] = attr.ib(init=False, factory=dict)
-
-    def to_dict(self) -> Dict[str, Any]:
-        resultcount = self.resultcount
-        type = self.type
-        version = self.version
-        results: Optional[List[Dict[str, Any]]] = None
-        if self.results is not None:
-            results = [results_item_data.to_dict() for results_item_data in self.results]
-        field_dict: Dict[str, Any] = {}
-        field_dict.update(self.additional_properties)
-        field_dict.update({})
-        if resultcount is not None:
-            field_dict["resultcount"] = resultcount
-        if type is not None:
-            field_dict["type"] = type
-        if version is not None:
-            field_dict["version"] = version
-        if results is not None:
-            field_dict["results"] = results
-        return field_dict
+class PackageBasic(_AurModel):
+    id: int | None = None
+    name: str | None = None
+    description: str | None = None
+    package_base_id: int | None = None
+    package_base: str | None = None
+    maintainer: str | None = None
+    num_votes: int | None = None
+    popularity: float | None = None
+    first_submitted: int | None = None
+    last_modified: int | None = None
+    out_of_date: int | None = None
+    version: str | None = None
+    url_path: str | None = None
+    url: str | None = None
+    additional_properties: dict[str, Any] = attr.ib(init=False, factory=dict)
 
-    @classmethod
-    def from_dict(
-        cls: Type["SearchResult"], src_dict: Dict[str, Any]
-    ) -> "SearchResult":
-        d = src_dict.copy()
-        resultcount = d.pop("resultcount", None)
-        type = d.pop("type", None)
-        version = d.pop("version", None)
-        results = []
-        _results = d.pop("results", None)
-        for results_item_data in _results or []:
-            results_item = PackageBasic.from_dict(results_item_data)
-            results.append(results_item)
-        search_result = cls(
-            resultcount=resultcount,
-            type=type,
-            version=version,
-            results=results,
-        )
-        search_result.additional_properties = d
-        return search_result
+    _FIELDS = {
+        "id": "ID",
+        "name": "Name",
+        "description": "Description",
+        "package_base_id": "PackageBaseID",
+        "package_base": "PackageBase",
+        "maintainer": "Maintainer",
+        "num_votes": "NumVotes",
+        "popularity": "Popularity",
+        "first_submitted": "FirstSubmitted",
+        "last_modified": "LastModified",
+        "out_of_date": "OutOfDate",
+        "version": "Version",
+        "url_path": "URLPath",
+        "url": "URL",
+    }
 
 
 @attr.s(auto_attribs=True)
-class PackageDetailed(AdditionalPropertiesMixin):
-    id: Optional[int] = None
-    name: Optional[str] = None
-    description: Optional[str] = None
-    package_base_id: Optional[int] = None
-    package_base: Optional[str] = None
-    maintainer: Optional[str] = None
-    num_votes: Optional[int] = None
-    popularity: Optional[float] = None
-    first_submitted: Optional[int] = None
-    last_modified: Optional[int] = None
-    out_of_date: Optional[str] = None
-    version: Optional[str] = None
-    url_path: Optional[str] = None
-    url: Optional[str] = None
-    submitter: Optional[str] = None
-    license_: Optional[List[str]] = None
-    depends: Optional[List[str]] = None
-    make_depends: Optional[List[str]] = None
-    opt_depends: Optional[List[str]] = None
-    check_depends: Optional[List[str]] = None
-    provides: Optional[List[str]] = None
-    conflicts: Optional[List[str]] = None
-    replaces: Optional[List[str]] = None
-    groups: Optional[List[str]] = None
-    keywords: Optional[List[str]] = None
-    co_maintainers: Optional[List[str]] = None
-    additional_properties: Dict[str, Any] = attr.ib(init=False, factory=dict)
-
-    def to_dict(self) -> Dict[str, Any]:
-        id = self.id
-        name = self.name
-        description = self.description
-        package_base_id = self.package_base_id
-        package_base = self.package_base
-        maintainer = self.maintainer
-        num_votes = self.num_votes
-        popularity = self.popularity
-        first_submitted = self.first_submitted
-        last_modified = self.last_modified
-        out_of_date = self.out_of_date
-        version = self.version
-        url_path = self.url_path
-        url = self.url
-        submitter = self.submitter
-        license_: Optional[List[str]] = None
-        if self.license_ is not None:
-            license_ = self.license_
-        depends: Optional[List[str]] = None
-        if self.depends is not None:
-            depends = self.depends
-        make_depends: Optional[List[str]] = None
-        if self.make_depends is not None:
-            make_depends = self.make_depends
-        opt_depends: Optional[List[str]] = None
-        if self.opt_depends is not None:
-            opt_depends = self.opt_depends
-        check_depends: Optional[List[str]] = None
-        if self.check_depends is not None:
-            check_depends = self.check_depends
-        provides: Optional[List[str]] = None
-        if self.provides is not None:
-            provides = self.provides
-        conflicts: Optional[List[str]] = None
-        if self.conflicts is not None:
-            conflicts = self.conflicts
-        replaces: Optional[List[str]] = None
-        if self.replaces is not None:
-            replaces = self.replaces
-        groups: Optional[List[str]] = None
-        if self.groups is not None:
-            groups = self.groups
-        keywords: Optional[List[str]] = None
-        if self.keywords is not None:
-            keywords = self.keywords
-        co_maintainers: Optional[List[str]] = None
-        if self.co_maintainers is not None:
-            co_maintainers = self.co_maintainers
-        field_dict: Dict[str, Any] = {}
-        field_dict.update(self.additional_properties)
-        field_dict.update({})
-        if id is not None:
-            field_dict["ID"] = id
-        if name is not None:
-            field_dict["Name"] = name
-        if description is not None:
-            field_dict["Description"] = description
-        if package_base_id is not None:
-            field_dict["PackageBaseID"] = package_base_id
-        if package_base is not None:
-            field_dict["PackageBase"] = package_base
-        if maintainer is not None:
-            field_dict["Maintainer"] = maintainer
-        if num_votes is not None:
-            field_dict["NumVotes"] = num_votes
-        if popularity is not None:
-            field_dict["Popularity"] = popularity
-        if first_submitted is not None:
-            field_dict["FirstSubmitted"] = first_submitted
-        if last_modified is not None:
-            field_dict["LastModified"] = last_modified
-        if out_of_date is not None:
-            field_dict["OutOfDate"] = out_of_date
-        if version is not None:
-            field_dict["Version"] = version
-        if url_path is not None:
-            field_dict["URLPath"] = url_path
-        if url is not None:
-            field_dict["URL"] = url
-        if submitter is not None:
-            field_dict["Submitter"] = submitter
-        if license_ is not None:
-            field_dict["License"] = license_
-        if depends is not None:
-            field_dict["Depends"] = depends
-        if make_depends is not None:
-            field_dict["MakeDepends"] = make_depends
-        if opt_depends is not None:
-            field_dict["OptDepends"] = opt_depends
-        if check_depends is not None:
-            field_dict["CheckDepends"] = check_depends
-        if provides is not None:
-            field_dict["Provides"] = provides
-        if conflicts is not None:
-            field_dict["Conflicts"] = conflicts
-        if replaces is not None:
-            field_dict["Replaces"] = replaces
-        if groups is not None:
-            field_dict["Groups"] = groups
-        if keywords is not None:
-            field_dict["Keywords"] = keywords
-        if co_maintainers is not None:
-            field_dict["CoMaintainers"] = co_maintainers
-        return field_dict
+class SearchResult(_AurModel):
+    resultcount: int | None = None
+    type: str | None = None
+    version: int | None = None
+    results: list[PackageBasic] | None = None
+    additional_properties: dict[str, Any] = attr.ib(init=False, factory=dict)
 
-    @classmethod
-    def from_dict(
-        cls: Type["PackageDetailed"], src_dict: Dict[str, Any]
-    ) -> "PackageDetailed":
-        d = src_dict.copy()
-        id = d.pop("ID", None)
-        name = d.pop("Name", None)
-        description = d.pop("Description", None)
-        package_base_id = d.pop("PackageBaseID", None)
-        package_base = d.pop("PackageBase", None)
-        maintainer = d.pop("Maintainer", None)
-        num_votes = d.pop("NumVotes", None)
-        popularity = d.pop("Popularity", None)
-        first_submitted = d.pop("FirstSubmitted", None)
-        last_modified = d.pop("LastModified", None)
-        out_of_date = d.pop("OutOfDate", None)
-        version = d.pop("Version", None)
-        url_path = d.pop("URLPath", None)
-        url = d.pop("URL", None)
-        submitter = d.pop("Submitter", None)
-        license_: Optional[List[str]] = d.pop("License", None)
-        depends: Optional[List[str]] = d.pop("Depends", None)
-        make_depends: Optional[List[str]] = d.pop("MakeDepends", None)
-        opt_depends: Optional[List[str]] = d.pop("OptDepends", None)
-        check_depends: Optional[List[str]] = d.pop("CheckDepends", None)
-        provides: Optional[List[str]] = d.pop("Provides", None)
-        conflicts: Optional[List[str]] = d.pop("Conflicts", None)
-        replaces: Optional[List[str]] = d.pop("Replaces", None)
-        groups: Optional[List[str]] = d.pop("Groups", None)
-        keywords: Optional[List[str]] = d.pop("Keywords", None)
-        co_maintainers: Optional[List[str]] = d.pop("CoMaintainers", None)
-        package_detailed = cls(
-            id=id,
-            name=name,
-            description=description,
-            package_base_id=package_base_id,
-            package_base=package_base,
-            maintainer=maintainer,
-            num_votes=num_votes,
-            popularity=popularity,
-            first_submitted=first_submitted,
-            last_modified=last_modified,
-            out_of_date=out_of_date,
-            version=version,
-            url_path=url_path,
-            url=url,
-            submitter=submitter,
-            license_=license_,
-            depends=depends,
-            make_depends=make_depends,
-            opt_depends=opt_depends,
-            check_depends=check_depends,
-            provides=provides,
-            conflicts=conflicts,
-            replaces=replaces,
-            groups=groups,
-            keywords=keywords,
-            co_maintainers=co_maintainers,
-        )
-        package_detailed.additional_properties = d
-        return package_detailed
+    _FIELDS = {
+        "resultcount": "resultcount",
+        "type": "type",
+        "version": "version",
+        "results": "results",
+    }
+    _NESTED = {"results": PackageBasic}
 
 
 @attr.s(auto_attribs=True)
-class InfoResult(AdditionalPropertiesMixin):
-    resultcount: Optional[int] = None
-    type: Optional[str] = None
-    version: Optional[int] = None
-    results: Optional[List["PackageDetailed"]] = None
-    additional_properties: Dict[str, Any] = attr.ib(init=False, factory=dict)
-
-    def to_dict(self) -> Dict[str, Any]:
-        resultcount = self.resultcount
-        type = self.type
-        version = self.version
-        results: Optional[List[Dict[str, Any]]] = None
-        if self.results is not None:
-            results = [results_item_data.to_dict() for results_item_data in self.results]
-        field_dict: Dict[str, Any] = {}
-        field_dict.update(self.additional_properties)
-        field_dict.update({})
-        if resultcount is not None:
-            field_dict["resultcount"] = resultcount
-        if type is not None:
-            field_dict["type"] = type
-        if version is not None:
-            field_dict["version"] = version
-        if results is not None:
-            field_dict["results"] = results
-        return field_dict
+class PackageDetailed(_AurModel):
+    id: int | None = None
+    name: str | None = None
+    description: str | None = None
+    package_base_id: int | None = None
+    package_base: str | None = None
+    maintainer: str | None = None
+    num_votes: int | None = None
+    popularity: float | None = None
+    first_submitted: int | None = None
+    last_modified: int | None = None
+    out_of_date: int | None = None
+    version: str | None = None
+    url_path: str | None = None
+    url: str | None = None
+    submitter: str | None = None
+    license_: list[str] | None = None
+    depends: list[str] | None = None
+    make_depends: list[str] | None = None
+    opt_depends: list[str] | None = None
+    check_depends: list[str] | None = None
+    provides: list[str] | None = None
+    conflicts: list[str] | None = None
+    replaces: list[str] | None = None
+    groups: list[str] | None = None
+    keywords: list[str] | None = None
+    co_maintainers: list[str] | None = None
+    additional_properties: dict[str, Any] = attr.ib(init=False, factory=dict)
 
-    @classmethod
-    def from_dict(cls: Type["InfoResult"], src_dict: Dict[str, Any]) -> "InfoResult":
-        d = src_dict.copy()
-        resultcount = d.pop("resultcount", None)
-        type = d.pop("type", None)
-        version = d.pop("version", None)
-        results = []
-        _results = d.pop("results", None)
-        for results_item_data in _results or []:
-            results_item = PackageDetailed.from_dict(results_item_data)
-            results.append(results_item)
-        info_result = cls(
-            resultcount=resultcount,
-            type=type,
-            version=version,
-            results=results,
-        )
-        info_result.additional_properties = d
-        return info_result
+    _FIELDS = {
+        **PackageBasic._FIELDS,
+        "submitter": "Submitter",
+        "license_": "License",
+        "depends": "Depends",
+        "make_depends": "MakeDepends",
+        "opt_depends": "OptDepends",
+        "check_depends": "CheckDepends",
+        "provides": "Provides",
+        "conflicts": "Conflicts",
+        "replaces": "Replaces",
+        "groups": "Groups",
+        "keywords": "Keywords",
+        "co_maintainers": "CoMaintainers",
+    }
 
 
 @attr.s(auto_attribs=True)
@@ -395,20 +227,740 @@ class InfoResult(_AurModel):
     _NESTED = {"results": PackageDetailed}
 
 
-def search_single(name: str) -> SearchResult:
-    response = requests.get(
-        f"{AUR_URL}/search/{name}?by=name", timeout=AUR_REQUEST_TIMEOUT
-    )
-    response.raise_for_status()
-    return SearchResult.from_dict(response.json())
+class _Key:
+    """Descriptor that reads one JSON key of a record's dict when accessed."""
 
+    __slots__ = ("key",)
 
-def info_multiple(names: list[str]) -> InfoResult:
-    response = requests.get(
-        f"{AUR_URL}/info", params={"arg[]": names}, timeout=AUR_REQUEST_TIMEOUT
-    )
-    response.raise_for_status()
-    return InfoResult.from_dict(response.json())
+    def __init__(self, key: str) -> None:
+        self.key = key
+
+    def __get__(self, obj: _Record | None, owner: type | None = None) -> Any:
+        if obj is None:
+            return self
+        return obj._raw.get(self.key)
+
+
+class _Record:
+    """Read-only view over one decoded RPC object, the fast decoding path.
+
+    Wraps the dict ``json`` produced instead of copying it into a model:
+    attributes (named as on the ``model`` given to the subclass) look their
+    key up on access, so unused fields are never touched. Convert with
+    ``model.from_dict(record.to_dict())`` when a mutable model is needed.
+    """
+
+    __slots__ = ("_raw",)
+    _FIELDS: dict[str, str] = {}
+    _KEYS: frozenset[str] = frozenset()
+
+    def __init_subclass__(cls, model: type[_AurModel] | None = None, **kw: Any) -> None:
+        super().__init_subclass__(**kw)
+        if model is None:
+            return
+        cls._FIELDS = model._FIELDS
+        cls._KEYS = frozenset(model._FIELDS.values())
+        for attr_name, json_key in model._FIELDS.items():
+            if not hasattr(cls, attr_name):
+                setattr(cls, attr_name, _Key(json_key))
+
+    def __init__(self, raw: dict[str, Any]) -> None:
+        self._raw = raw
+
+    @property
+    def additional_properties(self) -> dict[str, Any]:
+        return {k: v for k, v in self._raw.items() if k not in self._KEYS}
+
+    def __getitem__(self, key: str) -> Any:
+        return self.additional_properties[key]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._raw and key not in self._KEYS
+
+    def to_dict(self) -> dict[str, Any]:
+        return {k: v for k, v in self._raw.items() if v is not None}
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._raw!r})"
+
+
+class PackageRecord(_Record, model=PackageDetailed):
+    """Lazy ``PackageDetailed`` (and, being a superset, ``PackageBasic``)."""
+
+    __slots__ = ()
+
+
+class _ResultsRecord(_Record):
+    __slots__ = ("_results",)
+
+    def __init__(self, raw: dict[str, Any]) -> None:
+        self._raw = raw
+        self._results: list[PackageRecord] | None = None
+
+    @property
+    def results(self) -> list[PackageRecord]:
+        """Wrapped on first access; each wrap is one small slots object."""
+        if self._results is None:
+            self._results = list(map(PackageRecord, self._raw.get("results") or ()))
+        return self._results
+
+
+class InfoRecord(_ResultsRecord, model=InfoResult):
+    __slots__ = ()
+
+
+class SearchRecord(_ResultsRecord, model=SearchResult):
+    __slots__ = ()
+
+
+class AurError(RuntimeError):
+    """The RPC answered with ``"type": "error"`` instead of results."""
+
+
+def chunk_names(
+    names: list[str], base_url: str, limit: int = AUR_MAX_URI
+) -> list[list[str]]:
+    """Split ``names`` into batches whose ``/info`` URL stays within ``limit``.
+
+    Each name costs ``&arg[]=<quoted name>`` on top of the base URL; a single
+    name longer than the budget still gets a batch of its own.
+    """
+    budget = limit - len(f"{base_url}/info?")
+    chunks: list[list[str]] = []
+    cur: list[str] = []
+    used = 0
+    for name in dict.fromkeys(names):
+        cost = len("arg%5B%5D=") + len(quote_plus(name)) + 1
+        if cur and used + cost > budget:
+            chunks.append(cur)
+            cur, used = [], 0
+        cur.append(name)
+        used += cost
+    if cur:
+        chunks.append(cur)
+    return chunks
+
+
+class AurClient:
+    """Pooled AUR RPC client.
+
+    One ``requests.Session`` is shared by every call so connections are kept
+    alive, and its adapter retries connection errors, 429 and 5xx with
+    exponential backoff, honouring ``Retry-After``. ``info`` splits large
+    name lists into URL-safe chunks and fetches them concurrently.
+    """
+
+    def __init__(
+        self,
+        base_url: str = AUR_URL,
+        workers: int = AUR_WORKERS,
+        retries: int = AUR_RETRIES,
+        backoff: float = 0.5,
+        timeout: float = AUR_REQUEST_TIMEOUT,
+        max_uri: int = AUR_MAX_URI,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self.max_uri = max_uri
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.workers, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self) -> AurClient:
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.close()
+
+    def _get(self, url: str, params: Any = None) -> dict[str, Any]:
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        data = response.json()
+        if data.get("type") == "error":
+            raise AurError(data.get("error") or "AUR RPC error")
+        return data
+
+    def search(self, name: str) -> SearchRecord:
+        return SearchRecord(
+            self._get(f"{self.base_url}/search/{quote(name, safe='')}", {"by": "name"})
+        )
+
+    def info(self, names: list[str]) -> InfoRecord:
+        """``/info`` for every name, merged into one result in request order."""
+        chunks = chunk_names(names, self.base_url, self.max_uri)
+        url = f"{self.base_url}/info"
+
+        def fetch(chunk: list[str]) -> dict[str, Any]:
+            return self._get(url, {"arg[]": chunk})
+
+        if len(chunks) <= 1 or self.workers == 1:
+            pages = [fetch(c) for c in chunks]
+        else:
+            with ThreadPoolExecutor(min(self.workers, len(chunks))) as pool:
+                pages = list(pool.map(fetch, chunks))
+        merged: dict[str, Any] = {"resultcount": 0, "type": "multiinfo", "results": []}
+        for page in pages:
+            merged["version"] = page.get("version")
+            merged["resultcount"] += page.get("resultcount") or 0
+            merged["results"].extend(page.get("results") or [])
+        return InfoRecord(merged)
+
+
+def _cache_dir() -> Path:
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "find_updates"
+
+
+class AurInfoCache:
+    """Persistent per-package cache of AUR ``/info`` records.
+
+    Each entry keeps the fetch time, the package's ``LastModified`` and its
+    ``PackageDetailed`` record (``None`` for names the AUR does not know, so
+    those are not asked for again every run). Entries younger than ``ttl`` are
+    used without any request; entries up to ``ttl + stale`` old are used too,
+    but refetched in the background and saved by ``close``. Only older or
+    unknown names are fetched before ``info`` returns.
+    """
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float = AUR_CACHE_TTL,
+        stale: float = AUR_CACHE_STALE,
+    ) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.stale = stale
+        self.entries = self._read()
+        self._dirty: dict[str, dict[str, Any]] = {}
+        self._pool: ThreadPoolExecutor | None = None
+        self._refresh: list[Future] = []
+
+    @staticmethod
+    def default_path() -> Path:
+        return _cache_dir() / "aur-info.json"
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        try:
+            data = json.loads(self.path.read_text())
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get("version") != self.VERSION:
+            return {}
+        return data.get("entries") or {}
+
+    def _store(self, names: list[str], result: InfoRecord, now: float) -> None:
+        found = {p.name: p for p in result.results or []}
+        for name in names:
+            pkg = found.get(name)
+            entry = {
+                "fetched": now,
+                "last_modified": pkg.last_modified if pkg else None,
+                "record": pkg.to_dict() if pkg else None,
+            }
+            self.entries[name] = self._dirty[name] = entry
+
+    def _fetch(self, client: AurClient, names: list[str]) -> None:
+        now = time.time()
+        self._store(names, client.info(names), now)
+
+    def info(self, client: AurClient, names: list[str]) -> InfoRecord:
+        """``client.info(names)``, answered from the cache where allowed."""
+        now = time.time()
+        names = list(dict.fromkeys(names))
+        stale: list[str] = []
+        missing: list[str] = []
+        for name in names:
+            entry = self.entries.get(name)
+            age = now - entry["fetched"] if entry else None
+            if age is None or age < 0 or age > self.ttl + self.stale:
+                missing.append(name)
+            elif age > self.ttl:
+                stale.append(name)
+        if stale:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(1)
+            self._refresh.append(self._pool.submit(self._fetch, client, stale))
+        if missing:
+            self._fetch(client, missing)
+        results = [
+            self.entries[n]["record"]
+            for n in names
+            if self.entries[n]["record"] is not None
+        ]
+        return InfoRecord(
+            {
+                "resultcount": len(results),
+                "type": "multiinfo",
+                "version": 5,
+                "results": results,
+            }
+        )
+
+    def close(self) -> None:
+        """Wait for background refreshes and merge new entries into the file.
+
+        A failed refresh keeps the stale entries; they are retried next run.
+        """
+        if self._pool is not None:
+            for fut in self._refresh:
+                with contextlib.suppress(requests.RequestException, AurError):
+                    fut.result()
+            self._pool.shutdown()
+            self._pool = None
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # cron and CI may share the cache: merge under a lock, newest wins.
+        with open(self.path.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            entries = self._read()
+            for name, entry in self._dirty.items():
+                if entry["fetched"] >= entries.get(name, {}).get("fetched", 0):
+                    entries[name] = entry
+            tmp = self.path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps({"version": self.VERSION, "entries": entries}))
+            tmp.replace(self.path)
+        self.entries = entries
+        self._dirty = {}
+
+
+def iter_json_array(fp: IO[bytes], chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Yield the objects of a top-level JSON array read from ``fp``.
+
+    Reads ``chunk_size`` bytes at a time and decodes one element at a time,
+    so memory stays at one chunk plus the largest element however long the
+    array is.
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder("utf-8")()
+    buf = ""
+    pos = 0
+    eof = False
+    started = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, eof
+        if eof:
+            return False
+        data = fp.read(chunk_size)
+        eof = not data
+        buf = buf[pos:] + text.decode(data, final=eof)
+        pos = 0
+        return True
+
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos == len(buf):
+            if fill():
+                continue
+            raise ValueError("unexpected end of JSON array")
+        if not started:
+            if buf[pos] != "[":
+                raise ValueError(f"expected a JSON array, got {buf[pos]!r}")
+            started = True
+            pos += 1
+        elif buf[pos] == "]":
+            return
+        elif buf[pos] != "{":
+            raise ValueError(f"expected a JSON object, got {buf[pos]!r}")
+        else:
+            try:
+                obj, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Usually the object just continues in the next chunk.
+                if not fill():
+                    raise
+                continue
+            yield obj
+
+
+@contextlib.contextmanager
+def _open_meta(src: str) -> Iterator[IO[bytes]]:
+    """Open a packages-meta dump from a URL or path, gunzipping as needed."""
+    if src.startswith(("http://", "https://")):
+        with requests.get(src, stream=True, timeout=AUR_REQUEST_TIMEOUT) as response:
+            response.raise_for_status()
+            # Take the bytes as served and decompress them here, streaming.
+            response.raw.decode_content = False
+            gz = src.endswith(".gz") or "gzip" in response.headers.get(
+                "Content-Encoding", ""
+            )
+            yield gzip.GzipFile(fileobj=response.raw) if gz else response.raw
+        return
+    with open(src, "rb") as f:
+        if f.peek(2)[:2] == b"\x1f\x8b":
+            with gzip.GzipFile(fileobj=f) as gz:
+                yield gz
+        else:
+            yield f
+
+
+class AurMetaIndex:
+    """Name -> version index built from the AUR's bulk packages-meta dump.
+
+    One download answers every lookup, instead of one RPC per name batch.
+    """
+
+    __slots__ = ("versions",)
+
+    def __init__(self, versions: dict[str, str]) -> None:
+        self.versions = versions
+
+    @classmethod
+    def load(cls, src: str, names: Iterable[str] | None = None) -> AurMetaIndex:
+        """Stream ``src`` (URL or path), keeping only ``names`` when given."""
+        wanted = set(names) if names is not None else None
+        versions: dict[str, str] = {}
+        with _open_meta(src) as fp:
+            for pkg in iter_json_array(fp):
+                name = pkg.get("Name")
+                if name and (wanted is None or name in wanted):
+                    versions[sys.intern(name)] = sys.intern(pkg.get("Version") or "")
+        return cls(versions)
+
+    def info(self, names: list[str]) -> InfoRecord:
+        """The subset of an ``/info`` result the version comparison needs."""
+        results = [
+            {"Name": n, "Version": self.versions[n]}
+            for n in dict.fromkeys(names)
+            if n in self.versions
+        ]
+        return InfoRecord(
+            {
+                "resultcount": len(results),
+                "type": "multiinfo",
+                "version": 5,
+                "results": results,
+            }
+        )
+
+
+_client: AurClient | None = None
+
+
+def _default_client() -> AurClient:
+    global _client
+    if _client is None:
+        _client = AurClient()
+    return _client
+
+
+def search_single(name: str) -> SearchRecord:
+    return _default_client().search(name)
+
+
+def info_multiple(names: list[str]) -> InfoRecord:
+    return _default_client().info(names)
+
+
+# A version string tokenized for vercmp: one (separator length, is numeric,
+# value) triple per alphanumeric segment, plus the trailing separator length.
+_Segments = tuple[tuple[tuple[int, bool, int | bytes], ...], int]
+_SEGMENT_RE = re.compile(rb"([^0-9A-Za-z]*)([0-9]+|[A-Za-z]+)")
+
+
+def _segments(part: str) -> _Segments:
+    """Split one epoch/pkgver/pkgrel field the way rpmvercmp walks it.
+
+    Works on the UTF-8 bytes, as libalpm does: anything outside ASCII
+    letters and digits is a separator, counted per byte.
+    """
+    raw = part.encode()
+    segs = []
+    end = 0
+    for m in _SEGMENT_RE.finditer(raw):
+        sep, seg = m.groups()
+        segs.append(
+            (len(sep), True, int(seg)) if seg[0] <= 0x39 else (len(sep), False, seg)
+        )
+        end = m.end()
+    return tuple(segs), len(raw) - end
+
+
+def _cmp_segments(a: _Segments, b: _Segments) -> int:
+    """``rpmvercmp`` over pre-split fields; see libalpm/version.c."""
+    (sa, ta), (sb, tb) = a, b
+    for (lsep, lnum, lval), (rsep, rnum, rval) in zip(sa, sb):
+        if lsep != rsep:
+            return -1 if lsep < rsep else 1
+        if lnum != rnum:
+            return 1 if lnum else -1
+        if lval != rval:
+            return -1 if lval < rval else 1  # type: ignore[operator]
+    n = min(len(sa), len(sb))
+    more_a, more_b = len(sa) > n, len(sb) > n
+    if not more_a and not more_b:
+        # Same segments: a trailing separator beats none, any two tie.
+        return (ta > 0) - (tb > 0)
+    # One side ran out of segments. rpmvercmp then looks at the next byte of
+    # the other: it skips separators first only if both sides had some left.
+    skipped = (more_a or ta > 0) and (more_b or tb > 0)
+    if more_a:
+        sep, num = sa[n][0], sa[n][1]
+        alpha = not num and (skipped or sep == 0)
+        return -1 if alpha else 1
+    sep, num = sb[n][0], sb[n][1]
+    alpha = not num and (skipped or sep == 0)
+    return 1 if alpha else -1
+
+
+class VersionComparator:
+    """Batch ``vercmp`` with alpm semantics, without needing pyalpm.
+
+    Each distinct version string is parsed once into its epoch, pkgver and
+    pkgrel segments and memoized; comparisons then only walk those tuples.
+    rpmvercmp is not a total order in corner cases (separator runs of
+    different length), so there is deliberately no sort key, only ``compare``.
+    """
+
+    __slots__ = ("_keys",)
+
+    def __init__(self) -> None:
+        self._keys: dict[str, tuple[_Segments, _Segments, _Segments | None]] = {}
+
+    def key(self, version: str) -> tuple[_Segments, _Segments, _Segments | None]:
+        key = self._keys.get(version)
+        if key is None:
+            # parseEVR: leading digits then ':' are the epoch; the last '-'
+            # after them starts the pkgrel.
+            i = 0
+            while i < len(version) and version[i].isascii() and version[i].isdigit():
+                i += 1
+            epoch, rest = "0", version
+            if version[i : i + 1] == ":":
+                epoch, rest = version[:i] or "0", version[i + 1 :]
+            ver, dash, rel = rest.rpartition("-")
+            if not dash:
+                ver, rel = rest, None
+            key = self._keys[version] = (
+                _segments(epoch),
+                _segments(ver),
+                None if rel is None else _segments(rel),
+            )
+        return key
+
+    def compare(self, a: str, b: str) -> int:
+        """-1, 0 or 1 as ``a`` is older than, equal to or newer than ``b``."""
+        if a == b:
+            return 0
+        ea, va, ra = self.key(a)
+        eb, vb, rb = self.key(b)
+        ret = _cmp_segments(ea, eb) or _cmp_segments(va, vb)
+        if ret == 0 and ra is not None and rb is not None:
+            ret = _cmp_segments(ra, rb)
+        return ret
+
+    def iter_compare(self, pairs: Iterable[tuple[str, str]]) -> Iterator[int]:
+        """``compare`` over ``(a, b)`` pairs, yielding each result as it is done."""
+        compare = self.compare
+        for a, b in pairs:
+            yield compare(a, b)
+
+    def compare_many(self, pairs: Iterable[tuple[str, str]]) -> list[int]:
+        """``compare`` over a whole batch of ``(a, b)`` pairs."""
+        return list(self.iter_compare(pairs))
+
+
+vercmp = VersionComparator().compare
+
+
+# ─── Sync databases ──────────────────────────────────────────────────────────
+
+
+def _decompressor(magic: bytes) -> Any:
+    """Streaming decompressor for a sync db by its magic bytes, or None."""
+    if magic.startswith(b"\x1f\x8b"):
+        return zlib.decompressobj(zlib.MAX_WBITS | 16)
+    if magic.startswith(b"\xfd7zXZ\x00"):
+        return lzma.LZMADecompressor()
+    if magic.startswith(b"BZh"):
+        return bz2.BZ2Decompressor()
+    if magic.startswith(b"\x28\xb5\x2f\xfd"):
+        try:
+            from compression import zstd  # Python 3.14+
+        except ImportError:
+            raise ValueError("zstd sync db needs Python 3.14+") from None
+        return zstd.ZstdDecompressor()
+    return None
+
+
+def _iter_tar(buf: mmap.mmap, chunk_size: int = 1 << 20) -> Iterator[tuple[str, bytes]]:
+    """Yield ``(path, data)`` for regular files in a (compressed) tar in ``buf``.
+
+    Uncompressed archives are sliced straight out of the mapping; compressed
+    ones are inflated ``chunk_size`` input bytes at a time, so only one
+    chunk's output is held beyond the member being read.
+    """
+    dec = _decompressor(buf[:6])
+    pending = bytearray()
+    src = 0
+
+    def take(n: int) -> bytes | None:
+        nonlocal src
+        if dec is None:
+            if src == len(buf):
+                return None
+            if src + n > len(buf):
+                raise ValueError("truncated sync db")
+            src += n
+            return buf[src - n : src]
+        while len(pending) < n:
+            if src >= len(buf):
+                if pending or not dec.eof:
+                    raise ValueError("truncated sync db")
+                return None
+            pending.extend(dec.decompress(buf[src : src + chunk_size]))
+            src += chunk_size
+        out = bytes(pending[:n])
+        del pending[:n]
+        return out
+
+    long_name: str | None = None
+    while (header := take(512)) is not None and header.strip(b"\0"):
+        size = int(header[124:136].rstrip(b" \0") or b"0", 8)
+        kind = header[156:157]
+        data = take(size + (-size % 512))
+        if data is None:
+            raise ValueError("truncated sync db")
+        data = data[:size]
+        if kind in (b"L", b"x"):
+            # GNU long name, or a pax header carrying the path.
+            if kind == b"L":
+                long_name = data.rstrip(b"\0").decode()
+            for rec in data.split(b"\n") if kind == b"x" else ():
+                key, _, value = rec.partition(b" ")[2].partition(b"=")
+                if key == b"path":
+                    long_name = value.decode()
+            continue
+        name = (
+            long_name
+            or (
+                (header[345:500].rstrip(b"\0") + b"/" if header[345] else b"")
+                + header[:100].rstrip(b"\0")
+            ).decode()
+        )
+        long_name = None
+        if kind in (b"0", b"\0"):
+            yield name, data
+
+
+def _desc_field(desc: bytes, field: bytes) -> str | None:
+    start = desc.find(b"%" + field + b"%\n")
+    if start < 0:
+        return None
+    start += len(field) + 3
+    end = desc.find(b"\n", start)
+    return desc[start : end if end >= 0 else None].decode()
+
+
+def read_sync_db(path: Path) -> dict[str, str]:
+    """``name -> version`` from one pacman sync db (``core.db`` ...).
+
+    Only ``%NAME%`` and ``%VERSION%`` of each ``desc`` entry are decoded.
+    """
+    packages: dict[str, str] = {}
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return packages
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            for name, data in _iter_tar(buf):
+                if not name.endswith("/desc"):
+                    continue
+                pkg = _desc_field(data, b"NAME")
+                ver = _desc_field(data, b"VERSION")
+                if pkg and ver:
+                    packages[sys.intern(pkg)] = sys.intern(ver)
+    return packages
+
+
+class SyncDbIndex:
+    """Per-repo ``name -> version`` maps read from sync db files.
+
+    Replaces libalpm for find_updates: no pacman.conf, no package objects,
+    just the db files (``pacman -Sy``'s or downloaded ones). ``load`` keeps a
+    JSON copy keyed by each db's size and mtime, so runs after the first only
+    parse JSON.
+    """
+
+    VERSION = 1
+    __slots__ = ("repos",)
+
+    def __init__(self, repos: dict[str, dict[str, str]]) -> None:
+        self.repos = repos
+
+    @staticmethod
+    def default_path() -> Path:
+        return _cache_dir() / "syncdb-index.json"
+
+    @staticmethod
+    def _stamp(db: Path) -> list[int]:
+        st = db.stat()
+        return [st.st_size, st.st_mtime_ns]
+
+    @classmethod
+    def load(
+        cls, dbpath: Path, repos: Iterable[str], cache: Path | None = None
+    ) -> SyncDbIndex:
+        """Read ``<dbpath>/<repo>.db`` for each repo present there."""
+        dbs = {r: dbpath / f"{r}.db" for r in repos if (dbpath / f"{r}.db").is_file()}
+        stamps = {r: cls._stamp(db) for r, db in dbs.items()}
+        cached: dict[str, Any] = {}
+        if cache is not None:
+            try:
+                cached = json.loads(cache.read_text())
+            except (OSError, ValueError):
+                pass
+            if cached.get("version") != cls.VERSION:
+                cached = {}
+        old = cached.get("repos", {})
+        out: dict[str, dict[str, str]] = {}
+        changed = False
+        for repo, db in dbs.items():
+            entry = old.get(repo)
+            if entry and entry.get("stamp") == stamps[repo]:
+                out[repo] = entry["packages"]
+            else:
+                out[repo] = read_sync_db(db)
+                changed = True
+        if cache is not None and changed:
+            data = {
+                "version": cls.VERSION,
+                "repos": {
+                    r: {"stamp": stamps[r], "packages": pkgs} for r, pkgs in out.items()
+                },
+            }
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            tmp = cache.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_text(json.dumps(data, separators=(",", ":")))
+            tmp.replace(cache)
+        return cls(out)
+
+    def merged(self, repos: Iterable[str]) -> dict[str, tuple[str, str]]:
+        """``name -> (version, repo)`` over ``repos``, the first one winning."""
+        out: dict[str, tuple[str, str]] = {}
+        for repo in repos:
+            for name, ver in self.repos.get(repo, {}).items():
+                out.setdefault(name, (ver, repo))
+        return out
 
 
 def print_package_update(
@@ -417,6 +969,7 @@ def print_package_update(
     package_name: str,
     remote_version: str,
     local_version: str,
+    file: IO[str] | None = None,
 ) -> None:
     print(
         "{:20s} {:28s} {} -> {}".format(
@@ -424,58 +977,179 @@ def print_package_update(
             package_name,
             _RED + local_version + _RESET,
             _GREEN + remote_version + _RESET,
+        ),
+        file=file,
+    )
+
+
+class Report:
+    """Sink for main()'s findings: the colored table or JSON records.
+
+    ``json`` streams one array (opened at once, one element per finding,
+    closed by ``close``) and ``ndjson`` one object per line; both flush after
+    every record so consumers can act while the scan is still running.
+    """
+
+    FORMATS = ("text", "json", "ndjson")
+
+    def __init__(self, fmt: str = "text", out: IO[str] | None = None) -> None:
+        self.fmt = fmt
+        self.out = out or sys.stdout
+        self.start = time.monotonic()
+        self.outdated_count = 0
+        self._records = 0
+        if fmt == "json":
+            self.out.write("[")
+
+    def outdated(
+        self,
+        source: str,
+        remote_db: str,
+        local_db: str,
+        name: str,
+        remote_version: str,
+        local_version: str,
+    ) -> None:
+        """``name`` in ``local_db`` is older than in ``remote_db``."""
+        self.outdated_count += 1
+        if self.fmt == "text":
+            print_package_update(
+                remote_db, local_db, name, remote_version, local_version, file=self.out
+            )
+            return
+        self._record(source, remote_db, local_db, name, remote_version, local_version)
+
+    def missing(self, local_db: str, name: str, local_version: str) -> None:
+        """``name`` is in neither the Arch repos nor the AUR."""
+        if self.fmt == "text":
+            print("{:20s} {}".format(f"non - {local_db}", name), file=self.out)
+            return
+        self._record("none", None, local_db, name, None, local_version)
+
+    def end_repo(self) -> None:
+        if self.fmt == "text":
+            print("", file=self.out)
+
+    def close(self) -> None:
+        if self.fmt == "json":
+            self.out.write("\n]\n" if self._records else "]\n")
+            self.out.flush()
+
+    def _record(
+        self,
+        source: str,
+        remote_db: str | None,
+        local_db: str,
+        name: str,
+        remote_version: str | None,
+        local_version: str,
+    ) -> None:
+        line = json.dumps(
+            {
+                "name": name,
+                "repo": local_db,
+                "source": source,
+                "remote_repo": remote_db,
+                "local_version": local_version,
+                "remote_version": remote_version,
+                "elapsed": round(time.monotonic() - self.start, 6),
+            }
         )
+        if self.fmt == "json":
+            line = ("," if self._records else "") + "\n  " + line
+        else:
+            line += "\n"
+        self._records += 1
+        self.out.write(line)
+        self.out.flush()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--aur-meta",
+        nargs="?",
+        const=AUR_META_URL,
+        metavar="SRC",
+        help="compare against the bulk packages-meta dump instead of the RPC; "
+        "SRC is a URL or local (optionally gzipped) file, default the AUR's",
+    )
+    parser.add_argument(
+        "--format",
+        choices=Report.FORMATS,
+        default="text",
+        help="text table, one streamed JSON array, or one JSON object per line",
+    )
+    parser.add_argument(
+        "--exit-code",
+        action="store_true",
+        help="exit with 1 when any package is out of date",
     )
+    parser.add_argument(
+        "--dbpath",
+        type=Path,
+        default=Path(SYNC_DB_PATH),
+        help="directory holding the <repo>.db sync databases (default %(default)s)",
+    )
+    args = parser.parse_args(argv)
 
+    index = SyncDbIndex.load(
+        args.dbpath, (*ARCH_REPOS, *LOCAL_REPOS), SyncDbIndex.default_path()
+    )
+    # name -> (version, repo), the first Arch repo carrying it winning.
+    arch_pkg_map = index.merged(ARCH_REPOS)
+    local_dbs = [r for r in LOCAL_REPOS if r in index.repos]
 
-def main() -> None:
-    import pyalpm
-    import pycman.config as config
-
-    handle = config.init_with_config("/etc/pacman.conf")
-    syncdbs = handle.get_syncdbs()
-    arch_dbs = [db for db in syncdbs if db.name in ARCH_REPOS]
-    local_dbs = [db for db in syncdbs if db.name in LOCAL_REPOS]
-
-    # Pre-compute an Arch package map to avoid N+1 lookups inside the loop.
-    # Maps package name -> (package_object, db_name).
-    arch_pkg_map: dict[str, tuple[Any, str]] = {}
-    for adb in arch_dbs:
-        for ap in adb.pkgcache:
-            arch_pkg_map.setdefault(ap.name, (ap, adb.name))
-
-    for ldb in local_dbs:
-        local_packages = sorted(ldb.search(""), key=lambda p: p.name)
-        found_in_arch: set[str] = set()
-
-        for lp in local_packages:
-            res = arch_pkg_map.get(lp.name)
-            if res:
-                ap, adb_name = res
-                found_in_arch.add(lp.name)
-                # vercmp: left < right -> -1 (local older than repo)
-                if pyalpm.vercmp(lp.version, ap.version) < 0:
-                    print_package_update(
-                        adb_name, ldb.name, lp.name, ap.version, lp.version
-                    )
-
-        aur_candidates = [lp for lp in local_packages if lp.name not in found_in_arch]
-        if not aur_candidates:
-            print("")
-            continue
+    versions = VersionComparator()
+    aur_cache = AurInfoCache(AurInfoCache.default_path())
+    if args.aur_meta:
+        local_names = {n for r in local_dbs for n in index.repos[r]}
+        aur_info = AurMetaIndex.load(args.aur_meta, local_names).info
+    else:
+
+        def aur_info(names: list[str]) -> InfoRecord:
+            return aur_cache.info(_default_client(), names)
+
+    report = Report(args.format)
+    try:
+        for repo in local_dbs:
+            local_packages = sorted(index.repos[repo].items())
+            in_arch = [
+                (name, ver, arch_pkg_map[name])
+                for name, ver in local_packages
+                if name in arch_pkg_map
+            ]
+            # vercmp: left < right -> -1 (local older than repo)
+            order = versions.iter_compare(
+                (ver, remote) for _, ver, (remote, _) in in_arch
+            )
+            for (name, ver, (remote, arch_repo)), cmp in zip(in_arch, order):
+                if cmp < 0:
+                    report.outdated("arch", arch_repo, repo, name, remote, ver)
+
+            aur_candidates = [
+                (name, ver) for name, ver in local_packages if name not in arch_pkg_map
+            ]
+            if not aur_candidates:
+                report.end_repo()
+                continue
 
-        aur_results = info_multiple([lp.name for lp in aur_candidates]).results or []
-        aur_map = {ap.name: ap for ap in aur_results}
+            aur_results = aur_info([name for name, _ in aur_candidates]).results or []
+            aur_map = {ap.name: ap for ap in aur_results}
 
-        for lp in aur_candidates:
-            ap = aur_map.get(lp.name)
-            if ap is None:
-                print("{:20s} {}".format(f"non - {ldb.name}", lp.name))
-            elif ap.version and pyalpm.vercmp(lp.version, ap.version) < 0:
-                print_package_update("aur", ldb.name, lp.name, ap.version, lp.version)
+            for name, ver in aur_candidates:
+                ap = aur_map.get(name)
+                if ap is None:
+                    report.missing(repo, name, ver)
+                elif ap.version and versions.compare(ver, ap.version) < 0:
+                    report.outdated("aur", "aur", repo, name, ap.version, ver)
 
-        print("")
+            report.end_repo()
+    finally:
+        report.close()
+        aur_cache.close()
+    return 1 if args.exit_code and report.outdated_count else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -22,10 +22,20 @@
 MAX_JOBS=${MAX_JOBS:-$(nproc)}
 PARALLEL=${PARALLEL:-true}
 RETRIES=${RETRIES:-3}
+RETRY_BACKOFF=${RETRY_BACKOFF:-15}
+BUILD_LOG_DIR=${BUILD_LOG_DIR:-}
 FORCE_BUILD=${FORCE_BUILD:-0}
 ONE_PACKAGE=${ONE_PACKAGE:-}
 DIST_MODE=${DIST_MODE:-0}
 PATCH_ARCH=${PATCH_ARCH:-1}
+HEAVY_JOBS=${HEAVY_JOBS:-1}
+HEAVY_RSS_MB=${HEAVY_RSS_MB:-4096}
+DOCKER_POOL=${DOCKER_POOL:-1}
+DOCKER_CACHE=${DOCKER_CACHE:-}
+DOCKER_BASE_MAX_AGE=${DOCKER_BASE_MAX_AGE:-24}
+POOL_ID=${POOL_ID:-$$}
+JOBSERVER=${JOBSERVER:-1}
+JOB_MEM_MB=${JOB_MEM_MB:-1536}
 
 # ═══════════════════════════════════════════════════════════════════════════
 # HELP / USAGE
@@ -50,13 +60,55 @@ usage()
   -f, --force      Force build regardless of version
   -d, --dist       Create dist/ with artifacts and checksums
   --one PKG        Only build if matches ONE_PACKAGE
+  --affected RANGE Only build packages a git range changed, plus their
+                   in-repo dependents (e.g. origin/main..HEAD)
+
+  Packages build in dependency order (tools/vp-dev.py plan): each one starts
+  once the repo packages it depends on have built, longest chain first, using
+  durations recorded from earlier builds. The predicted makespan is printed
+  before the first build starts.
+
+  Every build records its wall and CPU time per makepkg phase, peak RSS, disk
+  I/O and compiler cache hits to the build history; `tools/vp-dev.py stats`
+  shows trends and flags packages whose build cost regressed.
+
+  Compile parallelism is shared, not multiplied: every build draws from one
+  GNU make jobserver sized to the cores and available memory (JOBSERVER,
+  JOB_MEM_MB). A package holds one token while it builds and make takes
+  more per extra job, as do ninja and cargo through the shims in
+  tools/lib/jobserver; tokens go back as jobs and packages finish.
+
+  Failed builds are classified from their log (tools/vp-dev.py classify).
+  Network trouble, running out of memory (retried with half the jobs) and
+  unrecognised failures are retried with exponential backoff; a full disk,
+  dead source URLs (HTTP 4xx), bad checksums, missing dependencies and
+  compile errors are not. A retry
+  after build() has started keeps src/ and its compiled objects and resumes
+  with makepkg --noextract (or --repackage when only package() failed).
 
 ENVIRONMENT VARIABLES:
   MAX_JOBS, PARALLEL, RETRIES, FORCE_BUILD, ONE_PACKAGE, DIST_MODE
+  JOBSERVER        Share one GNU make jobserver across all builds (default: 1)
+  JOB_MEM_MB       Memory budgeted per compile job (default: 1536); the pool
+                   holds min(nproc, MemAvailable / JOB_MEM_MB) tokens
+  RETRY_BACKOFF    Seconds before the first retry, doubling after each (default: 15)
+  BUILD_LOG_DIR    Logs of each package's last build attempt (default: .cache/build-logs)
+  HEAVY_JOBS       Max concurrent builds that peaked above HEAVY_RSS_MB (default: 1)
+  DOCKER_POOL      Build Docker packages in warm, pre-provisioned containers
+                   (default: 1; 0 = fresh `docker run` per build)
+  DOCKER_CACHE     Shared pacman package cache and ccache (default: .cache/docker)
+  DOCKER_BASE_MAX_AGE  Hours before the base builder image is re-upgraded (default: 24)
+  ARTIFACT_CACHE_DIR, ARTIFACT_CACHE_MAX (default: .cache/vp-dev/artifacts, 20G)
+                   Built packages are reused when PKGBUILD, local sources,
+                   makepkg.conf and toolchain are unchanged; -f skips the lookup.
+  SOURCE_CACHE_DIR, SOURCE_CACHE_MAX (default: .cache/vp-dev/sources, 50G)
+                   Sources are fetched once into a content-addressed store
+                   (git+ sources as bare mirrors) and linked into package dirs.
 
 EXAMPLES:
   tools/pkg.sh build aria2 firefox    # Build specific packages
   tools/pkg.sh build                  # Build all packages
+  tools/pkg.sh build --affected HEAD~1..HEAD  # Rebuild what the last commit touched
   tools/pkg.sh lint                   # Lint all PKGBUILDs
   tools/pkg.sh srcinfo                # Update all .SRCINFO files
 EOF
@@ -85,6 +137,10 @@ setup_env()
   export CXXFLAGS="${CXXFLAGS:-} -fPIC"
   export PATH="$PWD:$PWD/bin:$PATH:/usr/bin/core_perl"
   chmod +x "$PWD"/bin/* "$PWD"/*.sh 2>/dev/null || true
+  VP_DEV=""
+  if has python3 && [[ -f $PWD/tools/vp-dev.py ]]; then VP_DEV=$PWD/tools/vp-dev.py; fi
+  DOCKER_CACHE=${DOCKER_CACHE:-$PWD/.cache/docker}
+  BUILD_LOG_DIR=${BUILD_LOG_DIR:-$PWD/.cache/build-logs}
   if ((FORCE_BUILD)); then warn "Force build enabled"; fi
 }
 
@@ -97,9 +153,13 @@ setup_cache()
   fi
 }
 
+# One line on a finished build from its telemetry (phase times, CPU, peak
+# RSS, compiler cache hit rate); the raw cache counters without vp-dev.
 show_cache_stats() {
   local pkg=${1:-}
-  if [[ $pkg == qt6-base ]] && has sccache; then
+  if [[ -n ${VP_DEV:-} ]]; then
+    python3 "$VP_DEV" stats --last "$pkg" || true
+  elif [[ $pkg == qt6-base ]] && has sccache; then
     sccache --show-stats
   elif has ccache; then
     ccache -s -v
@@ -125,14 +185,235 @@ patch_arch()
       -e "s/arch=('x86_64')/arch=('x86_64_v3')/"
 }
 
-build_docker() {
+# Run a build command, logging wall time, CPU seconds and peak RSS to the build
+# history that `vp-dev.py plan` schedules from. --wall-only for work that runs
+# outside our process tree (Docker).
+# Usage: recorded [--wall-only] <pkg> <cmd...>
+recorded() {
+  local -a opt=()
+  if [[ $1 == --wall-only ]]; then
+    opt=(--wall-only)
+    shift
+  fi
   local pkg=$1
+  shift
+  if [[ -n ${VP_DEV:-} ]]; then
+    python3 "$VP_DEV" record "${opt[@]}" "$pkg" -- "$@"
+  else
+    "$@"
+  fi
+}
+
+# Run a command with its output also written to <log>, returning its status.
+# Usage: logged <log> <cmd...>
+logged() {
+  local log=$1
+  shift
+  "$@" 2>&1 | tee "$log"
+  return "${PIPESTATUS[0]}"
+}
+
+# ─── Jobserver ──────────────────────────────────────────────────────────────
+# One GNU make jobserver (make >= 4.4 named-fifo style) for the whole run, so
+# total compile jobs stay within min(nproc, MemAvailable / JOB_MEM_MB) no
+# matter how many packages build at once. The fifo lives under the repo so
+# Docker builds reach it through the /ws mount; this shell keeps it open on
+# JOBSERVER_FD, since tokens in a fifo nobody holds open are lost.
+JOBSERVER_FIFO="" JOBSERVER_FD="" JOBSERVER_JOBS=""
+
+jobserver_up() {
+  ((JOBSERVER)) || return 0
+  local cores mem_kb jobs
+  cores=$(nproc)
+  jobs=$cores
+  mem_kb=$(awk '/^MemAvailable:/{print $2}' /proc/meminfo 2>/dev/null || true)
+  if [[ -n $mem_kb ]] && ((mem_kb / 1024 / JOB_MEM_MB < jobs)); then
+    jobs=$((mem_kb / 1024 / JOB_MEM_MB))
+  fi
+  ((jobs >= 1)) || jobs=1
+  JOBSERVER_FIFO=.cache/jobserver/$POOL_ID.fifo
+  mkdir -p "${JOBSERVER_FIFO%/*}"
+  rm -f "$JOBSERVER_FIFO"
+  mkfifo -m 666 "$JOBSERVER_FIFO" || {
+    warn "Cannot create jobserver fifo, builds use -j$cores each"
+    JOBSERVER_FIFO=""
+    return 0
+  }
+  exec {JOBSERVER_FD}<>"$JOBSERVER_FIFO"
+  printf "%${jobs}s" '' | tr ' ' + >&"$JOBSERVER_FD"
+  JOBSERVER_JOBS=$jobs
+  log "Jobserver: $jobs compile job(s) shared by all builds ($cores cores, ${mem_kb:-?} kB available)"
+}
+
+jobserver_down() {
+  [[ -n $JOBSERVER_FIFO ]] || return 0
+  exec {JOBSERVER_FD}>&-
+  rm -f "$JOBSERVER_FIFO"
+  JOBSERVER_FIFO=""
+}
+
+# MAKEFLAGS for one build: the shared jobserver, reached at <fifo> (the path
+# as the build sees it), or a private -j<jobs> when a retry asked for fewer.
+# Usage: build_makeflags <jobs> <fifo>
+build_makeflags() {
+  local jobs=$1 fifo=$2
+  if [[ -z $jobs && -n $JOBSERVER_FIFO ]]; then
+    printf -- '-j%s --jobserver-auth=fifo:%s\n' "$JOBSERVER_JOBS" "$fifo"
+  else
+    printf -- '-j%s\n' "${jobs:-$(nproc)}"
+  fi
+}
+
+# Take (block until free) or give back the token a package holds while its
+# build runs; make's own first job runs on it.
+# Usage: jobserver_take; ...; jobserver_give
+jobserver_take() {
+  JOBSERVER_TOKEN=""
+  [[ -n $JOBSERVER_FIFO ]] || return 0
+  IFS= read -r -N1 JOBSERVER_TOKEN <&"$JOBSERVER_FD" || JOBSERVER_TOKEN=""
+}
+
+jobserver_give() {
+  [[ -z ${JOBSERVER_TOKEN:-} ]] || printf '%s' "$JOBSERVER_TOKEN" >&"$JOBSERVER_FD"
+  JOBSERVER_TOKEN=""
+}
+
+# Exit trap of cmd_build.
+build_cleanup() {
+  if ((DOCKER_POOL)); then docker_pool_down; fi
+  jobserver_down
+}
+
+# ─── Docker builder pool ────────────────────────────────────────────────────
+# With DOCKER_POOL=1, Docker packages build in warm containers instead of a
+# fresh `docker run` that upgrades, resolves depends and adds a user each time:
+#   pkg-builder:base        archlinux + base-devel/ccache and a `builder` user
+#                           with the host uid, refreshed every DOCKER_BASE_MAX_AGE h
+#   pkg-builder:<base>-<d>  base + one package's depends, keyed by their hash,
+#                           so packages with the same depends share an image
+# One container per image stays up for the whole run (retries reuse it) and
+# mounts the repo, a shared pacman package cache and ccache from DOCKER_CACHE.
+# Images and containers are created under flock, so parallel builds of
+# packages with the same depends wait for one another instead of racing.
+
+# Usage: docker_locked <name> <command...>
+docker_locked() {
+  local name=$1
+  shift
+  mkdir -p "$DOCKER_CACHE"
+  (
+    flock 9
+    "$@"
+  ) 9>"$DOCKER_CACHE/$name.lock"
+}
+
+# The container user owns bind-mounted files under the host uid (root maps to
+# 1000, and build_docker then hands the package dir over with chown).
+builder_uid() {
+  local uid
+  uid=$(id -u)
+  printf '%s\n' "$((uid ? uid : 1000))"
+}
+
+# Print the base builder image, (re)building it when missing or stale.
+docker_base_image() {
+  local tag=pkg-builder:base created age
+  if created=$(docker image inspect -f '{{.Created}}' "$tag" 2>/dev/null); then
+    age=$(($(date +%s) - $(date -d "$created" +%s)))
+    if ((age < DOCKER_BASE_MAX_AGE * 3600)); then
+      printf '%s\n' "$tag"
+      return 0
+    fi
+  fi
+  log "Provisioning $tag from $IMAGE" >&2
+  docker build -q -t "$tag" --build-arg "UID=$(builder_uid)" - >/dev/null <<DOCKERFILE || return 1
+FROM $IMAGE
+ARG UID
+RUN pacman -Syu --noconfirm --needed base-devel pacman-contrib sudo ccache git \\
+ && sed -i 's/^\(BUILDENV=.*\)!ccache/\1ccache/' /etc/makepkg.conf \\
+ && useradd -m -u "\$UID" builder \\
+ && printf 'builder ALL=(ALL) NOPASSWD:ALL\n' >/etc/sudoers.d/builder \\
+ && chmod 440 /etc/sudoers.d/builder
+ENV CCACHE_DIR=/ccache
+DOCKERFILE
+  printf '%s\n' "$tag"
+}
+
+# Print a running container provisioned with the depends of <pkg>.
+# Usage: docker_builder <pkg>
+docker_builder() {
+  local pkg=$1 base base_id tag name
+  local -a deps=()
+  base=$(docker_locked base docker_base_image) || return 1
+  base_id=$(docker image inspect -f '{{.Id}}' "$base") || return 1
+  base_id=${base_id#sha256:}
+  if [[ -f $pkg/.SRCINFO ]]; then
+    mapfile -t deps < <(awk '/^[[:space:]]*(make|check)?depends(_'"$ARCH"')?[[:space:]]*=/{print $3}' "$pkg/.SRCINFO" | sort -u)
+  fi
+  tag="pkg-builder:${base_id:0:12}-$(printf '%s\n' "${deps[@]}" | sha256sum | cut -c1-12)"
+  name="pkg-builder-$POOL_ID-${tag##*-}"
+  docker_locked "${tag##*:}" docker_provision "$base" "$tag" "$name" "${deps[@]}" || return 1
+  printf '%s\n' "$name"
+}
+
+# Usage: docker_provision <base> <tag> <container> [dep...]
+docker_provision() {
+  local base=$1 tag=$2 name=$3
+  shift 3
+  if ! docker image inspect "$tag" &>/dev/null; then
+    log "Provisioning $tag ($# depends)" >&2
+    {
+      printf 'FROM %s\nRUN pacman -S --noconfirm --needed base-devel' "$base"
+      printf " '%s'" "$@"
+      printf '\n'
+    } | docker build -q -t "$tag" - >/dev/null || return 1
+  fi
+  [[ $(docker inspect -f '{{.State.Running}}' "$name" 2>/dev/null) == true ]] && return 0
+  docker rm -f "$name" &>/dev/null || true
+  mkdir -p "$DOCKER_CACHE/pacman" "$DOCKER_CACHE/ccache"
+  docker run -d --name "$name" --label "pkg-builder.pool=$POOL_ID" \
+    -v "${PWD}:/ws:rw" -v "$DOCKER_CACHE/pacman:/var/cache/pacman/pkg:rw" \
+    -v "$DOCKER_CACHE/ccache:/ccache:rw" "$tag" sleep infinity >/dev/null
+}
+
+# Remove this run's pool containers (images are kept for the next run).
+docker_pool_down() {
+  has docker || return 0
+  local -a ids=()
+  mapfile -t ids < <(docker ps -aq --filter "label=pkg-builder.pool=$POOL_ID")
+  ((${#ids[@]})) && docker rm -f "${ids[@]}" >/dev/null || true
+}
+
+# Usage: build_docker <pkg> <jobs> <log> [makepkg-arg...]
+build_docker() {
+  local pkg=$1 jobs=$2 build_log=$3
+  shift 3
   has docker || {
     err "Docker required for $pkg"
     return 1
   }
+  if ((DOCKER_POOL)); then
+    local builder
+    builder=$(docker_builder "$pkg") || {
+      err "Cannot provision a builder for $pkg"
+      return 1
+    }
+    log "Building $pkg (Docker, warm builder ${builder##*-})"
+    if (($(id -u) == 0)); then
+      docker exec "$builder" chown -R builder:builder "/ws/$pkg" /ccache || return 1
+    fi
+    logged "$build_log" recorded --wall-only "$pkg" docker exec -u builder -w "/ws/$pkg" \
+      -e "MAKEFLAGS=$(build_makeflags "$jobs" "/ws/$JOBSERVER_FIFO")" \
+      -e "PATH=/ws/tools/lib/jobserver:/usr/local/sbin:/usr/local/bin:/usr/bin" \
+      "$builder" makepkg -fs --noconfirm "$@"
+    return
+  fi
   log "Building $pkg (Docker)"
-  docker run --rm -v "${PWD}:/ws:rw" -w "/ws/$pkg" "$IMAGE" bash -c '
+  local args
+  printf -v args '%s ' "$@"
+  logged "$build_log" recorded --wall-only "$pkg" docker run --rm -v "${PWD}:/ws:rw" -w "/ws/$pkg" \
+    -e "MAKEFLAGS=$(build_makeflags "$jobs" "/ws/$JOBSERVER_FIFO")" -e "MAKEPKG_ARGS=$args" \
+    "$IMAGE" bash -c '
     set -euo pipefail
     pacman -Syu --noconfirm --needed base-devel pacman-contrib sudo
     deps=$(makepkg --printsrcinfo 2>/dev/null | awk "/^[[:space:]]*(make)?depends[[:space:]]*=/{print \$3}" | tr "\n" " ")
@@ -141,37 +422,193 @@ build_docker()
     printf "builder ALL=(ALL) NOPASSWD:ALL\n" >/etc/sudoers.d/builder
     chmod 440 /etc/sudoers.d/builder
     chown -R builder:builder .
-    sudo -u builder bash -c "MAKEFLAGS=\"-j$(nproc)\" makepkg -fs --noconfirm"
+    sudo -u builder bash -c "PATH=/ws/tools/lib/jobserver:\$PATH MAKEFLAGS=\"$MAKEFLAGS\" makepkg -fs --noconfirm $MAKEPKG_ARGS"
   '
 }
 
+# Usage: build_standard <pkg> <jobs> <log> [makepkg-arg...]
 build_standard() {
-  local pkg=$1
+  local pkg=$1 jobs=$2 build_log=$3
+  shift 3
   log "Building $pkg (makepkg)"
   setup_cache "$pkg"
+  local makeflags shims=$PWD/tools/lib/jobserver
+  makeflags=$(build_makeflags "$jobs" "$PWD/$JOBSERVER_FIFO")
   pushd "$pkg" >/dev/null || return 1
-  MAKEFLAGS="-j$(nproc)" makepkg -srC --noconfirm
+  MAKEFLAGS=$makeflags PATH=$shims:$PATH logged "$build_log" recorded "$pkg" makepkg -sr --noconfirm "$@"
   local rc=$?
   popd >/dev/null
   return $rc
 }
 
+# Store a successful build in the artifact cache under the key computed before
+# it started (makepkg may rewrite the PKGBUILD while building).
+# Usage: cache_artifacts <pkg> <key>
+cache_artifacts() {
+  local pkg=$1 key=$2
+  [[ -n $key ]] || return 0
+  python3 "$VP_DEV" artifact store "$pkg" --key "$key" || warn "Could not cache artifacts of $pkg"
+}
+
+# Build <pkg>, retrying transient failures (see usage) up to RETRIES attempts.
+# Usage: build_with_retry <pkg>
 build_with_retry() {
-  local pkg=$1 attempt=0
+  local pkg=$1 attempt=0 key="" jobs build_log kind stage retry resume why delay
+  local -a args=(-C)
+  # Artifact cache: skip the build entirely when these exact inputs were built before
+  if [[ -n ${VP_DEV:-} ]] && key=$(python3 "$VP_DEV" artifact key "$pkg"); then
+    if ((!FORCE_BUILD)) && python3 "$VP_DEV" artifact restore "$pkg" --key "$key"; then
+      return 0
+    fi
+  else
+    key=""
+  fi
+  jobs=""
+  mkdir -p "$BUILD_LOG_DIR"
+  build_log=$BUILD_LOG_DIR/${pkg//\//_}.log
   while ((attempt < RETRIES)); do
+    local rc=0
+    jobserver_take
     if [[ -n ${DOCKER_PKGS[$pkg]:-} ]]; then
-      build_docker "$pkg" && return 0
+      build_docker "$pkg" "$jobs" "$build_log" "${args[@]}" || rc=$?
     else
-      build_standard "$pkg" && return 0
+      build_standard "$pkg" "$jobs" "$build_log" "${args[@]}" || rc=$?
+    fi
+    jobserver_give
+    if ((rc == 0)); then
+      cache_artifacts "$pkg" "$key"
+      return 0
     fi
     ((attempt++))
+    kind=unknown stage=build retry=1 resume=-C why=""
+    if [[ -n ${VP_DEV:-} ]]; then
+      IFS=$'\t' read -r kind stage retry resume why < <(python3 "$VP_DEV" classify "$build_log") || true
+    fi
     sep
-    err "Build failed for $pkg (attempt $attempt/$RETRIES)"
+    err "Build failed for $pkg in $stage: $kind (attempt $attempt/$RETRIES, log: $build_log)"
+    [[ -z $why ]] || err "  $why"
     sep
+    if ((!retry)); then
+      err "Not retrying $pkg: $kind failures are not transient"
+      return 1
+    fi
+    ((attempt < RETRIES)) || break
+    if [[ $kind == oom ]]; then
+      # Leave the shared jobserver for a private, smaller -j.
+      jobs=$((${jobs:-${JOBSERVER_JOBS:-$(nproc)}} / 2))
+      ((jobs >= 1)) || jobs=1
+    fi
+    args=("$resume")
+    delay=$((RETRY_BACKOFF << (attempt - 1)))
+    log "Retrying $pkg in ${delay}s with makepkg $resume${jobs:+ -j$jobs}"
+    sleep "$delay"
   done
   return 1
 }
 
+# Build a `vp-dev.py plan` schedule: one "dir<TAB>priority<TAB>seconds<TAB>heavy
+# <TAB>dep,dep" line per package, longest critical path first. A package starts
+# as soon as its in-plan dependencies have built, and at most HEAVY_JOBS heavy
+# (memory-hungry) builds run at once; dependents of a failed package are
+# skipped. Returns the number of packages that failed or were skipped.
+# Usage: build_plan "${plan[@]}"
+build_plan() {
+  local -a order=() dl=()
+  local -A need=() state=() pid_pkg=() is_heavy=()
+  local line pkg prio secs heavy deps dep running=0 heavy_running=0 done=0 failed=0
+  for line in "$@"; do
+    IFS=$'\t' read -r pkg prio secs heavy deps <<<"$line"
+    order+=("$pkg")
+    need[$pkg]=$deps
+    is_heavy[$pkg]=$heavy
+  done
+
+  while ((done < ${#order[@]})); do
+    for pkg in "${order[@]}"; do
+      [[ -z ${state[$pkg]:-} ]] || continue
+      local blocked=0
+      IFS=, read -ra dl <<<"${need[$pkg]}"
+      for dep in "${dl[@]}"; do
+        case ${state[$dep]:-} in
+          ok) ;;
+          fail | skip)
+            state[$pkg]=skip
+            err "✗ $pkg (skipped: dependency $dep failed)"
+            ((++failed, ++done))
+            blocked=1
+            break
+            ;;
+          *)
+            blocked=1
+            break
+            ;;
+        esac
+      done
+      ((blocked)) && continue
+
+      if [[ $PARALLEL != true ]]; then
+        # The plan is topologically ordered, so dependencies have settled.
+        if build_with_retry "$pkg"; then
+          state[$pkg]=ok
+          show_cache_stats "$pkg"
+        else
+          state[$pkg]=fail
+          ((++failed))
+        fi
+        ((++done))
+        continue
+      fi
+      ((running < MAX_JOBS)) || break
+      if ((is_heavy[$pkg])); then
+        # Leave the slot to a lighter package rather than risk the OOM killer.
+        ((heavy_running < HEAVY_JOBS)) || continue
+        ((++heavy_running))
+      fi
+      build_with_retry "$pkg" &
+      pid_pkg[$!]=$pkg
+      state[$pkg]=run
+      ((++running))
+    done
+    ((running)) || break
+
+    local finish_pid="" rc=0 pid
+    set +e
+    wait -n -p finish_pid
+    rc=$?
+    set -e
+    if [[ -z $finish_pid ]]; then
+      # wait -n -p is unsupported (bash < 5.1): find a finished job by hand.
+      for pid in "${!pid_pkg[@]}"; do
+        if ! kill -0 "$pid" 2>/dev/null; then
+          finish_pid=$pid
+          rc=0
+          wait "$pid" || rc=$?
+          break
+        fi
+      done
+      [[ -n $finish_pid ]] || continue
+    fi
+    pkg=${pid_pkg[$finish_pid]}
+    unset 'pid_pkg[$finish_pid]'
+    ((--running, ++done))
+    if ((is_heavy[$pkg])); then ((--heavy_running)) || true; fi
+    if ((rc == 0)); then
+      state[$pkg]=ok
+      log "✓ $pkg"
+      show_cache_stats "$pkg"
+    else
+      state[$pkg]=fail
+      err "✗ $pkg"
+      ((++failed))
+    fi
+  done
+  if ((done < ${#order[@]})); then
+    err "$((${#order[@]} - done)) package(s) never became ready"
+    failed=$((failed + ${#order[@]} - done))
+  fi
+  return "$failed"
+}
+
 collect_dist() {
   local -a pkgs=(./*.pkg.tar.*)
   ((${#pkgs[@]})) || return 0
@@ -183,6 +620,7 @@ collect_dist()
 
 cmd_build() {
   local -a targets=() args=()
+  local affected=""
   while (($#)); do
     case $1 in
       -h | --help) usage && exit 0 ;;
@@ -210,6 +648,10 @@ cmd_build()
         ONE_PACKAGE=${2:-}
         shift 2
         ;;
+      --affected)
+        affected=${2:-}
+        shift 2
+        ;;
       -*)
         die "Unknown option: $1"
         ;;
@@ -222,9 +664,19 @@ cmd_build()
 
   cd_to_repo_root
   setup_env
+  trap build_cleanup EXIT
 
   if ((${#args[@]})); then
     targets=("${args[@]}")
+  elif [[ -n $affected ]]; then
+    has python3 || die "--affected requires python3"
+    local affected_out
+    affected_out=$(python3 tools/vp-dev.py affected "$affected") || die "Cannot determine affected packages"
+    if [[ -z $affected_out ]]; then
+      log "No packages affected by $affected"
+      return 0
+    fi
+    mapfile -t targets <<<"$affected_out"
   else
     log "Discovering packages..."
     mapfile -t targets < <(find_pkgbuilds)
@@ -250,58 +702,40 @@ cmd_build()
   log "Building ${#targets[@]} package(s) [parallel=$PARALLEL, jobs=$MAX_JOBS, retries=$RETRIES]"
 
   local failed=0
-  local -a pids=()
-  local -A pid_pkg=()
-  local -A job_status=()
-
+  local -a ready=() plan=()
   for pkg in "${targets[@]}"; do
-    [[ -f $pkg/PKGBUILD ]] || {
-      err "Missing PKGBUILD: $pkg"
-      ((failed++))
-      continue
-    }
-    if [[ $PARALLEL == true ]]; then
-      while (($(jobs -rp | wc -l) >= MAX_JOBS)); do
-        local finish_pid="" rc=0
-        set +e
-        wait -n -p finish_pid
-        rc=$?
-        set -e
-        if [[ -n $finish_pid ]]; then
-          job_status[$finish_pid]=$rc
-        else
-          # Fallback if wait -n -p is unsupported. Wait for any job to free a slot.
-          wait -n 2>/dev/null || sleep 0.1
-        fi
-      done
-      build_with_retry "$pkg" &
-      pids+=($!)
-      pid_pkg[$!]=$pkg
+    if [[ -f $pkg/PKGBUILD ]]; then
+      ready+=("$pkg")
     else
-      build_with_retry "$pkg" || ((failed++))
-      show_cache_stats "$pkg"
+      err "Missing PKGBUILD: $pkg"
+      ((++failed))
     fi
   done
 
-  if [[ $PARALLEL == true ]]; then
-    for pid in "${pids[@]}"; do
-      local rc=0
-      if [[ -n ${job_status[$pid]:-} ]]; then
-        rc=${job_status[$pid]}
-      else
-        wait "$pid" || rc=$?
-      fi
-
-      if (( rc == 0 )); then
-        log "✓ ${pid_pkg[$pid]}"
-        show_cache_stats "${pid_pkg[$pid]}"
-      else
-        err "✗ ${pid_pkg[$pid]}"
-        ((failed++))
-      fi
-    done
+  if ((${#ready[@]})); then
+    if has python3 && [[ -f tools/vp-dev.py ]]; then
+      local plan_out
+      local slots=$MAX_JOBS
+      [[ $PARALLEL == true ]] || slots=1
+      plan_out=$(python3 tools/vp-dev.py plan -j "$slots" --heavy-jobs "$HEAVY_JOBS" \
+        --heavy-rss "$HEAVY_RSS_MB" "${ready[@]}") || die "Cannot schedule build (see above)"
+      mapfile -t plan <<<"$plan_out"
+    else
+      warn "python3 not found, building in discovery order without dependency tracking"
+      for pkg in "${ready[@]}"; do plan+=("$pkg"$'\t1\t0\t0\t'); done
+    fi
+    # Link every source from the shared store up front, in parallel, so
+    # makepkg and Docker builds find them instead of downloading again.
+    if [[ -n ${VP_DEV:-} ]]; then
+      python3 "$VP_DEV" fetch -j "$MAX_JOBS" "${ready[@]}" || warn "Some sources could not be prefetched"
+    fi
+    jobserver_up
+    build_plan "${plan[@]}" || failed=$((failed + $?))
+    build_cleanup
   fi
 
+  if [[ -n ${VP_DEV:-} ]]; then python3 "$VP_DEV" artifact prune >/dev/null || true; fi
+  if [[ -n ${VP_DEV:-} ]]; then python3 "$VP_DEV" fetch --prune >/dev/null || true; fi
   if ((DIST_MODE)); then collect_dist; fi
   if ((failed)); then die "$failed package(s) failed" 1; fi
 
@@ -314,7 +748,7 @@ cmd_build()
 # ═══════════════════════════════════════════════════════════════════════════
 
 lint_pkg() {
-  local pkg=$1 root=$2 sc=$3 sh=$4 sf=$5 nc=$6
+  local pkg=$1 root=$2 sc=$3 sh=$4 sf=$5 nc=$6 si=${7:-1}
   local diff_out
 
   builtin cd "$pkg" || {
@@ -343,7 +777,9 @@ lint_pkg()
   [[ $sf -eq 1 ]] && { shfmt -ln bash -bn -ci -s -i 2 -w PKGBUILD &>/dev/null || echo "WARN:$pkg: shfmt failed"; }
   [[ $nc -eq 1 ]] && { namcap PKGBUILD &>/dev/null || echo "WARN:$pkg: namcap issues"; }
 
-  if [[ -f .SRCINFO ]]; then
+  if [[ $si -eq 0 ]]; then
+    : # checked tree-wide by `vp-dev.py srcinfo --check` in cmd_lint
+  elif [[ -f .SRCINFO ]]; then
     makepkg --printsrcinfo 2>/dev/null | diff -B .SRCINFO - &>/dev/null || {
       echo "ERROR:$pkg: .SRCINFO dirty"
       echo "INFO:    Run: makepkg --printsrcinfo > .SRCINFO"
@@ -387,6 +823,9 @@ cmd_lint()
   has shellharden && sh=1 || warn "shellharden not found"
   has shfmt && sf=1 || warn "shfmt not found"
   has namcap && nc=1 || warn "namcap not found"
+  # vp-dev renders .SRCINFO in-process, so one call replaces a makepkg per package
+  local si=1
+  has python3 && [[ -f tools/vp-dev.py ]] && si=0
 
   [[ ${#pkgs[@]} -eq 0 ]] && {
     err "No PKGBUILDs found"
@@ -396,10 +835,15 @@ cmd_lint()
   printf 'Linting %d package(s) [parallel=%s, max_jobs=%d]\n' "${#pkgs[@]}" "$parallel" "$max_jobs"
 
   _lint_pre() { printf '==> %s\n' "$1"; }
-  _lint_proc() { lint_pkg "$1" "$root" "$sc" "$sh" "$sf" "$nc"; }
+  _lint_proc() { lint_pkg "$1" "$root" "$sc" "$sh" "$sf" "$nc" "$si"; }
 
   run_task_batch "$parallel" "$max_jobs" handle_lint_output errs pkgs _lint_pre _lint_proc
 
+  if [[ $si -eq 0 ]]; then
+    printf '==> %s\n' ".SRCINFO"
+    python3 tools/vp-dev.py srcinfo --check || errs+=(".SRCINFO dirty or missing")
+  fi
+
   if [[ ${#errs[@]} -gt 0 ]]; then
     printf '\n%bFound %s error(s)%b\n' "$R" "${#errs[@]}" "$D" >&2
     exit 1
@@ -412,7 +856,7 @@ _lint_proc()
 # ═══════════════════════════════════════════════════════════════════════════
 
 process_srcinfo_pkg() {
-  local pkg=$1 root=$2
+  local pkg=$1 root=$2 gen=${3:-1}
 
   builtin cd "$pkg" || {
     echo "ERROR:$pkg: cd failed"
@@ -425,7 +869,7 @@ process_srcinfo_pkg()
     return 1
   }
 
-  makepkg --printsrcinfo >.SRCINFO 2>/dev/null || {
+  [[ $gen -eq 0 ]] || makepkg --printsrcinfo >.SRCINFO 2>/dev/null || {
     echo "ERROR:$pkg: makepkg failed"
     builtin cd "$root"
     return 1
@@ -466,10 +910,18 @@ cmd_srcinfo()
 
   log "Processing ${#pkgs[@]} package(s) [parallel=$parallel, max_jobs=$max_jobs]"
 
-  _srcinfo_proc() { process_srcinfo_pkg "$1" "$root"; }
+  # .SRCINFO is rendered for the whole tree in one vp-dev call when available
+  local gen=1
+  has python3 && [[ -f tools/vp-dev.py ]] && gen=0
+
+  _srcinfo_proc() { process_srcinfo_pkg "$1" "$root" "$gen"; }
 
   run_task_batch "$parallel" "$max_jobs" handle_srcinfo_output errs pkgs "" _srcinfo_proc
 
+  if [[ $gen -eq 0 ]]; then
+    python3 tools/vp-dev.py srcinfo "${pkgs[@]}" || errs+=(".SRCINFO generation")
+  fi
+
   if [[ ${#errs[@]} -gt 0 ]]; then
     err "Failed to process ${#errs[@]} package(s)"
     exit 1
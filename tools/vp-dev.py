@@ -1,17 +1,41 @@
 #!/usr/bin/env python3
 """vp-dev - Development tool for Ven0m0's PKG repository"""
 
+import os
 import sys
 import json
 import argparse
+import contextlib
+import hashlib
+import itertools
+import heapq
 import subprocess
 import shutil
 import re
+import select
 import shlex
+import signal
+import threading
+import time
 from pathlib import Path
 import concurrent.futures
+import difflib
+import fcntl
+import fnmatch
+import functools
+import gzip
+import http.client
+import statistics
+import tomllib
+import urllib.parse
+import urllib.request
+from collections.abc import Callable, Iterable, Iterator
+from typing import IO, Any
 
 VERSION = "1.0.0"
+# Bump whenever _parse_pkg/_parse_srcinfo change what they extract, so stale
+# parse-cache entries from an older parser are discarded instead of reused.
+PARSE_CACHE_SCHEMA = 2
 
 
 class Colors:
@@ -38,8 +62,2263 @@ def warn(m: str) -> None:
     print(f"{Colors.Y}⚠{Colors.N} {m}")
 
 
+class RepoIndex:
+    """Snapshot of the repository's tracked files from one ``git ls-files -s -z``.
+
+    Every subcommand reads package file lists, blob hashes and modes from here
+    instead of forking git per package directory. Files edited since they were
+    staged are rehashed in-process so blob hashes always describe the working
+    tree, which is what the parse cache and ``check`` care about.
+    """
+
+    __slots__ = ("_files", "entries", "root")
+
+    def __init__(self, root: Path, entries: dict[str, tuple[str, str]]) -> None:
+        self.root = root
+        # Repo-relative posix path -> (mode, blob hash).
+        self.entries = entries
+        self._files: dict[str, list[str]] = {}
+        for path in entries:
+            top, sep, rel = path.partition("/")
+            if sep:
+                self._files.setdefault(top, []).append(rel)
+
+    @classmethod
+    def load(cls, root: Path, git: str) -> "RepoIndex":
+        r = subprocess.run(
+            [git, "ls-files", "-s", "-z"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        entries: dict[str, tuple[str, str]] = {}
+        for rec in r.stdout.split("\0"):
+            if not rec:
+                continue
+            meta, path = rec.split("\t", 1)
+            mode, blob, _stage = meta.split()
+            entries[path] = (mode, blob)
+        # The index only knows staged content; rehash anything edited since.
+        r = subprocess.run(
+            [git, "diff-files", "--name-only", "-z"],
+            cwd=root,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        for path in r.stdout.split("\0"):
+            if path in entries:
+                entries[path] = (entries[path][0], blob_hash(root / path) or "")
+        return cls(root, entries)
+
+    def _rel(self, p: Path) -> str | None:
+        try:
+            return p.relative_to(self.root).as_posix()
+        except ValueError:
+            return None
+
+    def blob(self, p: Path) -> str | None:
+        rel = self._rel(p)
+        e = self.entries.get(rel) if rel else None
+        return e[1] if e else None
+
+    def mode(self, p: Path) -> str | None:
+        rel = self._rel(p)
+        e = self.entries.get(rel) if rel else None
+        return e[0] if e else None
+
+    def is_tracked(self, p: Path) -> bool:
+        """True for a tracked file or a directory containing tracked files."""
+        rel = self._rel(p)
+        if rel is None:
+            return False
+        prefix = f"{rel}/"
+        return rel in self.entries or any(e.startswith(prefix) for e in self.entries)
+
+    def files_by_dir(self) -> dict[Path, list[str]]:
+        """Tracked files grouped by top-level directory, relative to that directory."""
+        return {self.root / top: fs for top, fs in self._files.items()}
+
+    def package_dirs(self) -> list[str]:
+        """Repo-relative directories holding a tracked PKGBUILD (nested ones too)."""
+        return sorted(
+            path[: -len("/PKGBUILD")]
+            for path in self.entries
+            if path.endswith("/PKGBUILD")
+        )
+
+
+def blob_hash(p: Path) -> str | None:
+    """Hash a file the way ``git hash-object`` does, without forking git."""
+    try:
+        data = p.read_bytes()
+    except OSError:
+        return None
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+# ─── PKGBUILD evaluation ──────────────────────────────────────────────────────
+
+_SUMS = tuple(
+    f"{a}sums"
+    for a in ("ck", "md5", "sha1", "sha224", "sha256", "sha384", "sha512", "b2")
+)
+# Attribute lists and their order mirror libmakepkg's srcinfo.sh.
+SRCINFO_BASE_SINGLE = (
+    "pkgdesc",
+    "pkgver",
+    "pkgrel",
+    "epoch",
+    "url",
+    "install",
+    "changelog",
+)
+SRCINFO_BASE_MULTI = (
+    "arch",
+    "groups",
+    "license",
+    "checkdepends",
+    "makedepends",
+    "depends",
+    "optdepends",
+    "provides",
+    "conflicts",
+    "replaces",
+    "noextract",
+    "options",
+    "backup",
+    "source",
+    "validpgpkeys",
+    *_SUMS,
+)
+SRCINFO_PKG_SINGLE = ("pkgdesc", "url", "install", "changelog")
+SRCINFO_PKG_MULTI = (
+    "arch",
+    "groups",
+    "license",
+    "checkdepends",
+    "depends",
+    "optdepends",
+    "provides",
+    "conflicts",
+    "replaces",
+    "options",
+    "backup",
+)
+SRCINFO_ARCH_MULTI = (
+    "source",
+    "provides",
+    "conflicts",
+    "depends",
+    "replaces",
+    "optdepends",
+    "makedepends",
+    "checkdepends",
+    *_SUMS,
+)
+
+# Long-lived worker loop. It reads NUL-terminated package directories on stdin
+# and answers on fd 3 with NUL-delimited records, terminated by the per-worker
+# nonce in $1 so stray output can never desynchronise the stream:
+#   S rc                     status of sourcing the PKGBUILD
+#   G attr n v1..vn          global variable (scalars are 1-element arrays)
+#   P pkg attr n v1..vn      override assigned inside package_<pkg>()
+#   F n f1..fn               functions defined by the PKGBUILD
+# Each PKGBUILD is sourced in a subshell with stdin closed and stdout sent to
+# stderr, so state never leaks between packages and `read` prompts return at
+# once. package_*() overrides are extracted the way libmakepkg's
+# extract_function_variable does: by scanning `declare -f` for assignments and
+# eval'ing them with pkgname bound to the split package's name.
+_EVAL_WORKER = r"""
+exec 3>&1 1>&2
+shopt -s extglob
+_vp_end=$1 _vp_global_re=$2 _vp_single_re=$3 _vp_multi_re=$4
+plain() { :; }
+msg() { :; }
+msg2() { :; }
+warning() { :; }
+error() { :; }
+_vp_emit() { printf '%s\0' "$@" >&3; }
+_vp_extract() {
+  local pkgname=$1 REPLY decl attr op
+  local -a _vp_names=()
+  local -A _vp_seen=()
+  while IFS= read -r REPLY; do
+    [[ $REPLY =~ ^[[:space:]]*\ ([A-Za-z0-9_]+)\+?=(.?) ]] || continue
+    attr=${BASH_REMATCH[1]} op=${BASH_REMATCH[2]}
+    if [[ $attr =~ $_vp_multi_re ]]; then
+      [[ $op == "(" ]] || continue
+      [[ -v _vp_seen[$attr] ]] || eval "_vp_o_$attr=(\"\${$attr[@]}\")"
+    elif [[ $attr =~ $_vp_single_re ]]; then
+      [[ -n $op && $op != "(" ]] || continue
+      [[ -v _vp_seen[$attr] ]] || printf -v "_vp_o_$attr" %s "${!attr}"
+    else
+      continue
+    fi
+    [[ -v _vp_seen[$attr] ]] || { _vp_names+=("$attr"); _vp_seen[$attr]=1; }
+    decl=${REPLY##*([[:space:]])}
+    eval "${decl/#$attr/_vp_o_$attr}"
+  done < <(declare -f "$2")
+  for attr in "${_vp_names[@]}"; do
+    eval "_vp_emit P \"\$1\" \"\$attr\" \"\${#_vp_o_$attr[@]}\" \"\${_vp_o_$attr[@]}\""
+  done
+}
+_vp_dump() {
+  local _vp_v _vp_rc=0 _vp_pkg
+  local -a _vp_fns=()
+  startdir=$PWD srcdir=$PWD/src pkgdir=$PWD/pkg
+  shopt -u sourcepath
+  . ./PKGBUILD 3>&- || _vp_rc=$?
+  _vp_emit S "$_vp_rc"
+  for _vp_v in $(compgen -v); do
+    [[ $_vp_v =~ $_vp_global_re ]] || continue
+    eval "_vp_emit G \"\$_vp_v\" \"\${#$_vp_v[@]}\" \"\${$_vp_v[@]}\""
+  done
+  for _vp_v in $(compgen -A function); do
+    [[ $_vp_v == _vp_* ]] || _vp_fns+=("$_vp_v")
+  done
+  _vp_emit F "${#_vp_fns[@]}" "${_vp_fns[@]}"
+  for _vp_pkg in "${pkgname[@]}"; do
+    if declare -F "package_$_vp_pkg" >/dev/null; then
+      _vp_extract "$_vp_pkg" "package_$_vp_pkg"
+    elif (( ${#pkgname[@]} == 1 )) && declare -F package >/dev/null; then
+      _vp_extract "$_vp_pkg" package
+    fi
+  done
+}
+while IFS= read -r -d '' _vp_dir; do
+  (exec </dev/null; builtin cd -- "$_vp_dir" && _vp_dump)
+  printf '%s\0' "$_vp_end" >&3
+done
+"""
+
+
+def _alt_re(names: tuple[str, ...] | set[str], arch: tuple[str, ...] = ()) -> str:
+    parts = "|".join(sorted(set(names)))
+    if arch:
+        parts += "|(" + "|".join(sorted(set(arch))) + r")_[A-Za-z0-9_]+"
+    return f"^({parts})$"
+
+
+class PkgbuildData:
+    """Variables of one sourced PKGBUILD, as makepkg itself would see them.
+
+    ``base`` holds every global srcinfo attribute that is set (scalars become
+    one-element lists), ``packages`` maps each ``pkgname`` to the attributes
+    its ``package_<name>()`` function overrides, in assignment order.
+    """
+
+    __slots__ = ("base", "functions", "packages", "status")
+
+    def __init__(self) -> None:
+        self.status = 0
+        self.base: dict[str, list[str]] = {}
+        self.packages: dict[str, dict[str, list[str]]] = {}
+        self.functions: list[str] = []
+
+    @classmethod
+    def from_tokens(cls, tokens: list[str]) -> "PkgbuildData":
+        self = cls()
+        i = 0
+        while i < len(tokens):
+            kind = tokens[i]
+            if kind == "S":
+                self.status = int(tokens[i + 1])
+                i += 2
+            elif kind == "G":
+                n = int(tokens[i + 2])
+                self.base[tokens[i + 1]] = tokens[i + 3 : i + 3 + n]
+                i += 3 + n
+            elif kind == "P":
+                n = int(tokens[i + 3])
+                attrs = self.packages.setdefault(tokens[i + 1], {})
+                attrs[tokens[i + 2]] = tokens[i + 4 : i + 4 + n]
+                i += 4 + n
+            elif kind == "F":
+                n = int(tokens[i + 1])
+                self.functions = tokens[i + 2 : i + 2 + n]
+                i += 2 + n
+            else:
+                raise ValueError(f"unexpected evaluator record {kind!r}")
+        for name in self.pkgnames:
+            self.packages.setdefault(name, {})
+        return self
+
+    def scalar(self, attr: str) -> str:
+        v = self.base.get(attr)
+        return v[0] if v else ""
+
+    @property
+    def pkgnames(self) -> list[str]:
+        return self.base.get("pkgname", [])
+
+    @property
+    def pkgbase(self) -> str:
+        return self.scalar("pkgbase") or self.scalar("pkgname")
+
+
+class _EvalWorker:
+    """One long-lived bash process speaking the ``_EVAL_WORKER`` protocol."""
+
+    __slots__ = ("_buf", "_tokens", "end", "proc")
+
+    def __init__(self, env: dict[str, str]) -> None:
+        self.end = os.urandom(8).hex().encode()
+        self.proc = subprocess.Popen(
+            [
+                "bash",
+                "--noprofile",
+                "--norc",
+                "-c",
+                _EVAL_WORKER,
+                "vp-dev-eval",
+                self.end.decode(),
+                _alt_re(
+                    {"pkgbase", "pkgname", *SRCINFO_BASE_SINGLE, *SRCINFO_BASE_MULTI},
+                    SRCINFO_ARCH_MULTI,
+                ),
+                _alt_re(SRCINFO_PKG_SINGLE),
+                _alt_re(SRCINFO_PKG_MULTI, SRCINFO_ARCH_MULTI),
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            env=env,
+            start_new_session=True,
+        )
+        self._buf = b""
+        self._tokens: list[bytes] = []
+
+    def evaluate(self, d: Path, timeout: float) -> PkgbuildData:
+        self.proc.stdin.write(os.fsencode(d) + b"\0")
+        self.proc.stdin.flush()
+        out: list[str] = []
+        fd = self.proc.stdout.fileno()
+        deadline = time.monotonic() + timeout
+        while True:
+            while self._tokens:
+                tok = self._tokens.pop(0)
+                if tok == self.end:
+                    return PkgbuildData.from_tokens(out)
+                out.append(tok.decode("utf-8", "surrogateescape"))
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                raise TimeoutError(f"evaluating {d} took longer than {timeout}s")
+            chunk = os.read(fd, 65536)
+            if not chunk:
+                raise EOFError(f"evaluator exited while sourcing {d}")
+            *done, self._buf = (self._buf + chunk).split(b"\0")
+            self._tokens.extend(done)
+
+    def close(self) -> None:
+        # The worker leads its own session: kill the sourcing subshell and
+        # whatever the PKGBUILD started along with it.
+        with contextlib.suppress(ProcessLookupError):
+            os.killpg(self.proc.pid, signal.SIGKILL)
+        self.proc.wait()
+
+
+class PkgbuildEvaluator:
+    """Pool of warm bash workers that source PKGBUILDs with real bash semantics.
+
+    Unlike the regex fallback this sees full arrays, conditionals, ``case
+    $CARCH`` blocks, split packages and ``package_*()`` overrides, without
+    paying makepkg's start-up cost per package. Workers run with an empty
+    environment (``env -i``) and stdin closed, each in its own session; a
+    PKGBUILD that hangs is killed after ``timeout`` seconds together with
+    everything it started, and its worker replaced. ``set -r`` is not used
+    because restricted mode forbids sourcing sibling files such as mesa-git's
+    customization.cfg, which would silently change the evaluated metadata.
+    """
+
+    def __init__(
+        self, jobs: int | None = None, timeout: float = 30.0, carch: str = "x86_64"
+    ) -> None:
+        self.jobs = max(1, jobs or os.cpu_count() or 1)
+        self.timeout = timeout
+        self.env = {
+            "PATH": "/usr/local/bin:/usr/bin:/bin",
+            "HOME": os.environ.get("HOME", "/tmp"),
+            "LC_ALL": "C",
+            "CARCH": carch,
+        }
+        self._idle: list[_EvalWorker] = []
+
+    def __enter__(self) -> "PkgbuildEvaluator":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        while self._idle:
+            self._idle.pop().close()
+
+    def evaluate_many(self, dirs: list[Path]) -> dict[Path, PkgbuildData | None]:
+        """Evaluate every package directory in one batched, parallel call."""
+        todo = list(dirs)
+        results: dict[Path, PkgbuildData | None] = {}
+        lock = threading.Lock()
+
+        def run() -> None:
+            with lock:
+                w = self._idle.pop() if self._idle else None
+            while True:
+                with lock:
+                    if not todo:
+                        break
+                    d = todo.pop(0)
+                if w is None:
+                    w = _EvalWorker(self.env)
+                try:
+                    results[d] = w.evaluate(d.resolve(), self.timeout)
+                except (OSError, ValueError, TimeoutError, EOFError) as e:
+                    warn(f"Failed to evaluate {d.name}/PKGBUILD: {e}")
+                    results[d] = None
+                    w.close()
+                    w = None
+            if w is not None:
+                with lock:
+                    self._idle.append(w)
+
+        threads = [
+            threading.Thread(target=run) for _ in range(min(self.jobs, len(todo)))
+        ]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+
+# ─── .SRCINFO generation ──────────────────────────────────────────────────────
+
+_SPACE_RUN_RE = re.compile(r"[ \t\n\v\f\r]+")
+
+
+def _srcinfo_value(v: str) -> str:
+    """Normalise whitespace exactly like libmakepkg's srcinfo_write_attr."""
+    return _SPACE_RUN_RE.sub(" ", v).removeprefix(" ").removesuffix(" ")
+
+
+def _srcinfo_section(
+    out: list[str],
+    attrs: dict[str, list[str]],
+    single: tuple[str, ...],
+    multi: tuple[str, ...],
+    is_pkg: bool,
+) -> None:
+    # Globals are only written when non-empty; a package_*() override is
+    # written even when it clears the value, which makepkg renders as "k = ".
+    def write(attr: str, multivalued: bool) -> None:
+        vals = attrs.get(attr)
+        if vals is None:
+            return
+        if not multivalued:
+            vals = vals[:1] or [""]
+        if not is_pkg and not (vals and vals[0] if not multivalued else vals):
+            return
+        for v in vals or [""]:
+            out.append(f"\t{attr} = {_srcinfo_value(v)}")
+
+    for attr in single:
+        write(attr, False)
+    for attr in multi:
+        write(attr, True)
+    for a in attrs.get("arch", []):
+        # 'any' is special: there is no support for e.g. depends_any.
+        if a == "any":
+            continue
+        for attr in SRCINFO_ARCH_MULTI:
+            write(f"{attr}_{a}", True)
+
+
+def render_srcinfo(data: PkgbuildData) -> str:
+    """Render evaluated PKGBUILD data as ``makepkg --printsrcinfo`` would.
+
+    Sections are separated by one blank line and the output ends with a
+    single newline, matching the generated .SRCINFO files in this repo.
+    """
+    base = [f"pkgbase = {data.pkgbase}"]
+    _srcinfo_section(base, data.base, SRCINFO_BASE_SINGLE, SRCINFO_BASE_MULTI, False)
+    sections = ["\n".join(base)]
+    for name in data.pkgnames:
+        pkg = [f"pkgname = {name}"]
+        _srcinfo_section(
+            pkg,
+            data.packages.get(name, {}),
+            SRCINFO_PKG_SINGLE,
+            SRCINFO_PKG_MULTI,
+            True,
+        )
+        sections.append("\n".join(pkg))
+    return "\n\n".join(sections) + "\n"
+
+
+# ─── .SRCINFO parsing ─────────────────────────────────────────────────────────
+
+
+class SrcinfoSection:
+    """One ``pkgbase = ...`` or ``pkgname = ...`` block of a .SRCINFO file.
+
+    ``attrs`` maps every key in the block, arch-specific ones like
+    ``depends_x86_64`` included, to a tuple of values in file order. A key
+    written with an empty value (``depends = ``) maps to an empty tuple.
+    """
+
+    __slots__ = ("attrs", "header", "name")
+
+    def __init__(
+        self, header: str, name: str, attrs: dict[str, tuple[str, ...]]
+    ) -> None:
+        self.header = header
+        self.name = name
+        self.attrs = attrs
+
+
+def iter_srcinfo(lines: Iterable[str]) -> Iterator[SrcinfoSection]:
+    """Yield the sections of a .SRCINFO stream in order, one at a time.
+
+    Keys and values are interned: dependency names, licenses and arches
+    repeat heavily across the tree, so all parsed sections share one copy.
+    """
+    intern = sys.intern
+    header = name = None
+    attrs: dict[str, list[str]] = {}
+    for line in lines:
+        k, sep, v = line.partition("=")
+        k = k.strip()
+        if not sep or k.startswith("#"):
+            continue
+        v = v.strip()
+        if k in ("pkgbase", "pkgname"):
+            if header is not None:
+                yield SrcinfoSection(
+                    header, name, {a: tuple(vs) for a, vs in attrs.items()}
+                )
+            header, name, attrs = intern(k), intern(v), {}
+        elif header is not None:
+            vals = attrs.setdefault(intern(k), [])
+            if v:
+                vals.append(intern(v))
+    if header is not None:
+        yield SrcinfoSection(header, name, {a: tuple(vs) for a, vs in attrs.items()})
+
+
+class Srcinfo:
+    """Package metadata: the ``pkgbase`` record plus per-package overrides.
+
+    Lookups follow makepkg: a key set in a package section replaces the
+    pkgbase value entirely, and ``<attr>_<arch>`` keys are separate keys that
+    add to ``<attr>`` on that architecture (see ``for_arch``).
+    """
+
+    __slots__ = ("base", "packages")
+
+    def __init__(
+        self, base: SrcinfoSection, packages: tuple[SrcinfoSection, ...]
+    ) -> None:
+        self.base = base
+        self.packages = packages
+
+    @classmethod
+    def parse(cls, lines: Iterable[str]) -> "Srcinfo | None":
+        """Build from .SRCINFO lines; None unless a pkgbase and a pkgname are present."""
+        sections = iter_srcinfo(lines)
+        base = next(sections, None)
+        if base is None or base.header != "pkgbase":
+            return None
+        packages = tuple(sections)
+        return cls(base, packages) if packages else None
+
+    @classmethod
+    def from_data(cls, data: PkgbuildData) -> "Srcinfo | None":
+        """Build from evaluator output, via the exact text makepkg would write."""
+        return cls.parse(render_srcinfo(data).splitlines())
+
+    @property
+    def pkgbase(self) -> str:
+        return self.base.name
+
+    @property
+    def pkgnames(self) -> tuple[str, ...]:
+        return tuple(p.name for p in self.packages)
+
+    def package(self, name: str) -> SrcinfoSection | None:
+        for p in self.packages:
+            if p.name == name:
+                return p
+        return None
+
+    def get(self, attr: str, pkg: str | None = None) -> tuple[str, ...]:
+        """Values of ``attr`` for package ``pkg`` (or pkgbase when None)."""
+        sec = self.package(pkg) if pkg else None
+        if sec is not None and attr in sec.attrs:
+            return sec.attrs[attr]
+        return self.base.attrs.get(attr, ())
+
+    def value(self, attr: str, pkg: str | None = None) -> str:
+        vals = self.get(attr, pkg)
+        return vals[0] if vals else ""
+
+    def for_arch(self, attr: str, arch: str, pkg: str | None = None) -> tuple[str, ...]:
+        """``attr`` plus its ``attr_<arch>`` additions, e.g. all x86_64 depends."""
+        return self.get(attr, pkg) + self.get(f"{attr}_{arch}", pkg)
+
+    @property
+    def version(self) -> str:
+        """Full ``[epoch:]pkgver-pkgrel`` as pacman reports it."""
+        epoch = self.value("epoch")
+        ver = f"{self.value('pkgver')}-{self.value('pkgrel')}"
+        return f"{epoch}:{ver}" if epoch and epoch != "0" else ver
+
+
+# ─── Dependency graph ─────────────────────────────────────────────────────────
+
+_DEP_VERSION_RE = re.compile(r"[<>=].*$")
+
+
+def dep_name(dep: str) -> str:
+    """``'foo>=1.2'`` -> ``'foo'``: the name a depends/provides entry refers to."""
+    return _DEP_VERSION_RE.sub("", dep.strip())
+
+
+class BuildGraph:
+    """Inter-package build DAG over the package directories of this repo.
+
+    ``deps`` maps each directory (repo-relative, as find_pkgbuilds prints it)
+    to the directories it must wait for, with the depends/makedepends entry
+    that caused each edge. Names a directory builds itself (its own pkgnames
+    and provides) never create edges, so split packages depending on their
+    siblings stay self-contained.
+    """
+
+    DEP_ATTRS = ("depends", "makedepends", "checkdepends")
+
+    __slots__ = ("deps", "dirs", "rdeps")
+
+    def __init__(self, deps: dict[str, dict[str, str]]) -> None:
+        self.deps = deps
+        self.dirs = tuple(sorted(deps))
+        self.rdeps: dict[str, list[str]] = {d: [] for d in self.dirs}
+        for d in self.dirs:
+            for dep in deps[d]:
+                self.rdeps[dep].append(d)
+
+    @classmethod
+    def from_metadata(
+        cls, metas: dict[str, Srcinfo], arch: str = "x86_64"
+    ) -> "BuildGraph":
+        names: dict[str, set[str]] = {}
+        provides: dict[str, set[str]] = {}
+        own: dict[str, set[str]] = {}
+        for d, meta in metas.items():
+            mine = own[d] = set(meta.pkgnames)
+            for n in meta.pkgnames:
+                names.setdefault(n, set()).add(d)
+                for prov in meta.for_arch("provides", arch, n):
+                    mine.add(dep_name(prov))
+                    provides.setdefault(dep_name(prov), set()).add(d)
+        deps: dict[str, dict[str, str]] = {}
+        for d, meta in metas.items():
+            edges = deps[d] = {}
+            wanted = [a for attr in cls.DEP_ATTRS for a in meta.for_arch(attr, arch)]
+            for n in meta.pkgnames:
+                wanted += meta.for_arch("depends", arch, n)
+            for raw in wanted:
+                n = dep_name(raw)
+                if n in own[d]:
+                    continue
+                # One provider, as pacman resolves it: an exact pkgname match
+                # wins over virtual provides, then a dir named after the
+                # dependency, else the first. Depending on every provider
+                # would over-serialize the plan and can invent cycles.
+                cands = sorted(names.get(n) or provides.get(n, ()))
+                if cands:
+                    named = [c for c in cands if c.rsplit("/", 1)[-1] == n]
+                    edges.setdefault((named or cands)[0], raw)
+        return cls(deps)
+
+    def subgraph(self, dirs: Iterable[str]) -> "BuildGraph":
+        """Restrict to ``dirs``; edges to packages outside count as satisfied."""
+        keep = set(dirs)
+        return BuildGraph(
+            {
+                d: {dep: why for dep, why in self.deps[d].items() if dep in keep}
+                for d in self.dirs
+                if d in keep
+            }
+        )
+
+    def find_cycle(self) -> list[str] | None:
+        """One dependency cycle as ``[a, b, ..., a]``, or None if this is a DAG."""
+        state: dict[str, int] = {}
+        for start in self.dirs:
+            if start in state:
+                continue
+            path = [start]
+            stack = [iter(sorted(self.deps[start]))]
+            state[start] = 1
+            while stack:
+                nxt = next(stack[-1], None)
+                if nxt is None:
+                    state[path.pop()] = 2
+                    stack.pop()
+                elif state.get(nxt) == 1:
+                    return path[path.index(nxt) :] + [nxt]
+                elif nxt not in state:
+                    state[nxt] = 1
+                    path.append(nxt)
+                    stack.append(iter(sorted(self.deps[nxt])))
+        return None
+
+    def describe_cycle(self, cycle: list[str]) -> str:
+        return (
+            " -> ".join(
+                f"{a} (needs {self.deps[a][b]!r})" for a, b in itertools.pairwise(cycle)
+            )
+            + f" -> {cycle[-1]}"
+        )
+
+    def critical_path(self, cost: dict[str, float] | None = None) -> dict[str, float]:
+        """Longest cost from each package to the end of the build, itself included.
+
+        Packages with the largest value gate the most downstream work and are
+        scheduled first. ``cost`` defaults to 1 per package.
+        """
+        cost = cost or {}
+        memo: dict[str, float] = {}
+        for d in reversed(self.topological()):
+            memo[d] = max(cost.get(d, 1.0), 0.01) + max(
+                (memo[r] for r in self.rdeps[d]), default=0.0
+            )
+        return memo
+
+    def dependents(self, seeds: Iterable[str]) -> set[str]:
+        """``seeds`` plus everything that transitively depends on them."""
+        out = set(seeds)
+        todo = list(out)
+        while todo:
+            for r in self.rdeps[todo.pop()]:
+                if r not in out:
+                    out.add(r)
+                    todo.append(r)
+        return out
+
+    def topological(self) -> list[str]:
+        """Dependencies before dependents, otherwise by name; ValueError on a cycle."""
+        cycle = self.find_cycle()
+        if cycle:
+            raise ValueError(f"dependency cycle: {self.describe_cycle(cycle)}")
+        indeg = {d: len(self.deps[d]) for d in self.dirs}
+        ready = [d for d in self.dirs if not indeg[d]]
+        out = []
+        while ready:
+            d = heapq.heappop(ready)
+            out.append(d)
+            for r in self.rdeps[d]:
+                indeg[r] -= 1
+                if not indeg[r]:
+                    heapq.heappush(ready, r)
+        return out
+
+    def schedule(self, cost: dict[str, float] | None = None) -> list[tuple[str, float]]:
+        """Packages by descending critical path: the order to start them in.
+
+        Every package's priority exceeds that of all its dependents, so this is
+        also a topological order; with no edges it is longest-processing-time
+        first.
+        """
+        prio = self.critical_path(cost)
+        topo = {d: i for i, d in enumerate(self.topological())}
+        return sorted(prio.items(), key=lambda kv: (-kv[1], topo[kv[0]]))
+
+    def makespan(
+        self,
+        cost: dict[str, float],
+        jobs: int,
+        heavy: frozenset[str] = frozenset(),
+        heavy_jobs: int = 1,
+    ) -> float:
+        """Simulate pkg.sh's build_plan on ``jobs`` slots and return the wall time.
+
+        Like build_plan, each time a slot frees up the schedule is scanned in
+        order, starting every ready package that fits; ``heavy`` packages are
+        held back while ``heavy_jobs`` of them are already running.
+        """
+        order = [d for d, _ in self.schedule(cost)]
+        left = {d: len(self.deps[d]) for d in self.dirs}
+        running: list[tuple[float, str]] = []
+        started: set[str] = set()
+        now = 0.0
+        while len(started) < len(order) or running:
+            n_heavy = sum(1 for _, d in running if d in heavy)
+            for d in order:
+                if len(running) >= jobs:
+                    break
+                if d in started or left[d]:
+                    continue
+                if d in heavy:
+                    if n_heavy >= heavy_jobs:
+                        continue
+                    n_heavy += 1
+                started.add(d)
+                heapq.heappush(running, (now + cost.get(d, 1.0), d))
+            if not running:
+                break
+            now, d = heapq.heappop(running)
+            for r in self.rdeps[d]:
+                left[r] -= 1
+        return now
+
+
+# ─── Artifact cache ───────────────────────────────────────────────────────────
+
+ARTIFACT_KEY_VERSION = 1
+_VCS_PREFIXES = ("bzr", "fossil", "git", "hg", "svn")
+_SIZE_RE = re.compile(r"^(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?$", re.IGNORECASE)
+
+
+def parse_size(text: str) -> int:
+    """``'20G'`` -> bytes (binary units; a bare number is bytes)."""
+    m = _SIZE_RE.match(text.strip())
+    if not m:
+        raise ValueError(f"bad size: {text!r}")
+    return int(float(m.group(1)) * 1024 ** "BKMGT".index((m.group(2) or "B").upper()))
+
+
+def _source_url(entry: str) -> str:
+    """The URL/path part of a source entry (``name::url#fragment``)."""
+    return entry.split("::", 1)[-1]
+
+
+def _is_vcs(url: str) -> bool:
+    scheme = url.split("://", 1)[0] if "://" in url else ""
+    return scheme.split("+", 1)[0] in _VCS_PREFIXES or (
+        scheme in ("http", "https") and url.split("#", 1)[0].endswith(".git")
+    )
+
+
+def makepkg_conf_files() -> list[Path]:
+    """The makepkg.conf files makepkg would source, in its order."""
+    main = Path(os.environ.get("MAKEPKG_CONF") or "/etc/makepkg.conf")
+    files = [main, *sorted(Path(f"{main}.d").glob("*.conf"))]
+    xdg = Path(os.environ.get("XDG_CONFIG_HOME") or Path.home() / ".config")
+    user = xdg / "pacman" / "makepkg.conf"
+    files.append(user if user.exists() else Path.home() / ".makepkg.conf")
+    return [f for f in files if f.is_file()]
+
+
+@functools.cache
+def toolchain_fingerprint() -> str:
+    """Versions of the compilers/linker on PATH, one line each."""
+    probes = (
+        ["gcc", "-dumpfullversion"],
+        ["clang", "--version"],
+        ["ld", "--version"],
+        ["rustc", "--version"],
+    )
+    lines = []
+    for cmd in probes:
+        if shutil.which(cmd[0]) is None:
+            continue
+        try:
+            r = subprocess.run(
+                cmd, capture_output=True, text=True, timeout=10, check=False
+            )
+        except (OSError, subprocess.TimeoutExpired):
+            continue
+        out = r.stdout.splitlines()
+        lines.append(f"{cmd[0]} {out[0].strip() if out else r.returncode}")
+    return "\n".join(lines)
+
+
+class ArtifactCache:
+    """Local content-addressed store of built packages, keyed by build inputs.
+
+    Each entry is a directory ``<root>/<key[:2]>/<key>/`` holding the
+    ``*.pkg.tar.*`` files and a ``meta.json``. Entries are published with an
+    atomic rename, so concurrent builds never see partial ones; the entry's
+    mtime records its last use for LRU eviction.
+    """
+
+    __slots__ = ("root",)
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def _entry(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def lookup(self, key: str) -> list[Path] | None:
+        e = self._entry(key)
+        try:
+            files = sorted(p for p in e.iterdir() if ".pkg.tar." in p.name)
+        except OSError:
+            return None
+        return files or None
+
+    def restore(self, key: str, dest: Path) -> list[Path] | None:
+        """Hardlink (or copy) a hit into ``dest``; None on a miss."""
+        files = self.lookup(key)
+        if files is None:
+            return None
+        out = []
+        for f in files:
+            target = dest / f.name
+            target.unlink(missing_ok=True)
+            try:
+                os.link(f, target)
+            except OSError:
+                shutil.copy2(f, target)
+            out.append(target)
+        os.utime(self._entry(key))
+        return out
+
+    def store(self, key: str, files: list[Path], meta: dict) -> bool:
+        """Publish ``files`` under ``key``; False if the key already exists."""
+        e = self._entry(key)
+        if e.exists():
+            os.utime(e)
+            return False
+        e.parent.mkdir(parents=True, exist_ok=True)
+        tmp = e.parent / f".tmp-{key}-{os.getpid()}"
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir()
+        try:
+            for f in files:
+                shutil.copy2(f, tmp / f.name)
+            (tmp / "meta.json").write_text(json.dumps(meta, indent=2))
+            os.rename(tmp, e)
+        except OSError:
+            shutil.rmtree(tmp, ignore_errors=True)
+            if e.exists():
+                return False
+            raise
+        return True
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        """``(last_used, size, path)`` for every entry, least recently used first."""
+        out = []
+        for e in self.root.glob("??/*"):
+            if e.name.startswith(".tmp-") or not e.is_dir():
+                continue
+            try:
+                size = sum(f.stat().st_size for f in e.iterdir())
+                out.append((e.stat().st_mtime, size, e))
+            except OSError:
+                continue
+        return sorted(out)
+
+    def prune(self, max_bytes: int) -> tuple[int, int]:
+        """Evict least recently used entries until the cache fits ``max_bytes``."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for _, size, e in entries:
+            if total <= max_bytes:
+                break
+            shutil.rmtree(e, ignore_errors=True)
+            total -= size
+            freed += size
+            removed += 1
+        return removed, freed
+
+
+# ─── Build history ────────────────────────────────────────────────────────────
+
+
+def _fmt_duration(sec: float) -> str:
+    sec = int(sec)
+    if sec >= 3600:
+        return f"{sec // 3600}h{sec % 3600 // 60:02d}m"
+    if sec >= 60:
+        return f"{sec // 60}m{sec % 60:02d}s"
+    return f"{sec}s"
+
+
+class BuildEstimate:
+    """Expected cost of building one package, from its recent successful builds."""
+
+    __slots__ = ("cpu", "rss_mb", "samples", "wall")
+
+    def __init__(self, wall: float, cpu: float, rss_mb: int, samples: int) -> None:
+        self.wall = wall
+        self.cpu = cpu
+        self.rss_mb = rss_mb
+        self.samples = samples
+
+
+class BuildHistory:
+    """Append-only JSONL log of package builds, one record per build attempt.
+
+    Records are ``{"pkg", "ts", "rc", "wall", "cpu", "rss_mb", "read_mb",
+    "write_mb", "phases", "cache"}`` with times in seconds; ``phases`` maps
+    each makepkg phase to its ``{"wall", "cpu"}`` and ``cache`` is
+    ``{"tool", "hits", "misses"}``. Fields that could not be measured are
+    missing (Docker builds run outside our process tree). Concurrent
+    ``vp-dev record`` calls append under an exclusive flock.
+    """
+
+    RECENT = 5
+
+    __slots__ = ("path",)
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+
+    def append(self, rec: dict) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        line = json.dumps(rec, separators=(",", ":")) + "\n"
+        with self.path.open("a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(line)
+
+    def records(self) -> Iterator[dict]:
+        try:
+            f = self.path.open(encoding="utf-8")
+        except OSError:
+            return
+        with f:
+            for line in f:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue
+                if isinstance(rec, dict) and "pkg" in rec and "wall" in rec:
+                    yield rec
+
+    def successful(self) -> dict[str, list[dict]]:
+        """Every package's successful builds, oldest first."""
+        out: dict[str, list[dict]] = {}
+        for rec in self.records():
+            if rec.get("rc") == 0:
+                out.setdefault(rec["pkg"], []).append(rec)
+        return out
+
+    def estimates(self) -> dict[str, BuildEstimate]:
+        """Median wall/CPU time and worst peak RSS over each package's last
+        ``RECENT`` successful builds."""
+        ok_runs: dict[str, list[dict]] = {}
+        for rec in self.records():
+            if rec.get("rc") == 0:
+                runs = ok_runs.setdefault(rec["pkg"], [])
+                runs.append(rec)
+                del runs[: -self.RECENT]
+        out = {}
+        for pkg, runs in ok_runs.items():
+            cpus = [r["cpu"] for r in runs if "cpu" in r]
+            out[pkg] = BuildEstimate(
+                statistics.median(r["wall"] for r in runs),
+                statistics.median(cpus) if cpus else 0.0,
+                max((r.get("rss_mb", 0) for r in runs), default=0),
+                len(runs),
+            )
+        return out
+
+
+def _fmt_change(new: float, base: float | None) -> str:
+    if not base:
+        return "-"
+    return f"{(new - base) / base * 100:+.0f}%"
+
+
+def _fmt_phases(phases: dict[str, dict[str, float]]) -> str:
+    return ", ".join(f"{k} {_fmt_duration(v['wall'])}" for k, v in phases.items())
+
+
+def _fmt_cache(cache: dict | None) -> str:
+    if not cache:
+        return "-"
+    total = cache["hits"] + cache["misses"]
+    return f"{cache['hits'] * 100 // total}%" if total else "-"
+
+
+def _proc_usage(pid: int) -> tuple[float, int, int] | None:
+    """CPU seconds, disk bytes read and bytes written so far by ``pid`` and
+    every descendant it has waited for, or None once it is gone."""
+    try:
+        with open(f"/proc/{pid}/stat", encoding="ascii") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        io = {}
+        with (
+            contextlib.suppress(OSError),
+            open(f"/proc/{pid}/io", encoding="ascii") as f,
+        ):
+            for line in f:
+                k, _, v = line.partition(":")
+                io[k] = int(v)
+    except (OSError, IndexError, ValueError):
+        return None
+    # utime, stime, cutime, cstime (fields 14-17, counted from the pid)
+    ticks = sum(int(x) for x in fields[11:15])
+    return (
+        ticks / os.sysconf("SC_CLK_TCK"),
+        io.get("read_bytes", 0),
+        io.get("write_bytes", 0),
+    )
+
+
+class PhaseClock:
+    """Wall and CPU time per makepkg phase, from the progress lines it prints.
+
+    ``feed`` takes output lines as they arrive; time before the first
+    progress line counts towards ``deps``. ``cpu`` is a callable returning
+    the build's CPU seconds so far (or None), sampled at each phase change.
+    """
+
+    def __init__(self, cpu: Callable[[], float | None]) -> None:
+        self._cpu = cpu
+        self._stage = "deps"
+        self._t0 = time.monotonic()
+        self._c0 = cpu()
+        self.phases: dict[str, dict[str, float]] = {}
+        self.seen = False
+
+    def feed(self, line: str) -> None:
+        m = _STAGE_RE.match(_ANSI_RE.sub("", line))
+        if not m:
+            return
+        self.seen = True
+        stage = MAKEPKG_STAGES[m[1]]
+        if stage != self._stage:
+            self.close(self._cpu())
+            self._stage = stage
+
+    def close(self, cpu: float | None) -> None:
+        """End the current phase at ``cpu`` CPU seconds."""
+        now = time.monotonic()
+        p = self.phases.setdefault(self._stage, {"wall": 0.0})
+        p["wall"] = round(p["wall"] + now - self._t0, 1)
+        if cpu is not None and self._c0 is not None:
+            p["cpu"] = round(p.get("cpu", 0.0) + cpu - self._c0, 1)
+        self._t0, self._c0 = now, cpu
+
+
+class CompilerCacheStats:
+    """Hits and misses of the compiler cache one build used.
+
+    ccache counts through a stats log of its own for the build
+    (``CCACHE_STATSLOG``, ccache >= 4), so concurrent builds do not blur
+    each other; sccache, which has no such log, as the change in its
+    server's counters over the build.
+    """
+
+    HITS = frozenset({"direct_cache_hit", "preprocessed_cache_hit"})
+
+    def __init__(self, env: dict[str, str], log: Path) -> None:
+        self.log = log
+        self.sccache = "sccache" in env.get("CMAKE_C_COMPILER_LAUNCHER", "")
+        self.before = None
+        if self.sccache:
+            self.before = self._sccache()
+        else:
+            env["CCACHE_STATSLOG"] = str(log)
+
+    @staticmethod
+    def _sccache() -> tuple[int, int] | None:
+        try:
+            proc = subprocess.run(
+                ["sccache", "--show-stats", "--stats-format=json"],
+                capture_output=True,
+                text=True,
+                timeout=10,
+                check=True,
+            )
+            stats = json.loads(proc.stdout)["stats"]
+            return (
+                sum(stats["cache_hits"]["counts"].values()),
+                sum(stats["cache_misses"]["counts"].values()),
+            )
+        except (OSError, subprocess.SubprocessError, ValueError, KeyError, TypeError):
+            return None
+
+    def result(self) -> dict | None:
+        """``{"tool", "hits", "misses"}``, or None when nothing was compiled
+        through the cache."""
+        if self.sccache:
+            after = self._sccache()
+            if self.before is None or after is None:
+                return None
+            hits, misses = (a - b for a, b in zip(after, self.before, strict=True))
+        else:
+            try:
+                lines = self.log.read_text(encoding="utf-8", errors="replace").split()
+            except OSError:
+                return None
+            finally:
+                self.log.unlink(missing_ok=True)
+            hits = sum(line in self.HITS for line in lines)
+            misses = lines.count("cache_miss")
+        if not hits and not misses:
+            return None
+        return {
+            "tool": "sccache" if self.sccache else "ccache",
+            "hits": hits,
+            "misses": misses,
+        }
+
+
+# ─── Build failure classification ─────────────────────────────────────────────
+
+# Only the end of a failed build's log is searched for the cause; earlier
+# output is full of harmless warnings that look like errors.
+FAILURE_TAIL = 200
+
+# (kind, retry, pattern); the first kind with a match in the tail wins, so
+# more specific causes come first: an OOM-killed compiler also prints
+# "error:", a dead URL ("returned error: 404") also looks like a compile
+# error, and makepkg reports every failed download the same way.
+FAILURE_SIGNATURES: tuple[tuple[str, bool, re.Pattern[str]], ...] = (
+    (
+        "disk",
+        False,
+        re.compile(r"No space left on device|Disk quota exceeded", re.IGNORECASE),
+    ),
+    (
+        "oom",
+        True,
+        re.compile(
+            r"Killed signal terminated program|virtual memory exhausted"
+            r"|out of memory|Cannot allocate memory|std::bad_alloc"
+            r"|memory allocation of \d+ bytes failed|JavaScript heap out of memory",
+            re.IGNORECASE,
+        ),
+    ),
+    (
+        "download",
+        False,
+        re.compile(
+            r"The requested URL returned error: 4(?!29)\d\d"
+            r"|ERROR 4(?!29)\d\d: |fatal: repository '[^']*' not found",
+        ),
+    ),
+    (
+        "network",
+        True,
+        re.compile(
+            r"Could not resolve host|Temporary failure in name resolution"
+            r"|Connection (?:timed out|reset by peer|refused)|Failed to connect to"
+            r"|Operation timed out|Network is unreachable|TLS handshake"
+            r"|The requested URL returned error: (?:429|5\d\d)"
+            r"|Failure while downloading|failed retrieving file|unable to access '"
+            r"|early EOF|RPC failed|spurious network error"
+            r"|ECONNRESET|ETIMEDOUT|EAI_AGAIN|503 Service Unavailable",
+            re.IGNORECASE,
+        ),
+    ),
+    ("integrity", False, re.compile(r"did not pass the validity check")),
+    (
+        "deps",
+        False,
+        re.compile(r"error: target not found|Could not resolve all dependencies"),
+    ),
+    (
+        "compile",
+        False,
+        re.compile(
+            r"\berror(?:\[E\d+\])?:|undefined reference to|\*\*\* \[.*\] Error \d+"
+            r"|ninja: build stopped|compilation terminated|^FAILED: "
+            r"|Traceback \(most recent call last\)",
+            re.MULTILINE,
+        ),
+    ),
+)
+
+# makepkg progress lines and the stage each one starts.
+MAKEPKG_STAGES = {
+    "Installing missing dependencies": "deps",
+    "Retrieving sources": "source",
+    "Validating source": "source",
+    "Extracting sources": "extract",
+    "Starting prepare()": "prepare",
+    "Starting pkgver()": "prepare",
+    "Starting build()": "build",
+    "Starting check()": "check",
+    "Entering fakeroot environment": "package",
+    "Starting package()": "package",
+}
+_ANSI_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+_STAGE_RE = re.compile(
+    r"^==> (" + "|".join(re.escape(m) for m in MAKEPKG_STAGES) + r")",
+    re.MULTILINE,
+)
+
+# makepkg flags that resume a build which failed in a stage. Until build()
+# has started nothing expensive exists yet, so retries start clean (-C, which
+# also drops a half-patched src/); later ones keep src/ and its compiled
+# objects and rerun from build() or package().
+RESUME_ARGS = {
+    "build": ("--noextract",),
+    "check": ("--noextract",),
+    "package": ("--repackage",),
+}
+
+
+class BuildFailure:
+    """Why a build failed: ``kind`` (disk, oom, download, network, integrity,
+    deps, compile or unknown), the makepkg ``stage`` it failed in, whether another attempt may
+    succeed, and the log line that gave it away."""
+
+    __slots__ = ("kind", "line", "retry", "stage")
+
+    def __init__(self, kind: str, retry: bool, stage: str, line: str = "") -> None:
+        self.kind = kind
+        self.retry = retry
+        self.stage = stage
+        self.line = line
+
+    @property
+    def resume(self) -> tuple[str, ...]:
+        return RESUME_ARGS.get(self.stage, ("-C",))
+
+
+def classify_build_log(text: str) -> BuildFailure:
+    """Classify a failed build from its log.
+
+    Transient causes (network trouble, running out of memory) are worth a
+    retry, as are failures without a known signature; a full disk, a dead
+    source URL (HTTP 4xx), bad checksums, missing dependencies and compile
+    errors fail the same way every time.
+    """
+    text = _ANSI_RE.sub("", text)
+    stages = _STAGE_RE.findall(text)
+    stage = MAKEPKG_STAGES[stages[-1]] if stages else "deps"
+    tail = "\n".join(text.splitlines()[-FAILURE_TAIL:])
+    for kind, retry, pattern in FAILURE_SIGNATURES:
+        if m := pattern.search(tail):
+            start = tail.rfind("\n", 0, m.start()) + 1
+            end = tail.find("\n", m.end())
+            line = tail[start : end if end >= 0 else None].strip()
+            return BuildFailure(kind, retry, stage, line)
+    return BuildFailure("unknown", True, stage)
+
+
+# ─── Upstream version checks ──────────────────────────────────────────────────
+
+# Concurrent connections per host; api.github.com serves most entries.
+UPSTREAM_PER_HOST = 16
+UPSTREAM_TIMEOUT = 30
+
+
+class HttpError(Exception):
+    def __init__(self, url: str, status: int) -> None:
+        super().__init__(f"HTTP {status} for {url}")
+        self.url = url
+        self.status = status
+
+
+class HttpTransport:
+    """Keep-alive HTTP(S) GETs, at most ``per_host`` connections per host.
+
+    Idle connections are kept per host and reused, so a run against one API
+    pays for each TLS handshake once per slot. ``redirect`` maps a hostname
+    to a base URL its requests go to instead; tests use it to send every
+    upstream to one local server. Anything with the same ``get`` can be
+    passed to ``UpstreamChecker`` in its place.
+    """
+
+    def __init__(
+        self,
+        per_host: int = UPSTREAM_PER_HOST,
+        timeout: float = UPSTREAM_TIMEOUT,
+        redirect: dict[str, str] | None = None,
+    ) -> None:
+        self.per_host = max(1, per_host)
+        self.timeout = timeout
+        self.redirect = redirect or {}
+        self._lock = threading.Lock()
+        self._slots: dict[tuple[str, str], threading.BoundedSemaphore] = {}
+        self._idle: dict[tuple[str, str], list] = {}
+
+    def _target(self, url: str) -> tuple[str, str, str]:
+        parts = urllib.parse.urlsplit(url)
+        base = self.redirect.get(parts.hostname or "")
+        if base:
+            parts = urllib.parse.urlsplit(
+                base.rstrip("/") + urllib.parse.urlunsplit(("", "", *parts[2:]))
+            )
+        path = urllib.parse.urlunsplit(("", "", parts.path or "/", parts.query, ""))
+        return parts.scheme, parts.netloc, path
+
+    def _connect(self, scheme: str, netloc: str):
+        cls = (
+            http.client.HTTPSConnection
+            if scheme == "https"
+            else http.client.HTTPConnection
+        )
+        return cls(netloc, timeout=self.timeout)
+
+    def get(
+        self, url: str, headers: dict[str, str] | None = None
+    ) -> tuple[int, dict[str, str], bytes]:
+        """GET ``url``, following redirects; returns status, headers and body."""
+        for _ in range(5):
+            scheme, netloc, path = self._target(url)
+            key = (scheme, netloc)
+            with self._lock:
+                slots = self._slots.setdefault(
+                    key, threading.BoundedSemaphore(self.per_host)
+                )
+                idle = self._idle.setdefault(key, [])
+            hdrs = {
+                "User-Agent": f"vp-dev/{VERSION}",
+                "Accept-Encoding": "gzip",
+                **(headers or {}),
+            }
+            with slots:
+                with self._lock:
+                    conn = idle.pop() if idle else None
+                reused = conn is not None
+                while True:
+                    conn = conn or self._connect(scheme, netloc)
+                    try:
+                        conn.request("GET", path, headers=hdrs)
+                        resp = conn.getresponse()
+                        body = resp.read()
+                        break
+                    except (http.client.HTTPException, OSError):
+                        conn.close()
+                        conn = None
+                        # A kept-alive connection may have been closed by
+                        # the server; retry once on a fresh one.
+                        if not reused:
+                            raise
+                        reused = False
+                resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+                if resp.will_close:
+                    conn.close()
+                else:
+                    with self._lock:
+                        idle.append(conn)
+            if resp_headers.get("content-encoding") == "gzip":
+                body = gzip.decompress(body)
+            if resp.status in (301, 302, 303, 307, 308) and "location" in resp_headers:
+                url = urllib.parse.urljoin(url, resp_headers["location"])
+                continue
+            return resp.status, resp_headers, body
+        raise HttpError(url, 310)
+
+    def close(self) -> None:
+        with self._lock:
+            for conns in self._idle.values():
+                for conn in conns:
+                    conn.close()
+            self._idle.clear()
+
+
+class CachingTransport:
+    """Wraps a transport with in-run coalescing and persistent ETag revalidation.
+
+    Within one run each URL is fetched once: concurrent callers wait for the
+    first request and later ones reuse its answer. Successful responses that
+    carry an ``ETag`` or ``Last-Modified`` are kept in ``path`` and the next
+    run sends them back as ``If-None-Match``/``If-Modified-Since``; GitHub
+    does not count the resulting 304s against the rate limit. Entries unused
+    for ``max_age`` seconds are dropped when the store is saved.
+    """
+
+    KEEP_HEADERS = ("etag", "last-modified", "link", "content-type")
+
+    def __init__(
+        self, inner: HttpTransport, path: Path | None, max_age: float = 30 * 86400
+    ) -> None:
+        self.inner = inner
+        self.path = path
+        self.max_age = max_age
+        self.requests = self.coalesced = self.revalidated = self.fetched = 0
+        self._lock = threading.Lock()
+        self._runs: dict[str, concurrent.futures.Future] = {}
+        self._dirty: dict[str, dict] = {}
+        self._store: dict[str, dict] = {}
+        if path:
+            with contextlib.suppress(OSError, ValueError):
+                self._store = json.loads(path.read_text()).get("entries", {})
+
+    def get(
+        self, url: str, headers: dict[str, str] | None = None
+    ) -> tuple[int, dict[str, str], bytes]:
+        with self._lock:
+            self.requests += 1
+            fut = self._runs.get(url)
+            owner = fut is None
+            if owner:
+                fut = self._runs[url] = concurrent.futures.Future()
+            else:
+                self.coalesced += 1
+        if not owner:
+            return fut.result()
+        try:
+            res = self._fetch(url, headers)
+        except BaseException as e:
+            fut.set_exception(e)
+            raise
+        fut.set_result(res)
+        return res
+
+    def _fetch(
+        self, url: str, headers: dict[str, str] | None
+    ) -> tuple[int, dict[str, str], bytes]:
+        cached = self._store.get(url)
+        hdrs = dict(headers or {})
+        if cached:
+            if "etag" in cached["headers"]:
+                hdrs["If-None-Match"] = cached["headers"]["etag"]
+            if "last-modified" in cached["headers"]:
+                hdrs["If-Modified-Since"] = cached["headers"]["last-modified"]
+        status, resp_headers, body = self.inner.get(url, hdrs)
+        if status == 304 and cached:
+            with self._lock:
+                self.revalidated += 1
+                self._dirty[url] = {**cached, "used": time.time()}
+            body = cached["body"].encode("utf-8", "surrogateescape")
+            return 200, {**cached["headers"], **resp_headers}, body
+        with self._lock:
+            self.fetched += 1
+            if status == 200 and (
+                "etag" in resp_headers or "last-modified" in resp_headers
+            ):
+                self._dirty[url] = {
+                    "used": time.time(),
+                    "headers": {
+                        k: resp_headers[k]
+                        for k in self.KEEP_HEADERS
+                        if k in resp_headers
+                    },
+                    "body": body.decode("utf-8", "surrogateescape"),
+                }
+        return status, resp_headers, body
+
+    def summary(self) -> str:
+        hits = self.coalesced + self.revalidated
+        rate = hits / self.requests if self.requests else 0.0
+        return (
+            f"HTTP cache: {hits}/{self.requests} hits ({rate:.0%}); "
+            f"{self.coalesced} coalesced, {self.revalidated} not modified, "
+            f"{self.fetched} fetched"
+        )
+
+    def close(self) -> None:
+        """Merge this run's entries into ``path`` under a lock and close ``inner``."""
+        self.inner.close()
+        if not self.path or not self._dirty:
+            return
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path.with_name(self.path.name + ".lock"), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    entries = json.loads(self.path.read_text()).get("entries", {})
+                except (OSError, ValueError):
+                    entries = {}
+                entries.update(self._dirty)
+                cutoff = time.time() - self.max_age
+                entries = {
+                    k: v for k, v in entries.items() if v.get("used", 0) >= cutoff
+                }
+                tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}")
+                tmp.write_text(json.dumps({"entries": entries}))
+                tmp.replace(self.path)
+        except OSError as e:
+            warn(f"Failed to write HTTP cache: {e}")
+        self._dirty.clear()
+
+
+def _github_token() -> str | None:
+    return os.environ.get("GITHUB_TOKEN") or os.environ.get("GH_TOKEN")
+
+
+def read_versions(path: Path) -> dict[str, str]:
+    """A version file in either nvchecker layout, as ``{name: version}``."""
+    try:
+        data = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return {}
+    if isinstance(data, dict) and data.get("version") == 2:
+        return {
+            k: v["version"] if isinstance(v, dict) else v
+            for k, v in data.get("data", {}).items()
+        }
+    return data if isinstance(data, dict) else {}
+
+
+def version_key(v: str) -> tuple:
+    """Sort key approximating nvchecker's default ``parse_version`` order.
+
+    Numeric runs compare as numbers and beat letters, and a trailing letter
+    run sorts before the end of the string, so ``1.0rc1 < 1.0 < 1.0.1``.
+    """
+    return (
+        *(
+            (2, int(p)) if p.isdigit() else (1, p)
+            for p in re.findall(r"\d+|[A-Za-z]+", v)
+        ),
+        (1.5,),
+    )
+
+
+class UpstreamChecker:
+    """Latest upstream version per ``nvchecker.toml`` entry.
+
+    Understands the sources and options this repo uses: ``github``
+    (``use_latest_release``, ``use_max_tag``, ``use_commit``, else the
+    latest commit date), ``gitlab`` (same, with ``host``), ``regex``, ``git``
+    (tags, or ``use_commit`` on ``branch``), ``aur`` and ``repology``, plus
+    the ``include_regex``/``exclude_regex`` list filters and ``prefix``.
+    Sources returning several candidates yield the greatest by
+    ``version_key``.
+    """
+
+    SOURCES = ("github", "gitlab", "regex", "git", "aur", "repology")
+
+    def __init__(
+        self,
+        transport: HttpTransport | CachingTransport,
+        github_token: str | None = None,
+        git: str = "git",
+        per_host: int = UPSTREAM_PER_HOST,
+    ) -> None:
+        self.transport = transport
+        self.github_token = github_token
+        self.git = git
+        self.per_host = per_host
+        self._lock = threading.Lock()
+        self._git_slots: dict[str, threading.BoundedSemaphore] = {}
+
+    def _get(self, url: str, headers: dict[str, str] | None = None) -> bytes:
+        status, _, body = self.transport.get(url, headers)
+        if status != 200:
+            raise HttpError(url, status)
+        return body
+
+    def _json(self, url: str, headers: dict[str, str] | None = None) -> Any:
+        return json.loads(self._get(url, headers))
+
+    def _github_pages(self, url: str, limit: int = 10) -> Iterator[Any]:
+        headers = {"Accept": "application/vnd.github+json"}
+        if self.github_token:
+            headers["Authorization"] = f"Bearer {self.github_token}"
+        for _ in range(limit):
+            status, hdrs, body = self.transport.get(url, headers)
+            if status != 200:
+                raise HttpError(url, status)
+            yield json.loads(body)
+            m = re.search(r'<([^>]+)>;\s*rel="next"', hdrs.get("link", ""))
+            if not m:
+                return
+            url = m.group(1)
+
+    def _github(self, e: dict) -> str | list[str]:
+        api = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+        repo = f"{api}/repos/{e['github']}"
+        if e.get("use_latest_release"):
+            return next(self._github_pages(f"{repo}/releases/latest", 1))["tag_name"]
+        if e.get("use_max_tag"):
+            return [
+                t["name"]
+                for page in self._github_pages(f"{repo}/tags?per_page=100")
+                for t in page
+            ]
+        query = "?per_page=1" + (f"&sha={e['branch']}" if e.get("branch") else "")
+        commit = next(self._github_pages(f"{repo}/commits{query}", 1))[0]
+        if e.get("use_commit"):
+            return commit["sha"]
+        date = commit["commit"]["committer"]["date"].rstrip("Z")
+        return date.replace("-", "").replace(":", "").replace("T", ".")
+
+    def _gitlab(self, e: dict) -> str | list[str]:
+        host = e.get("host", "gitlab.com")
+        proj = (
+            f"https://{host}/api/v4/projects/{urllib.parse.quote(e['gitlab'], safe='')}"
+        )
+        if e.get("use_max_tag"):
+            return [
+                t["name"] for t in self._json(f"{proj}/repository/tags?per_page=100")
+            ]
+        if e.get("use_latest_release"):
+            return self._json(f"{proj}/releases?per_page=1")[0]["tag_name"]
+        ref = (
+            f"?ref_name={e['branch']}&per_page=1" if e.get("branch") else "?per_page=1"
+        )
+        commit = self._json(f"{proj}/repository/commits{ref}")[0]
+        if e.get("use_commit"):
+            return commit["id"]
+        date = commit["created_at"].split("+")[0].split(".")[0]
+        return date.replace("-", "").replace(":", "").replace("T", ".")
+
+    def _regex(self, e: dict) -> list[str]:
+        text = self._get(e["url"]).decode("utf-8", "replace")
+        return re.findall(e["regex"], text)
+
+    def _git(self, e: dict) -> str | list[str]:
+        url = e["git"]
+        host = urllib.parse.urlsplit(url).hostname or url
+        with self._lock:
+            slot = self._git_slots.setdefault(
+                host, threading.BoundedSemaphore(self.per_host)
+            )
+        if e.get("use_commit"):
+            ref = f"refs/heads/{e['branch']}" if e.get("branch") else "HEAD"
+            cmd = [self.git, "ls-remote", url, ref]
+        else:
+            cmd = [self.git, "ls-remote", "--tags", "--refs", url]
+        with slot:
+            out = subprocess.run(
+                cmd,
+                capture_output=True,
+                text=True,
+                timeout=UPSTREAM_TIMEOUT,
+                env={**os.environ, "GIT_TERMINAL_PROMPT": "0"},
+            )
+        if out.returncode != 0:
+            raise RuntimeError(
+                out.stderr.strip() or f"git ls-remote exited {out.returncode}"
+            )
+        refs = [line.split("\t", 1) for line in out.stdout.splitlines() if "\t" in line]
+        if e.get("use_commit"):
+            if not refs:
+                raise RuntimeError(f"no ref {ref} at {url}")
+            return refs[0][0]
+        return [r.removeprefix("refs/tags/") for _, r in refs]
+
+    def _aur(self, e: dict, name: str) -> str:
+        pkg = e.get("aur") or name
+        data = self._json(
+            f"https://aur.archlinux.org/rpc/v5/info?arg[]={urllib.parse.quote(pkg)}"
+        )
+        if not data.get("results"):
+            raise RuntimeError(f"{pkg} not found on the AUR")
+        ver = data["results"][0]["Version"]
+        return ver.rsplit("-", 1)[0] if e.get("strip_release") else ver
+
+    def _repology(self, e: dict, name: str) -> list[str]:
+        proj = urllib.parse.quote(e.get("repology") or name)
+        pkgs = self._json(f"https://repology.org/api/v1/project/{proj}")
+        return [
+            p["version"]
+            for p in pkgs
+            if p.get("repo") == e["repo"]
+            and (not e.get("subrepo") or p.get("subrepo") == e["subrepo"])
+        ]
+
+    def check(self, name: str, e: dict) -> str:
+        """The current upstream version for entry ``name``; raises on failure."""
+        src = e.get("source")
+        if src == "aur":
+            found: str | list[str] = self._aur(e, name)
+        elif src == "repology":
+            found = self._repology(e, name)
+        elif src in self.SOURCES:
+            found = getattr(self, f"_{src}")(e)
+        else:
+            raise ValueError(f"unsupported source {src!r}")
+        if isinstance(found, list):
+            found = [v if isinstance(v, str) else v[0] for v in found]
+            if e.get("include_regex"):
+                inc = re.compile(e["include_regex"])
+                found = [v for v in found if inc.fullmatch(v)]
+            if e.get("exclude_regex"):
+                exc = re.compile(e["exclude_regex"])
+                found = [v for v in found if not exc.fullmatch(v)]
+            if not found:
+                raise RuntimeError("no matching versions")
+            found = max(found, key=version_key)
+        prefix = e.get("prefix", "")
+        return found[len(prefix) :] if prefix and found.startswith(prefix) else found
+
+    def check_all(
+        self, entries: dict[str, dict], jobs: int | None = None
+    ) -> dict[str, str | Exception]:
+        """``check`` every entry at once; per-host limits do the throttling."""
+        results: dict[str, str | Exception] = {}
+        if not entries:
+            return results
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=jobs or min(64, len(entries))
+        ) as ex:
+            futs = {ex.submit(self.check, n, e): n for n, e in entries.items()}
+            for fut in concurrent.futures.as_completed(futs):
+                try:
+                    results[futs[fut]] = fut.result()
+                except Exception as e:  # noqa: BLE001 - reported per entry
+                    results[futs[fut]] = e
+        return results
+
+
+# ─── Source store ─────────────────────────────────────────────────────────────
+
+_HASHES = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha224": hashlib.sha224,
+    "sha256": hashlib.sha256,
+    "sha384": hashlib.sha384,
+    "sha512": hashlib.sha512,
+    "b2": hashlib.blake2b,
+}
+DOWNLOAD_TIMEOUT = 60
+DOWNLOAD_CHUNK = 1 << 20
+# ioctl(2) request that clones a file's extents (btrfs/XFS reflink).
+FICLONE = 0x40049409
+
+
+def split_source(entry: str) -> tuple[str, str]:
+    """``(filename, location)`` of a ``source`` entry, as makepkg names it."""
+    name, sep, loc = entry.partition("::")
+    if not sep:
+        name, loc = "", entry
+    if not name:
+        name = loc.split("#", 1)[0].split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+        if source_kind(loc) == "vcs":
+            name = name.removesuffix(".git")
+    return name, loc
+
+
+def source_kind(loc: str) -> str:
+    """``local``, ``download`` or ``vcs`` for a source location."""
+    scheme, sep, _ = loc.partition("://")
+    if not sep:
+        return "local"
+    if "+" in scheme or scheme in _VCS_PREFIXES:
+        return "vcs"
+    return "download"
+
+
+def hash_stream(
+    fp, algos: Iterable[str], sink=None, chunk: int = DOWNLOAD_CHUNK
+) -> dict[str, str]:
+    """Hex digests of everything readable from ``fp``, in one pass.
+
+    With ``sink``, the data is also written there as it streams by.
+    """
+    hs = {a: _HASHES[a]() for a in algos}
+    while data := fp.read(chunk):
+        for h in hs.values():
+            h.update(data)
+        if sink is not None:
+            sink.write(data)
+    return {a: h.hexdigest() for a, h in hs.items()}
+
+
+def open_url(url: str):
+    """Open ``url`` (fragment dropped) for streaming."""
+    req = urllib.request.Request(
+        url.split("#", 1)[0], headers={"User-Agent": f"vp-dev/{VERSION}"}
+    )
+    return urllib.request.urlopen(req, timeout=DOWNLOAD_TIMEOUT)
+
+
+def hash_url(url: str, algos: Iterable[str]) -> dict[str, str]:
+    """Stream ``url`` through every hash in ``algos`` without touching disk."""
+    with open_url(url) as resp:
+        return hash_stream(resp, algos)
+
+
+class SourceStore:
+    """Content-addressed cache of downloaded sources, shared by every build.
+
+    Files live at ``<root>/<sha[:2]>/<sha>``, keyed by SHA-256;
+    ``<root>/urls/<sha1(url)>.json`` records which object a URL produced and
+    every digest computed over it, so asking again neither downloads nor
+    rereads the file. ``git+`` sources are kept as bare mirrors under
+    ``<root>/git/`` and updated incrementally. Downloads are hashed while
+    they stream into a temp file published with an atomic rename, and each
+    URL or mirror is fetched under its own ``flock``, so parallel fetchers
+    never duplicate work or see partial objects. mtimes record last use for
+    LRU eviction.
+    """
+
+    __slots__ = ("git", "root")
+
+    def __init__(self, root: Path, git: str = "git") -> None:
+        self.root = root
+        self.git = git
+
+    def object(self, sha256: str) -> Path:
+        return self.root / sha256[:2] / sha256
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha1(url.split("#", 1)[0].encode()).hexdigest()
+
+    def _url_meta(self, url: str) -> Path:
+        return self.root / "urls" / f"{self._key(url)}.json"
+
+    @contextlib.contextmanager
+    def _locked(self, url: str) -> Iterator[None]:
+        locks = self.root / "locks"
+        locks.mkdir(parents=True, exist_ok=True)
+        with (locks / f"{self._key(url)}.lock").open("w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def lookup(self, url: str) -> dict | None:
+        """Metadata of the cached download of ``url``, if its object exists."""
+        try:
+            meta = json.loads(self._url_meta(url).read_text())
+        except (OSError, ValueError):
+            return None
+        return meta if self.object(meta["digests"]["sha256"]).is_file() else None
+
+    def _save_meta(self, url: str, meta: dict) -> None:
+        path = self._url_meta(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".tmp-{path.name}-{os.getpid()}-{threading.get_ident()}")
+        tmp.write_text(json.dumps(meta))
+        tmp.replace(path)
+
+    def hashes(self, url: str, algos: Iterable[str]) -> dict[str, str]:
+        """Digests of ``url``'s content, downloading it only on a miss."""
+        algos = set(algos)
+        meta = self.lookup(url)
+        if meta is None:
+            with self._locked(url):
+                meta = self.lookup(url)
+                if meta is None:
+                    return self.download(url, algos)
+        obj = self.object(meta["digests"]["sha256"])
+        missing = algos - meta["digests"].keys()
+        if missing:
+            with obj.open("rb") as f:
+                meta["digests"].update(hash_stream(f, missing))
+            self._save_meta(url, meta)
+        with contextlib.suppress(OSError):
+            os.utime(obj)
+        return {a: meta["digests"][a] for a in algos}
+
+    def download(self, url: str, algos: Iterable[str] = ()) -> dict[str, str]:
+        """Fetch ``url`` into the store, hashing it on the way in."""
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".tmp-{os.getpid()}-{threading.get_ident()}"
+        try:
+            with open_url(url) as resp, tmp.open("wb") as out:
+                digests = hash_stream(resp, {"sha256", *algos}, out)
+            obj = self.object(digests["sha256"])
+            obj.parent.mkdir(exist_ok=True)
+            tmp.replace(obj)
+        finally:
+            tmp.unlink(missing_ok=True)
+        self._save_meta(
+            url, {"url": url, "size": obj.stat().st_size, "digests": digests}
+        )
+        return {a: digests[a] for a in {"sha256", *algos}}
+
+    def fetch(self, url: str, expected: dict[str, str]) -> tuple[Path, bool]:
+        """Object holding ``url``, verified against ``expected`` digests.
+
+        A known ``sha256`` is looked up directly, so a file already stored
+        under another URL (a mirror, a renamed release asset) is reused.
+        Returns the path and whether it was a cache hit; raises ValueError
+        on a checksum mismatch, or without digests: a stored copy of an
+        unverifiable (``SKIP``) source could be stale for good.
+        """
+        if not expected:
+            raise ValueError(f"{url}: no checksum to verify a stored copy against")
+        sha = expected.get("sha256")
+        if sha and self.object(sha).is_file():
+            with contextlib.suppress(OSError):
+                os.utime(self.object(sha))
+            return self.object(sha), True
+        hit = self.lookup(url) is not None
+        digests = self.hashes(url, {"sha256", *expected})
+        bad = [a for a, v in expected.items() if digests[a] != v]
+        if bad:
+            raise ValueError(f"{url}: {'/'.join(bad)} checksum mismatch")
+        return self.object(digests["sha256"]), hit
+
+    def mirror(self, url: str) -> tuple[Path, bool]:
+        """Bare mirror of git ``url``, cloned once and then only fetched.
+
+        Returns the mirror and whether it already existed.
+        """
+        name = url.split("#", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+        m = self.root / "git" / f"{name.removesuffix('.git')}-{self._key(url)[:12]}.git"
+        env = {**os.environ, "GIT_TERMINAL_PROMPT": "0"}
+        with self._locked(url):
+            existed = m.is_dir()
+            if existed:
+                cmd = [self.git, "-C", str(m), "remote", "update", "--prune"]
+            else:
+                m.parent.mkdir(parents=True, exist_ok=True)
+                tmp = m.with_name(f".tmp-{m.name}-{os.getpid()}")
+                shutil.rmtree(tmp, ignore_errors=True)
+                cmd = [self.git, "clone", "--mirror", "--quiet", url, str(tmp)]
+            r = subprocess.run(cmd, capture_output=True, text=True, env=env)
+            if r.returncode != 0:
+                raise RuntimeError(r.stderr.strip() or f"{cmd[1]} failed for {url}")
+            if not existed:
+                tmp.rename(m)
+            os.utime(m)
+        return m, existed
+
+    def link_mirror(self, mirror: Path, dest: Path, url: str) -> None:
+        """Make ``dest`` a bare clone of ``mirror`` that makepkg accepts for ``url``.
+
+        A local clone hard-links the mirror's objects; an existing ``dest``
+        is just fetched from the mirror. origin points at ``url``, as
+        makepkg checks it before its own incremental fetch.
+        """
+        if dest.is_dir():
+            cmd = [
+                self.git,
+                "-C",
+                str(dest),
+                "fetch",
+                "--quiet",
+                "--prune",
+                str(mirror),
+            ]
+            cmd.append("+refs/*:refs/*")
+        else:
+            cmd = [self.git, "clone", "--mirror", "--quiet", str(mirror), str(dest)]
+        for c in (cmd, [self.git, "-C", str(dest), "remote", "set-url", "origin", url]):
+            r = subprocess.run(c, capture_output=True, text=True)
+            if r.returncode != 0:
+                raise RuntimeError(r.stderr.strip() or f"git {c[1]} failed")
+
+    def entries(self) -> list[tuple[float, int, Path]]:
+        """``(last_used, size, path)`` of every object and mirror, LRU first."""
+        out = []
+        for e in itertools.chain(self.root.glob("??/*"), self.root.glob("git/*.git")):
+            if e.name.startswith(".tmp-"):
+                continue
+            try:
+                if e.is_dir():
+                    size = sum(f.stat().st_size for f in e.rglob("*") if f.is_file())
+                else:
+                    size = e.stat().st_size
+                out.append((e.stat().st_mtime, size, e))
+            except OSError:
+                continue
+        return sorted(out)
+
+    def prune(self, max_bytes: int) -> tuple[int, int]:
+        """Evict least recently used entries until the store fits ``max_bytes``.
+
+        Hard links already made into package dirs keep their data alive.
+        """
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        removed = freed = 0
+        for _, size, e in entries:
+            if total <= max_bytes:
+                break
+            if e.is_dir():
+                shutil.rmtree(e, ignore_errors=True)
+            else:
+                e.unlink(missing_ok=True)
+            total -= size
+            freed += size
+            removed += 1
+        if removed:
+            for meta in self.root.glob("urls/*.json"):
+                with contextlib.suppress(OSError, ValueError, KeyError):
+                    sha = json.loads(meta.read_text())["digests"]["sha256"]
+                    if not self.object(sha).exists():
+                        meta.unlink()
+        return removed, freed
+
+
+def link_file(src: Path, dest: Path) -> None:
+    """Put ``src`` at ``dest`` as a hard link, else a reflink, else a copy."""
+    with contextlib.suppress(OSError):
+        if dest.samefile(src):
+            return
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+        return
+    except OSError:
+        pass
+    try:
+        with src.open("rb") as s, dest.open("wb") as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
+# ─── Version bumps ────────────────────────────────────────────────────────────
+
+
+def pkgver_for(version: str, current: str = "") -> str:
+    """Turn an upstream version into a valid ``pkgver``.
+
+    A leading ``v`` is dropped unless the current pkgver keeps one, and the
+    characters makepkg rejects (``-``, ``:``, ``/``, whitespace) become dots,
+    as in ``v1.70.0-filen.15`` -> ``1.70.0.filen.15``.
+    """
+    if re.match(r"v\d", version) and not current.startswith("v"):
+        version = version[1:]
+    return re.sub(r"[-:/\s]+", ".", version.strip())
+
+
+def _set_scalar(text: str, name: str, value: str) -> tuple[str, str | None]:
+    """Replace the literal value of the first top-level ``name=`` line.
+
+    Quoting and anything after the value (comments) are kept. Returns the
+    new text and the old value, or ``None`` when there is no literal to edit.
+    """
+    m = re.search(
+        rf"""^({name}=)(?:'([^'$]*)'|"([^"$`\\]*)"|([^\s'"$`;#()\\]*))""",
+        text,
+        re.MULTILINE,
+    )
+    if not m:
+        return text, None
+    q = "'" if m.group(2) is not None else '"' if m.group(3) is not None else ""
+    old = next(g for g in m.groups()[1:] if g is not None)
+    return text[: m.start()] + f"{m.group(1)}{q}{value}{q}" + text[m.end() :], old
+
+
+def bump_pkgbuild(text: str, version: str) -> tuple[str, str, str]:
+    """Set ``pkgver`` to ``version`` and reset ``pkgrel`` to 1, in place.
+
+    Only the two values change; layout, quoting and comments are untouched.
+    Returns ``(text, old_pkgver, new_pkgver)`` and raises ValueError when the
+    PKGBUILD computes its version (``pkgver()`` or a non-literal value).
+    """
+    if re.search(r"^pkgver\s*\(\)", text, re.MULTILINE):
+        raise ValueError("pkgver() computes the version")
+    _, current = _set_scalar(text, "pkgver", "")
+    if current is None:
+        raise ValueError("pkgver is not a literal")
+    new = pkgver_for(version, current)
+    text, _ = _set_scalar(text, "pkgver", new)
+    if new != current:
+        text, rel = _set_scalar(text, "pkgrel", "1")
+        if rel is None:
+            raise ValueError("pkgrel is not a literal")
+    return text, current, new
+
+
+def sum_arrays(data: "PkgbuildData") -> Iterator[tuple[str, str, list[str]]]:
+    """``(sums attr, algo, source attr)`` for every checksum array set."""
+    for attr in data.base:
+        m = re.fullmatch(r"([a-z0-9]+)sums(_\w+)?", attr)
+        if m and f"{m.group(1)}sums" in _SUMS:
+            yield attr, m.group(1), f"source{m.group(2) or ''}"
+
+
+def replace_array_values(text: str, attr: str, old: list[str], new: list[str]) -> str:
+    """Swap ``old[i]`` for ``new[i]`` inside the ``attr=( ... )`` assignment.
+
+    Values are replaced left to right in their existing quotes, so the
+    array's layout and comments survive. Raises ValueError when the array
+    or one of its values cannot be found literally.
+    """
+    m = re.search(rf"^[ \t]*{re.escape(attr)}=\(", text, re.MULTILINE)
+    if not m:
+        raise ValueError(f"{attr}=() not found")
+    end = text.find(")", m.end())
+    if end < 0:
+        raise ValueError(f"unterminated {attr}=()")
+    body, pos = text[m.end() : end], 0
+    for o, n in zip(old, new, strict=True):
+        i = body.find(o, pos)
+        if i < 0:
+            raise ValueError(f"{attr}: {o!r} is not written literally")
+        body = body[:i] + n + body[i + len(o) :]
+        pos = i + len(n)
+    return text[: m.end()] + body + text[end:]
+
+
+def apply_sums(
+    text: str, data: "PkgbuildData", new: dict[str, list[str]]
+) -> tuple[str, int]:
+    """Write recomputed arrays into PKGBUILD ``text`` and ``data``.
+
+    Returns the new text and how many checksum values changed.
+    """
+    changed = 0
+    for attr, vals in new.items():
+        old = data.base[attr]
+        if vals != old:
+            text = replace_array_values(text, attr, old, vals)
+            changed += sum(o != v for o, v in zip(old, vals))
+            data.base[attr] = vals
+    return text, changed
+
+
+class SourceHasher:
+    """Recomputes ``*sums`` arrays for many packages on one download pool.
+
+    ``plan`` every package first, then ``start``: each distinct URL is then
+    downloaded once and streamed through all the hashes any array wants, so
+    a batch costs about its largest download. With a ``store``, downloads
+    are kept there and URLs already in it are not fetched again. ``SKIP``
+    entries and VCS sources are left alone; local files are hashed from the
+    package dir.
+    """
+
+    def __init__(self, jobs: int = 8, store: SourceStore | None = None) -> None:
+        self.jobs = max(1, jobs)
+        self.store = store
+        self._wanted: dict[str, set[str]] = {}
+        self._futures: dict[str, concurrent.futures.Future] = {}
+        self._pool: concurrent.futures.ThreadPoolExecutor | None = None
+
+    def __enter__(self) -> "SourceHasher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        if self._pool:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def plan(self, d: Path, data: "PkgbuildData") -> dict[str, list]:
+        """Record the hashes ``d`` needs; pass the result to ``result``."""
+        planned: dict[str, list] = {}
+        for attr, algo, src_attr in sum_arrays(data):
+            items = planned[attr] = []
+            for entry, old in zip(data.base.get(src_attr, []), data.base[attr]):
+                loc = split_source(entry)[1]
+                kind = source_kind(loc)
+                if old == "SKIP" or kind == "vcs":
+                    items.append((None, old))
+                    continue
+                key = str(d / loc) if kind == "local" else loc
+                self._wanted.setdefault(key, set()).add(algo)
+                items.append((key, algo))
+        return planned
+
+    def start(self) -> None:
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.jobs)
+        for key, algos in self._wanted.items():
+            if "://" not in key:
+                fn = self._hash_file
+            else:
+                fn = self.store.hashes if self.store else hash_url
+            self._futures[key] = self._pool.submit(fn, key, algos)
+
+    @staticmethod
+    def _hash_file(path: str, algos: Iterable[str]) -> dict[str, str]:
+        with open(path, "rb") as f:
+            return hash_stream(f, algos)
+
+    def result(self, planned: dict[str, list]) -> dict[str, list[str]]:
+        """New value of every planned array; raises if a source failed."""
+        return {
+            attr: [
+                val if key is None else self._futures[key].result()[val]
+                for key, val in items
+            ]
+            for attr, items in planned.items()
+        }
+
+
 class VpDev:
-    __slots__ = ("root", "pkg_json", "git", "skip_dirs", "files_cache")
+    __slots__ = (
+        "cache_dir",
+        "eval_results",
+        "files_cache",
+        "git",
+        "index",
+        "parse_cache",
+        "pkg_json",
+        "root",
+        "skip_dirs",
+        "use_eval",
+    )
 
     _COMMENT_RE = re.compile(r"(?m)^\s*#.*$")
     _ASSIGN_RE = re.compile(
@@ -48,6 +2327,12 @@ class VpDev:
         re.MULTILINE,
     )
     _VAR_REF_RE = re.compile(r"\$\{([a-zA-Z0-9_]+)\}|\$([a-zA-Z0-9_]+)")
+    # Shared build inputs: a change to any of these can alter every package.
+    _GLOBAL_INPUTS = (
+        ".github/conf/*/makepkg.conf",
+        ".github/conf/*/makepkg.conf.d/*",
+        "tools/lib/helpers.sh",
+    )
 
     def __init__(self) -> None:
         # This script lives at <repo>/tools/vp-dev.py; the repo root is one level up.
@@ -64,104 +2349,229 @@ def __init__(self) -> None:
             "docs",
         }
         self.files_cache = None
+        self.index: RepoIndex | None = None
+        self.cache_dir = (
+            Path(os.environ.get("CACHE_DIR") or self.root / ".cache") / "vp-dev"
+        )
+        self.parse_cache: dict[str, dict] | None = None
+        # --eval: source PKGBUILDs with bash (PkgbuildEvaluator) instead of regexes.
+        self.use_eval = False
+        self.eval_results: dict[Path, PkgbuildData | None] = {}
 
     def _populate_files_cache(self) -> None:
         if self.files_cache is not None:
             return
         info("Populating file cache...")
-        self.files_cache = {}
         try:
-            r = self._git(["ls-files"], capture_output=True, text=True, check=True)
-            for f in r.stdout.splitlines():
-                parts = f.split("/", 1)
-                if len(parts) == 2:
-                    pkg, rel = parts
-                    d = self.root / pkg
-                    if d not in self.files_cache:
-                        self.files_cache[d] = []
-                    self.files_cache[d].append(rel)
+            self.index = RepoIndex.load(self.root, self.git)
+            self.files_cache = self.index.files_by_dir()
         except Exception as e:
             warn(f"Failed to populate file cache: {e}")
+            self.index = None
             self.files_cache = None
 
-    def _git(
-        self, args: list[str], cwd: Path | None = None, **kw
-    ) -> subprocess.CompletedProcess:
-        return subprocess.run([self.git] + args, cwd=cwd or self.root, **kw)
-
-    def _parse_pkg(self, pb: Path) -> dict[str, str | list[str]] | None:
-        if not pb.exists():
-            return None
+    def _file_key(self, p: Path) -> str | None:
+        """Cache key for one input file: its blob hash, or mtime/size without git."""
+        if self.index is not None:
+            h = self.index.blob(p) or blob_hash(p)
+            return f"git:{h}" if h else None
         try:
-            content = pb.read_text(encoding="utf-8", errors="replace")
-            pkg_vars: dict[str, str] = {}
+            st = p.stat()
+        except OSError:
+            return None
+        return f"stat:{st.st_mtime_ns}:{st.st_size}"
 
-            cleaned_content = self._COMMENT_RE.sub("", content)
+    def _load_parse_cache(self) -> None:
+        self.parse_cache = {}
+        try:
+            data = json.loads((self.cache_dir / "parse-cache.json").read_text())
+        except (OSError, ValueError):
+            return
+        if data.get("schema") == PARSE_CACHE_SCHEMA:
+            self.parse_cache = data.get("entries", {})
 
-            for m in self._ASSIGN_RE.finditer(cleaned_content):
-                var = m.group(1)
-                val = m.group(2).strip()
+    def _save_parse_cache(self, keep: set[str]) -> None:
+        if self.parse_cache is None:
+            return
+        entries = {k: v for k, v in self.parse_cache.items() if k in keep}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            tmp = self.cache_dir / f"parse-cache.json.{os.getpid()}"
+            tmp.write_text(
+                json.dumps({"schema": PARSE_CACHE_SCHEMA, "entries": entries})
+            )
+            tmp.replace(self.cache_dir / "parse-cache.json")
+        except OSError as e:
+            warn(f"Failed to write parse cache: {e}")
 
-                if val.startswith("(") and val.endswith(")"):
-                    inner = val[1:-1].strip()
-                    try:
-                        tokens = shlex.split(inner)
-                    except ValueError:
-                        tokens = inner.split()
-                    val = tokens[0] if tokens else ""
+    def _pkg_files(self, d: Path) -> list[str]:
+        """Tracked files of a package directory, excluding the PKGBUILD itself.
 
-                if val and (val[0] == val[-1]) and val[0] in ("'", '"'):
-                    val = val[1:-1]
+        Without a git index (tarball checkout, git missing) the working tree is
+        walked instead, skipping makepkg's build dirs and artifacts.
+        """
+        if self.files_cache is not None:
+            return sorted(f for f in self.files_cache.get(d, []) if f != "PKGBUILD")
+        fs = []
+        for cur, dirs, names in os.walk(d):
+            if cur == str(d):
+                dirs[:] = [n for n in dirs if n not in ("src", "pkg", ".git")]
+            for n in names:
+                rel = os.path.relpath(os.path.join(cur, n), d)
+                if rel != "PKGBUILD" and ".pkg.tar." not in n:
+                    fs.append(Path(rel).as_posix())
+        return sorted(fs)
 
-                pkg_vars[var] = val
+    def _git(
+        self, args: list[str], cwd: Path | None = None, **kw
+    ) -> subprocess.CompletedProcess:
+        return subprocess.run([self.git] + args, cwd=cwd or self.root, **kw)
 
-            def expand_vars(text: str, depth: int = 0) -> str:
-                if not text or depth > 10:
-                    return text
+    def _evaluate(self, dirs: list[Path]) -> None:
+        """Batch-evaluate ``dirs`` up front so ``_pkgbuild_meta`` can use the results."""
+        if not dirs:
+            return
+        t0 = time.monotonic()
+        with PkgbuildEvaluator() as ev:
+            self.eval_results.update(ev.evaluate_many(dirs))
+        info(f"Evaluated {len(dirs)} PKGBUILDs in {time.monotonic() - t0:.2f}s")
+
+    def _pkg_info(
+        self, meta: Srcinfo | None, d: Path
+    ) -> dict[str, str | list[str]] | None:
+        """The packages.json entry for ``d``, named after its first package."""
+        if meta is None:
+            return None
+        names = meta.pkgnames
+        name = names[0] if names else meta.pkgbase
+        if not name or not meta.value("pkgver") or not meta.value("pkgrel"):
+            return None
+        pi: dict[str, str | list[str]] = {
+            "name": name,
+            "version": meta.version,
+            "description": meta.value("pkgdesc", name),
+            "url": meta.value("url", name),
+        }
+        if len(names) > 1:
+            pi["pkgnames"] = list(names)
+        pi["files"] = self._pkg_files(d)
+        return pi
+
+    def _regex_meta(self, pb: Path) -> Srcinfo | None:
+        """Best-effort metadata from top-level PKGBUILD assignments, without bash."""
+        content = pb.read_text(encoding="utf-8", errors="replace")
+        pkg_vars: dict[str, str] = {}
+        arrays: dict[str, list[str]] = {}
+
+        cleaned_content = self._COMMENT_RE.sub("", content)
+
+        for m in self._ASSIGN_RE.finditer(cleaned_content):
+            var = m.group(1)
+            val = m.group(2).strip()
+
+            arrays.pop(var, None)
+            if val.startswith("(") and val.endswith(")"):
+                inner = val[1:-1].strip()
+                try:
+                    tokens = shlex.split(inner)
+                except ValueError:
+                    tokens = inner.split()
+                arrays[var] = tokens
+                val = tokens[0] if tokens else ""
+
+            if val and (val[0] == val[-1]) and val[0] in ("'", '"'):
+                val = val[1:-1]
+
+            pkg_vars[var] = val
+
+        def expand_vars(text: str, depth: int = 0) -> str:
+            if not text or depth > 10:
+                return text
 
-                def replace(match: re.Match) -> str:
-                    v = match.group(1) or match.group(2)
-                    return expand_vars(pkg_vars.get(v, ""), depth + 1)
+            def replace(match: re.Match) -> str:
+                v = match.group(1) or match.group(2)
+                return expand_vars(pkg_vars.get(v, ""), depth + 1)
 
-                if "$" in text:
-                    return self._VAR_REF_RE.sub(replace, text)
-                return text
+            if "$" in text:
+                return self._VAR_REF_RE.sub(replace, text)
+            return text
 
-            name = expand_vars(pkg_vars.get("pkgname", ""))
-            if not name:
-                name = expand_vars(pkg_vars.get("pkgbase", ""))
+        names = [
+            n
+            for n in map(
+                expand_vars, arrays.get("pkgname", [pkg_vars.get("pkgname", "")])
+            )
+            if n
+        ]
+        base = expand_vars(pkg_vars.get("pkgbase", "")) or (names[0] if names else "")
+        if not base:
+            return None
+        attrs = {}
+        for k in ("pkgdesc", "pkgver", "pkgrel", "epoch", "url"):
+            v = expand_vars(pkg_vars.get(k, ""))
+            if v:
+                attrs[k] = (sys.intern(v),)
+        return Srcinfo(
+            SrcinfoSection("pkgbase", sys.intern(base), attrs),
+            tuple(SrcinfoSection("pkgname", sys.intern(n), {}) for n in names),
+        )
 
-            version = expand_vars(pkg_vars.get("pkgver", ""))
-            rel = expand_vars(pkg_vars.get("pkgrel", ""))
-            desc = expand_vars(pkg_vars.get("pkgdesc", ""))
-            url = expand_vars(pkg_vars.get("url", ""))
+    def _pkgbuild_meta(self, pb: Path) -> Srcinfo | None:
+        data = self.eval_results.get(pb.parent)
+        if data is not None:
+            return Srcinfo.from_data(data)
+        return self._regex_meta(pb)
 
-            if not name or not version or not rel:
+    def _read_srcinfo(self, d: Path) -> Srcinfo | None:
+        """Parse ``d/.SRCINFO`` if it is not older than the PKGBUILD."""
+        si = d / ".SRCINFO"
+        pb = d / "PKGBUILD"
+        try:
+            if si.stat().st_mtime < pb.stat().st_mtime:
                 return None
+            with si.open(encoding="utf-8") as f:
+                return Srcinfo.parse(f)
+        except (OSError, UnicodeDecodeError):
+            return None
 
-            if self.files_cache is not None:
-                fs = [f for f in self.files_cache.get(pb.parent, []) if f != "PKGBUILD"]
-            else:
-                r2 = self._git(
-                    ["ls-files"],
-                    capture_output=True,
-                    text=True,
-                    cwd=pb.parent,
-                    check=True,
-                )
-                fs = [f for f in r2.stdout.strip().split("\n") if f and f != "PKGBUILD"]
-
-            return {
-                "name": name,
-                "version": f"{version}-{rel}",
-                "description": desc,
-                "url": url,
-                "files": sorted(fs),
-            }
+    def _load_meta(self, d: Path) -> Srcinfo | None:
+        """Metadata for ``d``: a fresh .SRCINFO, else the PKGBUILD itself.
+
+        This is the one source ``update``, ``list`` and ``check`` read from.
+        """
+        meta = self._read_srcinfo(d)
+        if meta is not None:
+            return meta
+        pb = d / "PKGBUILD"
+        if not pb.exists():
+            return None
+        try:
+            return self._pkgbuild_meta(pb)
         except Exception as e:
             err(f"Failed to parse {pb}: {e}")
             return None
 
+    def _parse_pkg(self, pb: Path) -> dict[str, str | list[str]] | None:
+        if not pb.exists():
+            return None
+        try:
+            return self._pkg_info(self._pkgbuild_meta(pb), pb.parent)
+        except Exception as e:
+            err(f"Failed to parse {pb}: {e}")
+            return None
+
+    def _resolve_pkg(self, nm: str) -> Path:
+        """Map a package name to its directory, including nested ones like java/*."""
+        d = self.root / nm
+        if d.exists():
+            return d
+        self._populate_files_cache()
+        if self.index is not None:
+            for rel in self.index.package_dirs():
+                if rel.rsplit("/", 1)[-1] == nm:
+                    return self.root / rel
+        return d
+
     def _get_pkg_dirs(self) -> list[Path]:
         """Get all package directories (dirs with PKGBUILD, excluding skip_dirs)"""
         return sorted(
@@ -174,6 +2584,17 @@ def _get_pkg_dirs(self) -> list[Path]:
             ]
         )
 
+    def _all_pkg_dirs(self) -> list[Path]:
+        """Every directory holding a PKGBUILD, nested ones included (as find_pkgbuilds)."""
+        self._populate_files_cache()
+        if self.index is not None:
+            return [self.root / rel for rel in self.index.package_dirs()]
+        return sorted(
+            pb.parent
+            for pb in self.root.glob("**/PKGBUILD")
+            if not self.skip_dirs.intersection(pb.relative_to(self.root).parts)
+        )
+
     def new(self, nm: str) -> int:
         d = self.root / nm
         if d.exists():
@@ -225,7 +2646,7 @@ def new(self, nm: str) -> int:
 
     def test(self, nm: str | None) -> int:
         dirs = (
-            [self.root / nm]
+            [self._resolve_pkg(nm)]
             if nm
             else ([Path.cwd()] if (Path.cwd() / "PKGBUILD").exists() else [])
         )
@@ -247,52 +2668,7 @@ def test(self, nm: str | None) -> int:
         return 0
 
     def _parse_srcinfo(self, d: Path) -> dict[str, str | list[str]] | None:
-        si = d / ".SRCINFO"
-        pb = d / "PKGBUILD"
-        if (
-            not si.exists()
-            or not pb.exists()
-            or si.stat().st_mtime < pb.stat().st_mtime
-        ):
-            return None
-        try:
-            data, files = {}, []
-            with si.open(encoding="utf-8") as f:
-                for line in f:
-                    if "=" not in line:
-                        continue
-                    k, v = line.split("=", 1)
-                    k = k.strip()
-                    v = v.strip()
-                    if k == "pkgname":
-                        if "name" in data:
-                            break  # Stop at first package
-                        data["name"] = v
-                    elif k in ("pkgver", "pkgrel", "pkgdesc", "url"):
-                        data[k] = v
-            if "name" in data and "pkgver" in data and "pkgrel" in data:
-                if self.files_cache is not None:
-                    files = sorted(
-                        (f for f in self.files_cache.get(d, []) if f != "PKGBUILD")
-                    )
-                else:
-                    r = self._git(
-                        ["ls-files"], capture_output=True, text=True, cwd=d, check=False
-                    )
-                    if r.returncode == 0:
-                        files = sorted(
-                            (f for f in r.stdout.splitlines() if f and f != "PKGBUILD")
-                        )
-                return {
-                    "name": data["name"],
-                    "version": f"{data['pkgver']}-{data['pkgrel']}",
-                    "description": data.get("pkgdesc", ""),
-                    "url": data.get("url", ""),
-                    "files": files,
-                }
-        except Exception:
-            pass
-        return None
+        return self._pkg_info(self._read_srcinfo(d), d)
 
     def _process_package(self, d: Path) -> dict[str, str | list[str]] | None:
         """Process a single package directory.
@@ -300,37 +2676,76 @@ def _process_package(self, d: Path) -> dict[str, str | list[str]] | None:
         This method is intended to be called from multiple threads (see ``update``).
         It only performs read-only access to instance attributes such as ``self.root``
         and ``self.git``; callers must not mutate these attributes after initialization
-        to preserve thread safety.
+        to preserve thread safety. New parse-cache entries are stored per directory
+        key, which is safe under the GIL since no two threads share a directory.
         """
         try:
+            key = None
+            if self.parse_cache is not None:
+                key = self._parse_cache_key(d)
+                hit = self.parse_cache.get(d.name)
+                if hit and hit.get("key") == key:
+                    pi = dict(hit["info"], files=self._pkg_files(d))
+                    info(f"Found (cached): {pi['name']} {pi['version']}")
+                    return pi
+
             # Fast path: try to parse .SRCINFO if valid
             pi = self._parse_srcinfo(d)
             if pi:
                 info(f"Found (fast): {pi['name']} {pi['version']}")
-                return pi
-
-            # Slow path: parse PKGBUILD
-            pb = d / "PKGBUILD"
-
-            # Fallback to full parse
-            pi = self._parse_pkg(pb)
-            if pi:
-                info(f"Found: {pi['name']} {pi['version']}")
-                return pi
             else:
-                warn(f"Failed to parse {d.name}/PKGBUILD")
-                return None
+                # Slow path: parse PKGBUILD
+                pi = self._parse_pkg(d / "PKGBUILD")
+                if not pi:
+                    warn(f"Failed to parse {d.name}/PKGBUILD")
+                    return None
+                info(f"Found: {pi['name']} {pi['version']}")
+
+            if key is not None:
+                self.parse_cache[d.name] = {
+                    "key": key,
+                    "info": {k: v for k, v in pi.items() if k != "files"},
+                }
+            return pi
         except Exception as e:
             err(f"Error processing package {d}: {e}")
             return None
 
-    def update(self) -> int:
+    def _parse_cache_key(self, d: Path) -> list:
+        """Inputs that decide what ``_process_package`` parses for ``d``.
+
+        ``_parse_srcinfo`` only trusts a .SRCINFO that is not older than the
+        PKGBUILD, so that verdict is part of the key alongside both file keys;
+        otherwise a cache hit could pick a different source than a full rescan.
+        The PKGBUILD parser in use (regex or --eval) is keyed for the same reason.
+        """
+        si, pb = d / ".SRCINFO", d / "PKGBUILD"
+        try:
+            fresh = si.stat().st_mtime >= pb.stat().st_mtime
+        except OSError:
+            fresh = False
+        return [fresh, self.use_eval, self._file_key(pb), self._file_key(si)]
+
+    def update(self, use_cache: bool = True) -> int:
         self._populate_files_cache()
+        if use_cache:
+            self._load_parse_cache()
         info("Scanning for packages...")
         pkgs = []
+        dirs = self._get_pkg_dirs()
+        if self.use_eval:
+            cache = self.parse_cache or {}
+            self._evaluate(
+                [
+                    d
+                    for d in dirs
+                    if cache.get(d.name, {}).get("key") != self._parse_cache_key(d)
+                ]
+            )
         with concurrent.futures.ThreadPoolExecutor() as executor:
-            results = executor.map(self._process_package, self._get_pkg_dirs())
+            results = executor.map(self._process_package, dirs)
             pkgs = [p for p in results if p]
+        self._save_parse_cache({d.name for d in dirs})
 
         if self.pkg_json.exists():
             shutil.copy(self.pkg_json, self.pkg_json.with_suffix(".json.bak"))
@@ -371,20 +2786,25 @@ def publish(self) -> int:
     def _check_pkg_parallel(self, d: Path) -> tuple[int, list]:
         errs = 0
         msgs = []
-        pb = d / "PKGBUILD"
-        pi = self._parse_pkg(pb)
-        if not pi:
+        data = self.eval_results.get(d)
+        if data is not None and data.status:
+            msgs.append((warn, f"{d.name}: sourcing PKGBUILD exited {data.status}"))
+        meta = self._load_meta(d)
+        if meta is None:
             msgs.append((err, f"{d.name}: Failed to parse PKGBUILD"))
             errs += 1
             return errs, msgs
-        if not pi.get("name"):
+        names = meta.pkgnames
+        if not names:
             msgs.append((err, f"{d.name}: Missing pkgname"))
             errs += 1
-        if not pi.get("version"):
+        if not meta.value("pkgver") or not meta.value("pkgrel"):
             msgs.append((err, f"{d.name}: Missing version"))
             errs += 1
-        if not pi.get("description"):
-            msgs.append((warn, f"{d.name}: Missing description"))
+        for n in names:
+            if not meta.value("pkgdesc", n):
+                where = f"{d.name}/{n}" if len(names) > 1 else d.name
+                msgs.append((warn, f"{where}: Missing description"))
         if errs == 0:
             msgs.append((ok, f"{d.name}: OK"))
         return errs, msgs
@@ -393,6 +2813,8 @@ def check(self) -> int:
         self._populate_files_cache()
         info("Checking all packages...")
         errs = 0
+        if self.use_eval:
+            self._evaluate(self._get_pkg_dirs())
 
         with concurrent.futures.ThreadPoolExecutor() as executor:
             results = list(executor.map(self._check_pkg_parallel, self._get_pkg_dirs()))
@@ -409,74 +2831,993 @@ def check(self) -> int:
         return 0
 
     def clean(self) -> int:
+        self._populate_files_cache()
         info("Cleaning build artifacts...")
         c = 0
         for d in self._get_pkg_dirs():
             for it in d.iterdir():
                 name = it.name
-                if name in ("pkg", "src") or name.endswith(
-                    (".pkg.tar.zst", ".pkg.tar.xz", ".log", ".bak")
-                ):
+                if (
+                    name in ("pkg", "src")
+                    or name.endswith((".pkg.tar.zst", ".pkg.tar.xz", ".log", ".bak"))
+                ) and not (self.index is not None and self.index.is_tracked(it)):
                     (shutil.rmtree if it.is_dir() else it.unlink)(it)
                     info(f"Removed {'directory' if it.is_dir() else 'file'}: {it}")
                     c += 1
         ok(f"Cleaned {c} items")
         return 0
 
-    def _list_worker(self, d: Path) -> tuple[Path, dict[str, str | list[str]] | None]:
-        pi = self._parse_srcinfo(d)
-        if pi:
-            return d, pi
-        return d, self._parse_pkg(d / "PKGBUILD")
+    def _rel(self, d: Path) -> str:
+        return d.relative_to(self.root).as_posix()
 
-    def list(self) -> int:
+    def _build_graph(self) -> BuildGraph:
+        """Dependency graph over every package dir, from the ``_load_meta`` data."""
         self._populate_files_cache()
-        dirs = self._get_pkg_dirs()
-        with concurrent.futures.ThreadPoolExecutor() as executor:
-            for d, pi in executor.map(self._list_worker, dirs):
-                print(
-                    f"{pi['name']:<30} {pi['version']:<20} {pi['description'][:60]}"
-                    if pi
-                    else f"{d.name:<30} {'PARSE ERROR':<20}"
-                )
+        dirs = self._all_pkg_dirs()
+        # The regex fallback knows no depends, so source PKGBUILDs lacking a
+        # current .SRCINFO instead.
+        self._evaluate(
+            [
+                d
+                for d in dirs
+                if d not in self.eval_results and not self._read_srcinfo(d)
+            ]
+        )
+        metas = {}
+        for d in dirs:
+            meta = self._load_meta(d)
+            if meta is None:
+                warn(f"{self._rel(d)}: no metadata, left out of the graph")
+                continue
+            metas[self._rel(d)] = meta
+        return BuildGraph.from_metadata(metas)
+
+    def graph(self, dot: bool = False) -> int:
+        """Print the inter-package dependency graph (``--dot`` for Graphviz)."""
+        with contextlib.redirect_stdout(sys.stderr):
+            g = self._build_graph()
+        if dot:
+            print("digraph packages {")
+            for d in g.dirs:
+                print(f'  "{d}";')
+                for dep, why in sorted(g.deps[d].items()):
+                    print(f'  "{d}" -> "{dep}" [label="{why}"];')
+            print("}")
+        else:
+            for d in g.dirs:
+                if g.deps[d]:
+                    print(f"{d}: {' '.join(sorted(g.deps[d]))}")
+        cycle = g.find_cycle()
+        if cycle:
+            err(f"Dependency cycle: {g.describe_cycle(cycle)}")
+            return 1
         return 0
 
-    def updpkgsums(self, nm: str) -> int:
-        d = self.root / nm
-        if not d.exists():
-            err(f"Package '{nm}' not found!")
+    def affected(self, rev_range: str) -> int:
+        """Print the package dirs a ``git diff rev_range`` requires rebuilding.
+
+        Changed paths map to the innermost package dir containing them; a
+        change to a global input selects every package. The set is then
+        closed over in-repo reverse dependencies. The graph is read from the
+        working tree, so check out the head of the range first.
+        """
+        r = self._git(
+            ["diff", "--name-only", "--no-renames", "-z", rev_range, "--"],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if r.returncode:
+            err(f"git diff {rev_range} failed: {r.stderr.strip()}")
             return 1
+        paths = [p for p in r.stdout.split("\0") if p]
+        with contextlib.redirect_stdout(sys.stderr):
+            g = self._build_graph()
+            glob_hit = next(
+                (
+                    p
+                    for p in paths
+                    for pat in self._GLOBAL_INPUTS
+                    if fnmatch.fnmatch(p, pat)
+                ),
+                None,
+            )
+            if glob_hit:
+                info(
+                    f"Global build input changed ({glob_hit}): every package is affected"
+                )
+                changed = set(g.dirs)
+            else:
+                # Innermost first, so java/java-openjdk/x is not claimed by java.
+                dirs = sorted(g.dirs, key=len, reverse=True)
+                changed = set()
+                for p in paths:
+                    for d in dirs:
+                        if d == "." or p.startswith(f"{d}/"):
+                            changed.add(d)
+                            break
+            result = g.dependents(changed)
+            info(
+                f"{len(result)} of {len(g.dirs)} package(s) affected "
+                f"({len(changed)} changed, {len(result) - len(changed)} dependent)"
+            )
+        for d in sorted(result):
+            print(d)
+        return 0
+
+    def _artifact_cache(self) -> ArtifactCache:
+        return ArtifactCache(
+            Path(os.environ.get("ARTIFACT_CACHE_DIR") or self.cache_dir / "artifacts")
+        )
+
+    def _source_store(self) -> SourceStore:
+        return SourceStore(
+            Path(os.environ.get("SOURCE_CACHE_DIR") or self.cache_dir / "sources"),
+            self.git,
+        )
+
+    def _artifact_key(self, d: Path) -> tuple[str | None, str]:
+        """Hash of every input that decides what building ``d`` produces.
+
+        Covers the PKGBUILD, local sources and install/changelog files by
+        content, remote sources by URL plus checksum, VCS sources by their
+        pinned commit/tag, the makepkg.conf files makepkg would read, the
+        compiler toolchain and the flag variables pkg.sh exports. Returns
+        ``(None, reason)`` when some input is not pinned (a VCS branch, or a
+        download with SKIP checksums), since its key would not identify the
+        output.
+        """
+        # The regex fallback knows no sources, so never key off it.
+        if d not in self.eval_results and not self._read_srcinfo(d):
+            self._evaluate([d])
+        meta = self._load_meta(d)
+        if meta is None:
+            return None, "no package metadata"
+        h = hashlib.sha256()
+
+        def feed(label: str, data: bytes) -> None:
+            h.update(f"{label}\0{len(data)}\0".encode())
+            h.update(data)
+
+        def local(name: str) -> bytes | None:
+            for cand in (d / name, d / Path(name).name):
+                if cand.is_file():
+                    return cand.read_bytes()
+            return None
+
+        feed("key", str(ARTIFACT_KEY_VERSION).encode())
+        feed("PKGBUILD", (d / "PKGBUILD").read_bytes())
+        attrs = meta.base.attrs
+        for attr in sorted(
+            k for k in attrs if k == "source" or k.startswith("source_")
+        ):
+            suffix = attr[len("source") :]
+            sums = [attrs.get(f"{alg}{suffix}", ()) for alg in _SUMS]
+            for i, entry in enumerate(attrs[attr]):
+                url = _source_url(entry)
+                pins = [s[i] for s in sums if i < len(s) and s[i] != "SKIP"]
+                if "://" not in url:
+                    data = local(url)
+                    if data is None:
+                        return None, f"local source {url} is missing"
+                    feed(f"local:{url}", data)
+                elif _is_vcs(url):
+                    if not url.partition("#")[2].startswith(("commit=", "tag=")):
+                        return (
+                            None,
+                            f"VCS source {entry} is not pinned to a commit or tag",
+                        )
+                    feed("vcs", entry.encode())
+                elif not pins:
+                    return None, f"source {entry} has no checksum"
+                else:
+                    feed("remote", "\0".join([entry, *pins]).encode())
+        for sec in (meta.base, *meta.packages):
+            for attr in ("install", "changelog"):
+                for name in sec.attrs.get(attr, ()):
+                    feed(f"{attr}:{name}", local(name) or b"")
+        for conf in makepkg_conf_files():
+            feed(f"conf:{conf}", conf.read_bytes())
+        feed("toolchain", toolchain_fingerprint().encode())
+        feed("machine", os.uname().machine.encode())
+        for var in ("CARCH", "CFLAGS", "CXXFLAGS", "LDFLAGS", "LTOFLAGS", "RUSTFLAGS"):
+            feed(f"env:{var}", os.environ.get(var, "").encode())
+        return h.hexdigest(), ""
+
+    def _built_files(self, d: Path, dest: Path) -> list[Path]:
+        """Package files in ``dest`` for the current pkgnames/version of ``d``.
+
+        Names and version come from evaluating the PKGBUILD as it is now,
+        which is what makepkg built (and possibly rewrote, for ``pkgver()``),
+        never from a .SRCINFO that may be out of date.
+        """
         pb = d / "PKGBUILD"
         if not pb.exists():
-            err(f"No PKGBUILD found in {nm}")
+            return []
+        with PkgbuildEvaluator(jobs=1) as ev:
+            data = ev.evaluate_many([d]).get(d)
+        if data:
+            self.eval_results[d] = data
+        else:
+            self.eval_results.pop(d, None)
+        meta = self._pkgbuild_meta(pb)
+        if meta is None:
+            return []
+        files: set[Path] = set()
+        for name in meta.pkgnames:
+            for n in (name, f"{name}-debug"):
+                files.update(dest.glob(f"{n}-{meta.version}-*.pkg.tar.*"))
+        return sorted(files)
+
+    def artifact(
+        self,
+        action: str,
+        pkg: str | None = None,
+        key: str | None = None,
+        max_size: str = "",
+    ) -> int:
+        """``key``/``restore``/``store`` for one package dir, or ``prune`` the cache.
+
+        ``restore`` exits 1 on a miss (or an uncacheable package) so pkg.sh
+        can fall back to building; ``store`` takes the key computed before
+        the build, because makepkg may rewrite the PKGBUILD while building.
+        """
+        cache = self._artifact_cache()
+        if action == "prune":
+            limit = parse_size(
+                max_size or os.environ.get("ARTIFACT_CACHE_MAX") or "20G"
+            )
+            removed, freed = cache.prune(limit)
+            ok(f"Evicted {removed} artifact(s), freed {freed / 1024**2:.1f} MiB")
+            return 0
+        d = self._resolve_pkg(pkg or "")
+        if not (d / "PKGBUILD").exists():
+            err(f"No PKGBUILD found in {pkg}")
             return 1
-        info(f"Updating checksums for {nm}...")
-        r = subprocess.run(
-            ["updpkgsums"], cwd=d, capture_output=True, text=True, check=False
+        if key is None:
+            with contextlib.redirect_stdout(sys.stderr):
+                key, why = self._artifact_key(d)
+            if key is None:
+                # stderr: pkg.sh captures stdout as the key.
+                with contextlib.redirect_stdout(sys.stderr):
+                    warn(f"{pkg}: not cacheable: {why}")
+                return 1
+        if action == "key":
+            print(key)
+            return 0
+        # makepkg writes packages to $PKGDEST when set, else next to the PKGBUILD.
+        dest = Path(os.environ.get("PKGDEST") or d)
+        if action == "restore":
+            files = cache.restore(key, dest)
+            if files is None:
+                info(f"{pkg}: artifact cache miss ({key[:12]})")
+                return 1
+            ok(f"{pkg}: restored {len(files)} file(s) from artifact cache ({key[:12]})")
+            return 0
+        files = self._built_files(d, dest)
+        if not files:
+            err(f"{pkg}: no built packages to store")
+            return 1
+        meta = {
+            "pkg": pkg,
+            "created": int(time.time()),
+            "files": [f.name for f in files],
+        }
+        if cache.store(key, files, meta):
+            ok(f"{pkg}: stored {len(files)} file(s) in artifact cache ({key[:12]})")
+        return 0
+
+    def _history(self) -> BuildHistory:
+        return BuildHistory(self.cache_dir / "build-history.jsonl")
+
+    def record(self, pkg: str, cmd: list[str], wall_only: bool = False) -> int:
+        """Run ``cmd`` and log what building ``pkg`` cost to the build history.
+
+        Logs wall time, CPU seconds, peak RSS and disk I/O of the whole
+        command, wall and CPU time of each makepkg phase, and the compiler
+        cache hits and misses of the build (see ``BuildHistory``). Output
+        passes through as it arrives. Returns the command's exit status
+        (128+N if killed by signal N), so it can wrap a build transparently.
+        """
+        if not cmd:
+            err("record: no command given")
+            return 2
+        env = os.environ.copy()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        statslog = self.cache_dir / f"ccache-stats.{os.getpid()}.log"
+        cache = None if wall_only else CompilerCacheStats(env, statslog)
+        t0 = time.monotonic()
+        try:
+            proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, env=env)
+        except OSError as e:
+            err(f"record: {e}")
+            return 127
+
+        def cpu() -> float | None:
+            if wall_only:
+                return None
+            usage = _proc_usage(proc.pid)
+            return usage[0] if usage else None
+
+        clock = PhaseClock(cpu)
+        reader = threading.Thread(
+            target=self._tee_phases, args=(proc.stdout, clock), daemon=True
         )
-        if r.returncode == 0:
-            ok(f"Updated checksums for {nm}")
-            info("Generating .SRCINFO...")
-            r2 = subprocess.run(
-                ["makepkg", "--printsrcinfo"],
-                cwd=d,
-                capture_output=True,
-                text=True,
-                check=False,
+        reader.start()
+        # Sample the build's own totals while it is a zombie, then reap it.
+        # wait4 rather than Popen.wait: its rusage covers the whole build tree
+        # (every waited-for descendant), which is what we want to predict.
+        while True:
+            try:
+                os.waitid(os.P_PID, proc.pid, os.WEXITED | os.WNOWAIT)
+                break
+            except InterruptedError:
+                continue
+        # A daemon the build left behind may hold the pipe open; don't wait
+        # for it beyond a moment.
+        reader.join(timeout=1)
+        usage = None if wall_only else _proc_usage(proc.pid)
+        while True:
+            try:
+                _, status, ru = os.wait4(proc.pid, 0)
+                break
+            except InterruptedError:
+                continue
+        rc = os.waitstatus_to_exitcode(status)
+        proc.returncode = rc
+        if rc < 0:
+            rc = 128 - rc
+        rec: dict[str, Any] = {
+            "pkg": pkg,
+            "ts": int(time.time()),
+            "rc": rc,
+            "wall": round(time.monotonic() - t0, 1),
+        }
+        if not wall_only:
+            rec["cpu"] = round(ru.ru_utime + ru.ru_stime, 1)
+            rec["rss_mb"] = ru.ru_maxrss // 1024
+            if usage:
+                rec["read_mb"] = round(usage[1] / (1 << 20), 1)
+                rec["write_mb"] = round(usage[2] / (1 << 20), 1)
+        if clock.seen:
+            clock.close(usage[0] if usage else None)
+            rec["phases"] = clock.phases
+        if cache and (stats := cache.result()):
+            rec["cache"] = stats
+        try:
+            self._history().append(rec)
+        except OSError as e:
+            warn(f"record: cannot write build history: {e}")
+        return rc
+
+    def stats(
+        self, names: list[str] | None = None, last: bool = False, threshold: float = 20
+    ) -> int:
+        """Show build cost trends from the build history.
+
+        Without ``names``, one row per package compares its latest successful
+        build with the median of the ``BuildHistory.RECENT`` before it, most
+        expensive first, and packages that got more than ``threshold`` percent
+        slower (wall or CPU time) or hungrier (peak RSS) are listed as
+        regressions. With ``names``, lists those packages' recent builds
+        phase by phase, or with ``last`` one line on each one's latest build.
+        """
+        h = self._history()
+        if names:
+            wanted = {n.rstrip("/") for n in names}
+            recs: dict[str, list[dict]] = {}
+            for rec in h.records():
+                pkg = rec["pkg"]
+                if pkg in wanted or pkg.rsplit("/", 1)[-1] in wanted:
+                    recs.setdefault(pkg, []).append(rec)
+            if not recs:
+                warn("No recorded builds of " + ", ".join(sorted(wanted)))
+                return 1
+            for pkg, runs in sorted(recs.items()):
+                if last:
+                    r = runs[-1]
+                    cache = r.get("cache")
+                    line = f"{pkg}: {_fmt_duration(r['wall'])} wall"
+                    if "cpu" in r:
+                        line += (
+                            f", {_fmt_duration(r['cpu'])} CPU, {r['rss_mb']} MB peak"
+                        )
+                    if r.get("phases"):
+                        line += f"; {_fmt_phases(r['phases'])}"
+                    if cache:
+                        line += f"; {cache['tool']} {_fmt_cache(cache)} hits"
+                    info(line)
+                    continue
+                print(f"{pkg}:")
+                for r in runs[-BuildHistory.RECENT * 2 :]:
+                    when = time.strftime(
+                        "%Y-%m-%d %H:%M", time.localtime(r.get("ts", 0))
+                    )
+                    cpu = _fmt_duration(r["cpu"]) if "cpu" in r else "-"
+                    io = (
+                        f"{r['read_mb']:.0f}/{r['write_mb']:.0f} MB"
+                        if "read_mb" in r
+                        else "-"
+                    )
+                    print(
+                        f"  {when}  rc={r['rc']:<3} {_fmt_duration(r['wall']):>7} "
+                        f"{cpu:>7} {r.get('rss_mb', '-'):>6} MB  io {io:<13} "
+                        f"cache {_fmt_cache(r.get('cache')):>4}  "
+                        f"{_fmt_phases(r.get('phases', {}))}"
+                    )
+            return 0
+
+        runs_by_pkg = h.successful()
+        if not runs_by_pkg:
+            warn("No successful builds recorded yet")
+            return 0
+        print(
+            f"{'PACKAGE':<30} {'RUNS':>4} {'WALL':>7} {'Δ':>5} {'CPU':>7} {'Δ':>5} "
+            f"{'RSS MB':>6} {'Δ':>5} {'CACHE':>5}  SLOWEST PHASE"
+        )
+        regressed = []
+        for pkg, runs in sorted(runs_by_pkg.items(), key=lambda kv: -kv[1][-1]["wall"]):
+            r, prev = runs[-1], runs[-BuildHistory.RECENT - 1 : -1]
+            cells = []
+            worse = []
+            for k, fmt in (
+                ("wall", _fmt_duration),
+                ("cpu", _fmt_duration),
+                ("rss_mb", str),
+            ):
+                vals = [p[k] for p in prev if k in p]
+                base = statistics.median(vals) if vals else None
+                if k not in r:
+                    cells += ["-", "-"]
+                    continue
+                cells += [fmt(r[k]), _fmt_change(r[k], base)]
+                if base and r[k] > base * (1 + threshold / 100):
+                    worse.append(f"{cells[-1]} {k.removesuffix('_mb')}")
+            if worse:
+                regressed.append(f"{pkg} ({', '.join(worse)})")
+            phases = r.get("phases", {})
+            slowest = max(phases, key=lambda k: phases[k]["wall"], default="")
+            if slowest:
+                slowest = f"{slowest} {_fmt_duration(phases[slowest]['wall'])}"
+            wall, dwall, cpu, dcpu, rss, drss = cells
+            print(
+                f"{pkg:<30} {len(runs):>4} {wall:>7} {dwall:>5} {cpu:>7} {dcpu:>5} "
+                f"{rss:>6} {drss:>5} {_fmt_cache(r.get('cache')):>5}  {slowest}"
             )
-            if r2.returncode == 0:
-                (d / ".SRCINFO").write_text(r2.stdout)
-                ok("Generated .SRCINFO")
-            else:
-                warn("Failed to generate .SRCINFO")
+        if regressed:
+            warn(
+                f"{len(regressed)} package(s) regressed more than {threshold:g}% "
+                "against their recent median:"
+            )
+            for line in regressed:
+                warn(f"  {line}")
+        return 0
+
+    @staticmethod
+    def _tee_phases(pipe: IO[bytes], clock: PhaseClock) -> None:
+        """Copy ``pipe`` to stdout as it arrives, feeding whole lines to
+        ``clock``."""
+        out = sys.stdout.buffer
+        pending = b""
+        with pipe:
+            while chunk := pipe.read1(1 << 16):
+                out.write(chunk)
+                out.flush()
+                *lines, pending = (pending + chunk).split(b"\n")
+                pending = pending[-4096:]
+                for line in lines:
+                    if line.startswith((b"==>", b"\x1b")):
+                        clock.feed(line.decode(errors="replace"))
+
+    def classify(self, log: str) -> int:
+        """Print why the build that wrote ``log`` failed, as TSV for pkg.sh.
+
+        One line: ``kind<TAB>stage<TAB>retry<TAB>resume<TAB>evidence``, with
+        ``retry`` 1 or 0 and ``resume`` the makepkg flags for the next attempt
+        (see ``classify_build_log``).
+        """
+        try:
+            text = Path(log).read_text(encoding="utf-8", errors="replace")
+        except OSError as e:
+            err(f"classify: {e}")
+            return 1
+        f = classify_build_log(text)
+        print(f"{f.kind}\t{f.stage}\t{int(f.retry)}\t{' '.join(f.resume)}\t{f.line}")
+        return 0
+
+    def plan(
+        self,
+        names: list[str] | None = None,
+        jobs: int | None = None,
+        heavy_jobs: int = 1,
+        heavy_rss_mb: int = 4096,
+    ) -> int:
+        """Print a critical-path-first build schedule as TSV for pkg.sh.
+
+        One line per package in start order: ``dir<TAB>priority<TAB>seconds
+        <TAB>heavy<TAB>deps``. Priority and seconds come from the build history
+        (packages never built get the median of those that were); ``heavy``
+        is 1 when the package peaked above ``heavy_rss_mb``, and ``deps`` is
+        a comma-separated list of dirs in this plan that must finish first.
+        Only ``names`` (default: every package) are planned. The predicted
+        makespan on ``jobs`` slots goes to stderr.
+        """
+        with contextlib.redirect_stdout(sys.stderr):
+            g = self._build_graph()
+            if names:
+                targets = [self._rel(self._resolve_pkg(n).resolve()) for n in names]
+                unknown = [t for t in targets if t not in g.deps]
+                if unknown:
+                    err(f"Not a package: {', '.join(unknown)}")
+                    return 1
+                g = g.subgraph(targets)
+        cycle = g.find_cycle()
+        if cycle:
+            err(f"Dependency cycle: {g.describe_cycle(cycle)}")
+            return 1
+        est = self._history().estimates()
+        default = statistics.median(e.wall for e in est.values()) if est else 600.0
+        cost = {d: est[d].wall if d in est else default for d in g.dirs}
+        heavy = frozenset(
+            d for d in g.dirs if d in est and est[d].rss_mb >= heavy_rss_mb
+        )
+        order = g.schedule(cost)
+        for d, prio in order:
+            deps = ",".join(sorted(g.deps[d]))
+            print(f"{d}\t{prio:.0f}\t{cost[d]:.0f}\t{int(d in heavy)}\t{deps}")
+        jobs = jobs or os.cpu_count() or 1
+        with contextlib.redirect_stdout(sys.stderr):
+            unknown = sum(1 for d in g.dirs if d not in est)
+            info(
+                f"Predicted makespan {_fmt_duration(g.makespan(cost, jobs, heavy, heavy_jobs))}"
+                f" on {jobs} job(s); critical path "
+                f"{_fmt_duration(order[0][1] if order else 0)}"
+                + (f"; {unknown} package(s) without history" if unknown else "")
+            )
+        return 0
+
+    def _srcinfo_worker(self, d: Path) -> tuple[Path, str | None, str | None]:
+        data = self.eval_results.get(d)
+        if data is None:
+            return d, None, None
+        try:
+            cur = (d / ".SRCINFO").read_text()
+        except OSError:
+            cur = None
+        return d, cur, render_srcinfo(data)
+
+    def srcinfo(self, names: list[str] | None = None, check: bool = False) -> int:
+        """Generate .SRCINFO for ``names`` (default: every package) without makepkg.
+
+        With ``check``, nothing is written; stale or missing files are reported
+        as a diff and the exit status is 1.
+        """
+        dirs = [self._resolve_pkg(n) for n in names] if names else self._all_pkg_dirs()
+        for d in dirs:
+            if not (d / "PKGBUILD").exists():
+                err(f"No PKGBUILD found in {d.relative_to(self.root)}")
+                return 1
+        self._evaluate(dirs)
+        errs = dirty = 0
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            for d, cur, new in executor.map(self._srcinfo_worker, dirs):
+                rel = d.relative_to(self.root).as_posix()
+                if new is None:
+                    err(f"{rel}: failed to evaluate PKGBUILD")
+                    errs += 1
+                    continue
+                if cur == new:
+                    continue
+                dirty += 1
+                if not check:
+                    (d / ".SRCINFO").write_text(new)
+                    ok(f"{rel}: wrote .SRCINFO")
+                elif cur is None:
+                    err(f"{rel}: missing .SRCINFO")
+                else:
+                    err(f"{rel}: .SRCINFO dirty")
+                    sys.stdout.writelines(
+                        difflib.unified_diff(
+                            cur.splitlines(keepends=True),
+                            new.splitlines(keepends=True),
+                            f"{rel}/.SRCINFO",
+                            "generated",
+                        )
+                    )
+        if check and dirty:
+            info("Run: tools/vp-dev.py srcinfo")
+        if errs or (check and dirty):
+            return 1
+        ok(f"{len(dirs) - dirty} .SRCINFO file(s) up to date")
+        return 0
+
+    def _http(self, inner: HttpTransport, use_cache: bool = True) -> CachingTransport:
+        path = self.cache_dir / "http-cache.json" if use_cache else None
+        return CachingTransport(inner, path)
+
+    def api(self, path: str, use_cache: bool = True) -> int:
+        """Print a GitHub API response body, through the shared HTTP cache.
+
+        ``path`` is relative to the API root, as for ``gh api``. Anything but
+        a 200 exits 1, so shell callers can fall through to alternatives.
+        """
+        base = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+        url = path if "://" in path else f"{base}/{path.lstrip('/')}"
+        headers = {"Accept": "application/vnd.github+json"}
+        if token := _github_token():
+            headers["Authorization"] = f"Bearer {token}"
+        client = self._http(HttpTransport(), use_cache)
+        try:
+            status, _, body = client.get(url, headers)
+        except (OSError, http.client.HTTPException) as e:
+            err(f"{url}: {e}")
+            return 1
+        finally:
+            client.close()
+        if status != 200:
+            err(f"{url}: HTTP {status}")
+            return 1
+        sys.stdout.buffer.write(body)
+        sys.stdout.flush()
+        return 0
+
+    def _nvchecker(self, config: str | None) -> tuple[Path, dict, Path, Path]:
+        """nvchecker config path, entries, and its oldver/newver file paths."""
+        path = Path(config) if config else self.root / "nvchecker.toml"
+        cfg = tomllib.loads(path.read_text())
+        opts = cfg.pop("__config__", {})
+        oldver = path.parent / opts.get("oldver", "old_ver.json")
+        newver = path.parent / opts.get("newver", "new_ver.json")
+        return path, cfg, oldver, newver
+
+    def bump(
+        self,
+        names: list[str] | None = None,
+        config: str | None = None,
+        to: str | None = None,
+        jobs: int | None = None,
+        dry_run: bool = False,
+    ) -> int:
+        """Apply new upstream versions to PKGBUILDs, checksums and .SRCINFO.
+
+        Targets are the newver entries that differ from oldver (optionally
+        only ``names``), or with ``to`` the one package named. ``pkgver`` and
+        ``pkgrel`` are edited in place, then every bumped package is evaluated
+        in one batch and all their sources are hashed on one download pool.
+        A package whose sources cannot be hashed gets its PKGBUILD back.
+        With ``to``, a package that cannot be bumped at all (no PKGBUILD, or
+        a version computed by ``pkgver()``) is an error rather than a skip.
+        """
+        if to is not None:
+            if len(names or ()) != 1:
+                err("--to needs exactly one package")
+                return 1
+            targets = {names[0]: to}
         else:
-            err(f"Failed to update checksums: {r.stderr}")
+            try:
+                _, _, oldver, newver = self._nvchecker(config)
+            except (OSError, tomllib.TOMLDecodeError) as e:
+                err(f"Cannot read nvchecker config: {e}")
+                return 1
+            old, new = read_versions(oldver), read_versions(newver)
+            targets = {
+                n: v
+                for n, v in new.items()
+                if old.get(n) != v and (not names or n in names)
+            }
+        bumped: dict[Path, tuple[str, str, str]] = {}
+        for n, v in targets.items():
+            d = self._resolve_pkg(n)
+            try:
+                orig = (d / "PKGBUILD").read_text()
+            except OSError:
+                if to is not None:
+                    err(f"{n}: no PKGBUILD")
+                    return 1
+                warn(f"{n}: no PKGBUILD, skipped")
+                continue
+            try:
+                text, cur, ver = bump_pkgbuild(orig, v)
+            except ValueError as e:
+                if to is not None:
+                    err(f"{n}: cannot bump to {v}: {e}")
+                    return 1
+                info(f"{n}: {e}, skipped")
+                continue
+            if cur != ver:
+                print(f"{n}: {cur} -> {ver}")
+                bumped[d] = (n, orig, text)
+        if dry_run or not bumped:
+            if not bumped:
+                ok("Nothing to bump")
+            return 0
+        for d, (_, _, text) in bumped.items():
+            (d / "PKGBUILD").write_text(text)
+        with PkgbuildEvaluator(jobs=jobs) as ev:
+            evaluated = ev.evaluate_many(list(bumped))
+        rc = 0
+        with SourceHasher(jobs or 8, self._source_store()) as hasher:
+            plans = {d: hasher.plan(d, data) for d, data in evaluated.items() if data}
+            hasher.start()
+            for d, (n, orig, text) in bumped.items():
+                data = evaluated.get(d)
+                try:
+                    if not data:
+                        raise ValueError("failed to evaluate PKGBUILD")
+                    text, _ = apply_sums(text, data, hasher.result(plans[d]))
+                except (OSError, ValueError, http.client.HTTPException) as e:
+                    err(f"{n}: {e}; PKGBUILD restored")
+                    (d / "PKGBUILD").write_text(orig)
+                    rc = 1
+                    continue
+                (d / "PKGBUILD").write_text(text)
+                (d / ".SRCINFO").write_text(render_srcinfo(data))
+                ok(f"{n}: updated PKGBUILD checksums and .SRCINFO")
+        return rc
+
+    def check_upstream(
+        self,
+        names: list[str] | None = None,
+        config: str | None = None,
+        per_host: int = UPSTREAM_PER_HOST,
+        dry_run: bool = False,
+        use_cache: bool = True,
+        transport: HttpTransport | None = None,
+    ) -> int:
+        """Check ``nvchecker.toml`` entries upstream and update its newver file.
+
+        Every entry is fetched at once, bounded only by ``per_host``
+        connections per host, so a full run takes about as long as its
+        slowest request. Entries that fail keep their old version in the
+        newver file and make the exit status 1. Responses go through the
+        shared HTTP cache unless ``use_cache`` is off.
+        """
+        try:
+            cfg_path, cfg, oldver, newver = self._nvchecker(config)
+        except (OSError, tomllib.TOMLDecodeError) as e:
+            err(f"Cannot read nvchecker config: {e}")
             return 1
+        if names:
+            missing = [n for n in names if n not in cfg]
+            if missing:
+                err(f"Not in {cfg_path.name}: {', '.join(missing)}")
+                return 1
+        entries = {
+            n: e
+            for n, e in cfg.items()
+            if (not names or n in names) and e.get("source")
+        }
+        old = read_versions(oldver)
+        prev = read_versions(newver) or dict(old)
+        client = self._http(transport or HttpTransport(per_host), use_cache)
+        checker = UpstreamChecker(client, _github_token(), self.git, per_host)
+        t0 = time.monotonic()
+        try:
+            results = checker.check_all(entries)
+        finally:
+            client.close()
+        failed = updated = 0
+        new: dict[str, str] = {}
+        for n in cfg:
+            res = results.get(n)
+            if isinstance(res, Exception):
+                err(f"{n}: {res}")
+                failed += 1
+                res = None
+            if res is None:
+                if n in prev:
+                    new[n] = prev[n]
+                continue
+            new[n] = res
+            if old.get(n) != res:
+                updated += 1
+                print(f"{n}: {old.get(n, '(none)')} -> {res}")
+        if not dry_run:
+            newver.parent.mkdir(parents=True, exist_ok=True)
+            tmp = newver.with_name(newver.name + ".tmp")
+            tmp.write_text(json.dumps(new, indent=2) + "\n")
+            tmp.replace(newver)
+        info(
+            f"{len(entries)} checked in {time.monotonic() - t0:.1f}s: "
+            f"{updated} updated, {failed} failed"
+        )
+        info(client.summary())
+        return 1 if failed else 0
+
+    def _fetch_tasks(
+        self, d: Path, data: PkgbuildData, carch: str = "x86_64"
+    ) -> Iterator[tuple[str, str, Path, dict[str, str]]]:
+        """``(kind, url, dest, expected digests)`` for each remote source of ``d``."""
+        for src_attr in ("source", f"source_{carch}"):
+            sums = [
+                (algo, data.base[attr])
+                for attr, algo, s in sum_arrays(data)
+                if s == src_attr and algo in _HASHES
+            ]
+            for i, entry in enumerate(data.base.get(src_attr, [])):
+                name, loc = split_source(entry)
+                kind = source_kind(loc)
+                if kind == "local":
+                    continue
+                if kind == "vcs":
+                    scheme, _, rest = loc.partition("://")
+                    if scheme.split("+", 1)[0] == "git":
+                        url = scheme.removeprefix("git+") + "://" + rest
+                        yield "git", url.split("#", 1)[0], d / name, {}
+                    continue
+                expected = {a: v[i] for a, v in sums if i < len(v) and v[i] != "SKIP"}
+                yield "file", loc.split("#", 1)[0], d / name, expected
+
+    def fetch(
+        self,
+        names: list[str] | None = None,
+        jobs: int | None = None,
+        prune: bool = False,
+        max_size: str = "",
+    ) -> int:
+        """Fill package dirs with their sources from the shared source store.
+
+        Files are fetched into the store once, verified against the
+        PKGBUILD's sums and hard-linked (or reflinked) next to the PKGBUILD,
+        where makepkg finds them instead of downloading. ``git+`` sources
+        become local clones of a bare mirror kept up to date in the store.
+        Files with ``SKIP`` sums are left to makepkg, since nothing would
+        tell a stale stored copy from the current one. Each distinct URL is
+        fetched once, on a pool of ``jobs``. With ``prune``, only evicts least
+        recently used entries above the size cap.
+        """
+        store = self._source_store()
+        if prune:
+            limit = parse_size(max_size or os.environ.get("SOURCE_CACHE_MAX") or "50G")
+            removed, freed = store.prune(limit)
+            ok(f"Evicted {removed} source(s), freed {freed / 1024**2:.1f} MiB")
+            return 0
+        dirs = [self._resolve_pkg(n) for n in names] if names else self._all_pkg_dirs()
+        for d in dirs:
+            if not (d / "PKGBUILD").exists():
+                err(f"No PKGBUILD found in {d}")
+                return 1
+        with PkgbuildEvaluator(jobs=jobs) as ev:
+            evaluated = ev.evaluate_many(dirs)
+        rc = hits = misses = skipped = 0
+        futs: dict[tuple[str, str], concurrent.futures.Future] = {}
+        per_pkg: dict[Path, list] = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs or 8) as pool:
+            for d in dirs:
+                data = evaluated.get(d)
+                if data is None:
+                    err(f"{d.name}: failed to evaluate PKGBUILD")
+                    rc = 1
+                    continue
+                per_pkg[d] = []
+                for kind, url, dest, expected in self._fetch_tasks(d, data):
+                    if kind == "file" and not expected:
+                        # Drop a copy linked from the store by an older run,
+                        # or makepkg would keep using it.
+                        meta = store.lookup(url)
+                        obj = meta and store.object(meta["digests"]["sha256"])
+                        with contextlib.suppress(OSError):
+                            if obj and dest.samefile(obj):
+                                dest.unlink()
+                        skipped += 1
+                        continue
+                    key = (url, expected.get("sha256", ""))
+                    if key not in futs:
+                        fn = store.mirror if kind == "git" else store.fetch
+                        args = (url,) if kind == "git" else (url, expected)
+                        futs[key] = pool.submit(fn, *args)
+                    per_pkg[d].append((kind, url, dest, futs[key]))
+            for d, tasks in per_pkg.items():
+                rel = d.relative_to(self.root) if d.is_relative_to(self.root) else d
+                failed = 0
+                for kind, url, dest, fut in tasks:
+                    try:
+                        path, hit = fut.result()
+                        if kind == "git":
+                            store.link_mirror(path, dest, url)
+                        else:
+                            link_file(path, dest)
+                    except (
+                        OSError,
+                        ValueError,
+                        RuntimeError,
+                        http.client.HTTPException,
+                    ) as e:
+                        err(f"{rel}: {e}")
+                        failed += 1
+                        continue
+                    hits += hit
+                    misses += not hit
+                if failed:
+                    rc = 1
+                elif tasks:
+                    ok(f"{rel}: {len(tasks)} source(s) ready")
+        info(
+            f"Sources: {hits} from the store, {misses} fetched, "
+            f"{skipped} unverifiable left to makepkg"
+        )
+        return rc
+
+    def updpkgsums(
+        self,
+        names: list[str] | None = None,
+        jobs: int | None = None,
+        use_cache: bool = True,
+    ) -> int:
+        """Recompute ``*sums`` arrays for ``names`` (default: every package).
+
+        A native replacement for pacman-contrib's ``updpkgsums``: sources of
+        all packages download concurrently on one pool of ``jobs``, hashed
+        while they stream into the source store (unless ``use_cache`` is
+        off), so nothing is read back from disk. Only PKGBUILDs whose sums
+        change are rewritten, together with their .SRCINFO.
+        """
+        dirs = []
+        for nm in names or ():
+            d = self._resolve_pkg(nm)
+            if not d.exists():
+                err(f"Package '{nm}' not found!")
+                return 1
+            if not (d / "PKGBUILD").exists():
+                err(f"No PKGBUILD found in {nm}")
+                return 1
+            dirs.append(d)
+        dirs = dirs or self._all_pkg_dirs()
+        info(f"Updating checksums for {len(dirs)} package(s)...")
+        with PkgbuildEvaluator(jobs=jobs) as ev:
+            evaluated = ev.evaluate_many(dirs)
+        rc = updated = 0
+        store = self._source_store() if use_cache else None
+        with SourceHasher(jobs or 8, store) as hasher:
+            plans = {d: hasher.plan(d, data) for d, data in evaluated.items() if data}
+            hasher.start()
+            for d in dirs:
+                rel = d.relative_to(self.root) if d.is_relative_to(self.root) else d
+                data = evaluated.get(d)
+                try:
+                    if data is None:
+                        raise ValueError("failed to evaluate PKGBUILD")
+                    text, changed = apply_sums(
+                        (d / "PKGBUILD").read_text(), data, hasher.result(plans[d])
+                    )
+                except (OSError, ValueError, http.client.HTTPException) as e:
+                    err(f"{rel}: {e}")
+                    rc = 1
+                    continue
+                if changed:
+                    (d / "PKGBUILD").write_text(text)
+                    (d / ".SRCINFO").write_text(render_srcinfo(data))
+                    ok(f"{rel}: updated {changed} checksum(s) and .SRCINFO")
+                    updated += 1
+        info(f"{updated} of {len(dirs)} package(s) had new checksums")
+        return rc
+
+    def _list_worker(self, d: Path) -> tuple[Path, Srcinfo | None]:
+        return d, self._load_meta(d)
+
+    def list(self) -> int:
+        self._populate_files_cache()
+        dirs = self._get_pkg_dirs()
+        if self.use_eval:
+            self._evaluate(dirs)
+        with concurrent.futures.ThreadPoolExecutor() as executor:
+            for d, meta in executor.map(self._list_worker, dirs):
+                if meta is None or not meta.value("pkgver"):
+                    print(f"{d.name:<30} {'PARSE ERROR':<20}")
+                    continue
+                for n in meta.pkgnames or (meta.pkgbase,):
+                    desc = meta.value("pkgdesc", n)
+                    print(f"{n:<30} {meta.version:<20} {desc[:60]}")
         return 0
 
 
 def main() -> int:
     p = argparse.ArgumentParser(description="vp-dev - PKG repository development tool")
+    p.add_argument(
+        "--eval",
+        action="store_true",
+        help="Source PKGBUILDs with bash for full metadata (update/check/list)",
+    )
     sp = p.add_subparsers(dest="cmd", help="Commands")
     sp.add_parser("new", help="Create new package from template").add_argument(
         "pkg", help="Package name"
@@ -484,28 +3825,157 @@ def main() -> int:
     sp.add_parser("test", help="Build package locally").add_argument(
         "pkg", nargs="?", help="Package name (optional)"
     )
-    sp.add_parser("update", help="Update packages.json from PKGBUILDs")
+    sp.add_parser("update", help="Update packages.json from PKGBUILDs").add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Ignore the parse cache and rescan every package",
+    )
     sp.add_parser("publish", help="Update, commit and push changes")
     sp.add_parser("check", help="Validate all PKGBUILDs")
     sp.add_parser("clean", help="Remove all build artifacts")
     sp.add_parser("list", help="List all packages")
-    sp.add_parser("updpkgsums", help="Update checksums in PKGBUILD").add_argument(
-        "pkg", help="Package name"
+    us = sp.add_parser("updpkgsums", help="Update checksums in PKGBUILDs")
+    us.add_argument("pkgs", nargs="*", help="Package names (default: all)")
+    us.add_argument("-j", "--jobs", type=int, help="Parallel downloads (default: 8)")
+    us.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Don't keep downloads in the source store",
+    )
+    si = sp.add_parser("srcinfo", help="Generate .SRCINFO files without makepkg")
+    si.add_argument("pkgs", nargs="*", help="Package names (default: all)")
+    si.add_argument(
+        "--check",
+        action="store_true",
+        help="Only report stale or missing .SRCINFO files (exit 1 if any)",
+    )
+    sp.add_parser("graph", help="Show the inter-package dependency graph").add_argument(
+        "--dot", action="store_true", help="Emit Graphviz DOT"
+    )
+    pl = sp.add_parser("plan", help="Emit a dependency-ordered build schedule")
+    pl.add_argument("pkgs", nargs="*", help="Package names or dirs (default: all)")
+    pl.add_argument("-j", "--jobs", type=int, help="Build slots (default: nproc)")
+    pl.add_argument(
+        "--heavy-jobs",
+        type=int,
+        default=1,
+        help="Max memory-heavy builds at once (default: 1)",
+    )
+    pl.add_argument(
+        "--heavy-rss",
+        type=int,
+        default=4096,
+        metavar="MB",
+        help="Peak RSS that makes a build memory-heavy (default: 4096)",
+    )
+    sp.add_parser(
+        "affected", help="List packages to rebuild for a git diff range"
+    ).add_argument("range", help="Revision range, e.g. origin/main..HEAD")
+    ac = sp.add_parser("artifact", help="Package artifact cache")
+    ac.add_argument("action", choices=("key", "restore", "store", "prune"))
+    ac.add_argument("pkg", nargs="?", help="Package dir (all actions but prune)")
+    ac.add_argument("--key", help="store: key computed before the build")
+    ac.add_argument(
+        "--max-size",
+        default="",
+        help="prune: size cap, e.g. 20G (default: $ARTIFACT_CACHE_MAX or 20G)",
+    )
+    fp = sp.add_parser("fetch", help="Fill package dirs from the shared source store")
+    fp.add_argument("pkgs", nargs="*", help="Package names (default: all)")
+    fp.add_argument("-j", "--jobs", type=int, help="Parallel fetches (default: 8)")
+    fp.add_argument(
+        "--prune", action="store_true", help="Only evict LRU entries above the size cap"
+    )
+    fp.add_argument(
+        "--max-size",
+        default="",
+        help="prune: size cap, e.g. 50G (default: $SOURCE_CACHE_MAX or 50G)",
+    )
+    cu = sp.add_parser(
+        "check-upstream", help="Check nvchecker.toml sources for new versions"
+    )
+    cu.add_argument("names", nargs="*", help="Entry names (default: all)")
+    cu.add_argument("-c", "--config", help="nvchecker config (default: nvchecker.toml)")
+    cu.add_argument(
+        "--per-host",
+        type=int,
+        default=UPSTREAM_PER_HOST,
+        help=f"Concurrent connections per host (default: {UPSTREAM_PER_HOST})",
+    )
+    cu.add_argument(
+        "--dry-run", action="store_true", help="Report only, don't write newver"
+    )
+    cu.add_argument(
+        "--no-cache", action="store_true", help="Bypass the shared HTTP cache"
+    )
+    bp = sp.add_parser("bump", help="Apply new upstream versions to PKGBUILDs")
+    bp.add_argument(
+        "pkgs", nargs="*", help="Packages (default: all in the newver diff)"
+    )
+    bp.add_argument("-c", "--config", help="nvchecker config (default: nvchecker.toml)")
+    bp.add_argument(
+        "--to", metavar="VERSION", help="Bump the one package given to VERSION"
+    )
+    bp.add_argument("-j", "--jobs", type=int, help="Parallel downloads (default: 8)")
+    bp.add_argument("--dry-run", action="store_true", help="Only print the bumps")
+    gh = sp.add_parser("api", help="GET a GitHub API path through the HTTP cache")
+    gh.add_argument("path", help="API path, e.g. repos/OWNER/REPO/releases/latest")
+    gh.add_argument("--no-cache", action="store_true", help="Bypass the HTTP cache")
+    clp = sp.add_parser("classify", help="Classify a failed build from its log")
+    clp.add_argument("log", help="Build log")
+    tp = sp.add_parser("stats", help="Show build cost trends and regressions")
+    tp.add_argument("pkgs", nargs="*", help="List these packages' recent builds")
+    tp.add_argument(
+        "--last", action="store_true", help="One line on each package's last build"
+    )
+    tp.add_argument(
+        "--threshold",
+        type=float,
+        default=20,
+        metavar="PCT",
+        help="Flag packages this much costlier than their median (default: 20)",
+    )
+    rp = sp.add_parser("record", help="Run a build command and log its cost")
+    rp.add_argument("pkg", help="Package dir the command builds")
+    rp.add_argument(
+        "--wall-only",
+        action="store_true",
+        help="Only log wall time (the work runs outside this process tree)",
     )
+    rp.add_argument("command", nargs=argparse.REMAINDER, help="-- command [args...]")
     a = p.parse_args()
     if not a.cmd:
         p.print_help()
         return 1
     vd = VpDev()
+    vd.use_eval = a.eval
     return {
         "new": lambda: vd.new(a.pkg),
         "test": lambda: vd.test(a.pkg if hasattr(a, "pkg") else None),
-        "update": vd.update,
+        "update": lambda: vd.update(use_cache=not a.no_cache),
         "publish": vd.publish,
         "check": vd.check,
         "clean": vd.clean,
         "list": vd.list,
-        "updpkgsums": lambda: vd.updpkgsums(a.pkg),
+        "updpkgsums": lambda: vd.updpkgsums(a.pkgs, a.jobs, not a.no_cache),
+        "srcinfo": lambda: vd.srcinfo(a.pkgs, check=a.check),
+        "graph": lambda: vd.graph(dot=a.dot),
+        "affected": lambda: vd.affected(a.range),
+        "artifact": lambda: vd.artifact(a.action, a.pkg, a.key, a.max_size),
+        "plan": lambda: vd.plan(a.pkgs, a.jobs, a.heavy_jobs, a.heavy_rss),
+        "check-upstream": lambda: vd.check_upstream(
+            a.names, a.config, a.per_host, a.dry_run, not a.no_cache
+        ),
+        "fetch": lambda: vd.fetch(a.pkgs, a.jobs, a.prune, a.max_size),
+        "bump": lambda: vd.bump(a.pkgs, a.config, a.to, a.jobs, a.dry_run),
+        "api": lambda: vd.api(a.path, use_cache=not a.no_cache),
+        "classify": lambda: vd.classify(a.log),
+        "stats": lambda: vd.stats(a.pkgs, a.last, a.threshold),
+        "record": lambda: vd.record(
+            a.pkg,
+            a.command[1:] if a.command[:1] == ["--"] else a.command,
+            a.wall_only,
+        ),
     }.get(a.cmd, lambda: 1)()
 
 